@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+
+import sys
+
+from lib.cli import cli_main
+
+
+__about__ = '''
+Benchmarks `fix_logs.py` and `merge_failed.py` against synthetic local repositories
+'''
+
+
+__description__ = '''
+Generates a fleet of local `origin` and `source` repositories, then reports repos/min and per-phase latency of fixing them
+'''
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+if __name__ != '__main__':
+    raise NotImplementedError("Try running as a script, eg. python file-name.py --help")
+
+
+cli_main(['bench'] + sys.argv[1:],
+         about = __about__,
+         license = __license__,
+         description = __description__)
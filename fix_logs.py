@@ -1,10 +1,9 @@
 #!/usr/bin/env python3
 
 
-import argparse
 import sys
 
-from lib import fix_logs_main
+from lib.cli import cli_main
 
 
 __about__ = '''
@@ -39,68 +38,8 @@ if __name__ != '__main__':
     raise NotImplementedError("Try running as a script, eg. python file-name.py --help")
 
 
-parser = argparse.ArgumentParser(description = __description__)
-
-parser.add_argument('--about',
-                    action = 'store_true',
-                    help = 'Prints info about this script and exits')
-
-parser.add_argument('--config',
-                    default = './config.json',
-                    help = 'Path to config.json file')
-
-parser.add_argument('--merge_strategy',
-                    default = None,
-                    help = 'Git merge strategy to use, check `git help merge | less -p "-X <option>"`')
-
-parser.add_argument('--origin_branch',
-                    default = 'master',
-                    help = 'Git branch name to merge source `source_branch` with')
-
-parser.add_argument('--origin_remote',
-                    default = 'origin',
-                    help = 'Git remote name to push changes to')
-
-parser.add_argument('--source_branch',
-                    default = 'master',
-                    help = 'Git branch to _inject_ into `origin_branch`')
-
-parser.add_argument('--source_remote',
-                    default = 'source',
-                    help = 'Git remote name to fetch log corrections from')
-
-parser.add_argument('--fix_branch',
-                    default = "fix",
-                    help = 'Git branch name for triaging possible merge conflicts')
-
-parser.add_argument('--fix_commit',
-                    default = "Fixes logs",
-                    help = 'Git commit message for successful automatic merges')
-
-parser.add_argument('--no_push',
-                    action = 'store_true',
-                    help = 'Skips attempting to push to `origin_remote` after merge')
-
-parser.add_argument('--keep_fix_branch',
-                    action = 'store_true',
-                    help = 'Skips deleting `fix_branch` after merge')
-
-parser.add_argument('--license',
-                    action = 'store_true',
-                    help = 'Prints script license and exits')
-
-parser.add_argument('--verbose',
-                    action = 'store_true',
-                    help = 'Prints command standard out if set')
-
-args = vars(parser.parse_args())
-
-if args['about']:
-    print(__about__)
-    sys.exit()
-
-if args['license']:
-    print(__license__)
-    sys.exit()
-
-fix_logs_main(args)
+cli_main(sys.argv[1:],
+         about = __about__,
+         license = __license__,
+         description = __description__,
+         default_command = 'fix')
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 
 
+import collections
+import contextvars
 import json
 import os
+import signal
 import subprocess
-import srblib
+import tempfile
+import threading
+import time
 
 
 __license__ = '''
@@ -25,6 +30,77 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 '''
 
 
+current_repo = contextvars.ContextVar('current_repo', default = None)
+"""
+Name of repository the current thread or asyncio task is working on, used to tag `run_observers` records
+"""
+
+
+current_timeouts = contextvars.ContextVar('current_timeouts', default = None)
+"""
+Dictionary of command phase to seconds, see `merge_timeouts`, that `run(cmd)` and `async_run(cmd)` allow commands of the current thread or asyncio task
+"""
+
+
+default_timeouts = {
+    'default': 300,
+    'fetch': 1800,
+    'push': 600,
+    'mergetool': None,
+}
+"""
+Seconds allowed per command phase when not configured, `default` applies to unlisted phases and `None` means no limit, eg. for interactive `git mergetool`
+"""
+
+
+timeout_code = 124
+"""
+Exit code recorded for commands killed by a timeout, the same as `timeout` from GNU coreutils
+"""
+
+
+max_deepen = 6
+"""
+Rounds of doubling `git fetch --deepen` that `deepen_steps` tries before fetching all of `source` history via `--unshallow`
+"""
+
+
+run_observers = []
+"""
+Callables that are passed a record dictionary after each `run(cmd)` or `async_run(cmd)` call, see `notify_run_observers`
+"""
+
+
+capture_policy = None
+"""
+Optional `lib.capture.CapturePolicy`, bounds output that `run(cmd)` and `async_run(cmd)` keep in memory
+"""
+
+
+start_observers = []
+"""
+Callables that are passed a record dictionary before each `run(cmd)` or `async_run(cmd)` call starts its process, see `notify_start_observers`
+"""
+
+
+retry_policy = None
+"""
+Optional `lib.retry.RetryPolicy`, decides which failed Git commands `run_git_steps` and `async_run_git_steps` run again
+"""
+
+
+current_retries = contextvars.ContextVar('current_retries', default = None)
+"""
+Dictionary of command phase to number of retries, that `retry_delay` updates for the repository of the current thread or asyncio task
+"""
+
+
+merge_cache = None
+"""
+Optional `lib.cache.MergeCache`, lets `fix_log_steps` reuse outcomes of merging the same `origin_hash` and `source_hash` again
+"""
+
+
 class GitException(Exception):
     """
     Raise error from `run` git commands
@@ -36,31 +112,295 @@ class GitException(Exception):
     """
 
     def __init__(self, message, status):
+        message = str(message)
         super(GitException, self).__init__(message)
         self.message = message
         self.status = status
 
 
-def os_cd(path):
+class ErrorMessage(object):
     """
-    A short-cut for _`cd` like_ commands
+    Error message template that is only formatted, with `repo` and `kwargs`, when converted to a string
+
+    Passed as `error_message` to `git_step` or `git`, so successful commands never pay for formatting
+
+    **Example**
+
+        ErrorMessage("{name} cannot merge `latest_hash` {latest_hash}", repo, latest_hash = latest_hash)
+    """
+
+    __slots__ = ('template', 'repo', 'kwargs')
+
+    def __init__(self, template, repo, **kwargs):
+        self.template = template
+        self.repo = repo
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return self.template.format_map(collections.ChainMap(self.kwargs, self.repo))
+
+
+class RepoConfig(object):
+    """
+    Consolidated configurations of one repository, see `consolidate_repo_configs`
+
+    Attributes may also be read and written like dictionary keys, eg. `repo['name']` or `repo.get('worktree')`, so `"{name}".format(**repo)` still works
+
+    Keys within `runtime_keys` are set while fixing, and left out of `as_dict()` until they are
+    """
+
+    __slots__ = (
+        'dir',
+        'source',
+        'origin_branch',
+        'origin_remote',
+        'source_branch',
+        'source_remote',
+        'fix_branch',
+        'fix_commit',
+        'no_push',
+        'keep_fix_branch',
+        'verbose',
+        'source_cache',
+        'precheck',
+        'merge_mode',
+        'merge_strategy',
+        'preflight',
+        'push_stage',
+        'fetch_depth',
+        'fetch_filter',
+        'fetch_no_tags',
+        'fetch_single_branch',
+        'timeouts',
+        'name',
+        'last_fixed',
+        'worktree',
+        'polled_origin_hash',
+    )
+
+    runtime_keys = (
+        'last_fixed',
+        'worktree',
+        'polled_origin_hash',
+    )
+
+    def __init__(self, **kwargs):
+        for key in self.__slots__:
+            setattr(self, key, kwargs.get(key))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __delitem__(self, key):
+        self[key] = None
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default = None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def keys(self):
+        return self.__slots__
+
+    def as_dict(self):
+        """
+        **Returns** dictionary of configurations, similar to those written before this class existed
+        """
+        return {
+            key: getattr(self, key)
+            for key in self.__slots__
+            if key not in self.runtime_keys or getattr(self, key) is not None
+        }
+
+
+class RepoResult(object):
+    """
+    Outcome of fixing, or failing to fix, one `RepoConfig`
+
+    Reading a key that is not part of the outcome falls back to `config`, so results may be used where `repo_configs` dictionaries were; `as_dict()` merges both for logs
+
+    **Parameters**
+
+    - `config` `RepoConfig` instance
+    - `kwargs` outcome keys, eg. `code`, `out`, `err`, `message`, and hashes
+    """
+
+    __slots__ = (
+        'config',
+        'message',
+        'code',
+        'err',
+        'out',
+        'merge_hash',
+        'origin_hash',
+        'source_hash',
+        'preflight_result',
+        'pending_push',
+        'out_log',
+        'err_log',
+        'timed_out',
+        'error_class',
+        'retries',
+        'merge_cached',
+    )
+
+    def __init__(self, config, **kwargs):
+        self.config = config
+        for key in self.__slots__[1:]:
+            setattr(self, key, kwargs.get(key))
+
+    def __getitem__(self, key):
+        if key not in self.__slots__[1:]:
+            return self.config[key]
+
+        value = getattr(self, key)
+        if value is None and key in self.config:
+            return self.config[key]
+
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self.__slots__[1:]:
+            setattr(self, key, value)
+        else:
+            self.config[key] = value
+
+    def __contains__(self, key):
+        return key in self.__slots__[1:] or key in self.config
+
+    def get(self, key, default = None):
+        if key in self.__slots__[1:] and getattr(self, key) is not None:
+            return getattr(self, key)
+
+        return self.config.get(key, default)
+
+    def pop(self, key, default = None):
+        value = self.get(key, default)
+        self[key] = None
+        return value
+
+    def update(self, status):
+        for key, value in status.items():
+            self[key] = value
+
+    def keys(self):
+        return tuple(self.config.keys()) + self.__slots__[1:]
+
+    def as_dict(self):
+        """
+        **Returns** dictionary of `config` and outcome keys, similar to `fixed.json` and `failed.json` lines
+        """
+        result = self.config.as_dict()
+        for key in self.__slots__[1:]:
+            value = getattr(self, key)
+            if value is not None or key in ('code', 'err', 'out'):
+                result[key] = value
+
+        return result
+
+
+class CatFileBatch(object):
+    """
+    Long-lived `git cat-file --batch-check` co-process, so many revision lookups within one repository cost a pipe round-trip instead of a new process
+
+    The co-process is started on first `resolve`, and should be stopped via `close()`
+
+    **Parameters**
+
+    - `cwd` String, repository directory
+
+    **Example**
+
+        revs = CatFileBatch('/home/user-name/git/hub/account-name/repo-name')
+        revs.resolve('refs/remotes/origin/master')
+        #> 'a8aaab3...'
+        revs.close()
+    """
+
+    def __init__(self, cwd):
+        self.cwd = cwd
+        self.process = None
+
+    def resolve(self, rev):
+        """
+        **Returns** full hash of object named by `rev`, or an empty string if missing or ambiguous
+        """
+        if self.process is None:
+            self.process = subprocess.Popen(['git', 'cat-file', '--batch-check'], stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=self.cwd)
+
+        self.process.stdin.write(rev.encode('utf-8') + b'\n')
+        self.process.stdin.flush()
+        line = self.process.stdout.readline().decode('utf-8').strip()
+        if not line or line.endswith(' missing') or line.endswith(' ambiguous'):
+            return ''
+
+        return line.split(' ')[0]
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+            self.process = None
+
+
+def abs_path(path):
+    """
+    **Returns** absolute, normalized, `path` with a leading `~` expanded to home directory
+
+    **Example**
+
+        abs_path('~/git/hub/account-name/repo-name/')
+        #> '/home/user-name/git/hub/account-name/repo-name'
+    """
+    return os.path.abspath(os.path.expanduser(path))
+
+
+def repo_path(path):
+    """
+    Expands `path` to an absolute directory path
 
     **Throws**
 
     - `Throws/Raises` if path does not exist
     """
-    abspath = srblib.abs_path(path)
+    abspath = abs_path(path)
     if os.path.isdir(abspath) is False:
         raise TypeError("No directory at {abspath}".format(abspath = abspath))
 
-    os.chdir(abspath)
+    return abspath
 
 
-def run(cmd):
+def os_cd(path):
+    """
+    A short-cut for _`cd` like_ commands
+
+    **Throws**
+
+    - `Throws/Raises` if path does not exist
+
+    **Note** changes working directory for the whole process, prefer passing `cwd` to `run` or `git` when threads are involved
+    """
+    os.chdir(repo_path(path))
+
+
+def run(cmd, cwd = None):
     """
     **Parameters**
 
     - `cmd` should be a list, eg. `run(['git', 'status'])`
+    - `cwd` String, optional directory to run `cmd` within, defaults to current working directory
 
     **Returns** dictionary similar to...
 
@@ -73,23 +413,151 @@ def run(cmd):
     - `code` contains the exit code/status of command run
     - `out` may contain Standard Out
     - `err` may contain Standard Error
+
+    When `capture_policy` is set and caps `cmd`, `out` and `err` only keep their tails, and `out_log` or `err_log` may name files with full output
+
+    When `current_timeouts` allow `cmd` a number of seconds, it runs within its own process group, which is killed when time runs out; `code` is then `timeout_code` and `timed_out` holds the seconds allowed
     """
-    pipes = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, err = pipes.communicate()
-    return {
-        'code': pipes.returncode,
-        'out': out,
-        'err': err
+    timeout = phase_timeout(cmd)
+    started = time.time()
+    notify_start_observers(cmd, started)
+    pipes = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd,
+                             start_new_session = timeout is not None)
+    killed = []
+    watchdog = None
+    if timeout is not None:
+        watchdog = threading.Timer(timeout, lambda: killed.append(kill_process_group(pipes.pid)))
+        watchdog.daemon = True
+        watchdog.start()
+
+    try:
+        if capture_policy is not None and capture_policy.captures(cmd):
+            status = capture_policy.communicate(pipes, cmd)
+        else:
+            out, err = pipes.communicate()
+            status = {
+                'code': pipes.returncode,
+                'out': out,
+                'err': err
+            }
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+
+    if any(killed) and status['code'] == -signal.SIGKILL:
+        status.update({'code': timeout_code, 'timed_out': timeout})
+    notify_run_observers(cmd, status, started)
+    return status
+
+
+def phase_timeout(cmd):
+    """
+    **Returns** seconds `current_timeouts` allow `cmd`, or `None` for no limit
+    """
+    timeouts = current_timeouts.get()
+    if not timeouts:
+        return None
+
+    phase = command_phase(cmd)
+    if phase in timeouts:
+        return timeouts[phase]
+
+    # Sub-commands, eg. `remote-add`, fall back to their command before `default`
+    return timeouts.get(phase.split('-')[0], timeouts.get('default'))
+
+
+def kill_process_group(pid):
+    """
+    Kills process group led by `pid`, so helpers such as `ssh` or `git-remote-https` die with Git
+
+    **Returns** `True` if the group still existed
+    """
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        return False
+
+    return True
+
+
+def command_phase(cmd):
+    """
+    **Returns** pipeline phase name for `cmd`, eg. `fetch` for `['git', 'fetch', 'source']` or `remote-add` for `['git', 'remote', 'add', ...]`
+    """
+    words = [word for word in cmd[1:] if not word.startswith('-')]
+    if not words:
+        return os.path.basename(cmd[0])
+
+    if words[0] in ('remote', 'worktree') and len(words) > 1:
+        return "{0}-{1}".format(*words)
+
+    return words[0]
+
+
+def notify_start_observers(cmd, started):
+    """
+    Passes a record similar to the following to each of `start_observers`...
+
+        {
+            "repo": "_repo-name_",
+            "phase": "fetch",
+            "cmd": ["git", "fetch", "source"],
+            "started": 1602806400.0
+        }
+    """
+    if not start_observers:
+        return
+
+    record = {
+        'repo': current_repo.get(),
+        'phase': command_phase(cmd),
+        'cmd': cmd,
+        'started': started,
+    }
+    for observer in start_observers:
+        observer(record)
+
+
+def notify_run_observers(cmd, status, started):
+    """
+    Passes a record similar to the following to each of `run_observers`...
+
+        {
+            "repo": "_repo-name_",
+            "phase": "fetch",
+            "cmd": ["git", "fetch", "source"],
+            "code": 0,
+            "started": 1602806400.0,
+            "seconds": 1.5,
+            "out_bytes": 0,
+            "err_bytes": 112
+        }
+    """
+    if not run_observers:
+        return
+
+    record = {
+        'repo': current_repo.get(),
+        'phase': command_phase(cmd),
+        'cmd': cmd,
+        'code': status['code'],
+        'started': started,
+        'seconds': time.time() - started,
+        'out_bytes': len(status['out'] or b''),
+        'err_bytes': len(status['err'] or b''),
     }
+    for observer in run_observers:
+        observer(record)
 
 
-def git(arg_list, error_message, verbose = False):
+def git(arg_list, error_message, verbose = False, cwd = None):
     """
     **Parameters**
 
     - `arg_list` List, Git args to send to `run(cmd)` function
-    - `error_message` String, message to print and log if errors are detected
+    - `error_message` String, or `ErrorMessage`, message to print and log if errors are detected
     - `verbose` Boolean, if `True` then prints success and failure messages
+    - `cwd` String, optional repository directory to run Git within
 
     **Example**
 
@@ -105,7 +573,28 @@ def git(arg_list, error_message, verbose = False):
     if verbose:
         print("arg_list -> {}".format(arg_list))
 
-    status = run(['git'] + arg_list)
+    status = run(['git'] + arg_list, cwd = cwd)
+    return check_git_status(status, error_message, verbose)
+
+
+def check_git_status(status, error_message, verbose = False):
+    """
+    Shared error handling of `git` and `async_git` functions
+
+    **Parameters**
+
+    - `status` Dictionary, returned from `run(cmd)` or `async_run(cmd)` functions
+    - `error_message` String, or `ErrorMessage`, message to print and log if errors are detected
+    - `verbose` Boolean, if `True` then prints Standard Out
+
+    **Returns** `status` dictionary
+
+    **Throws/Raises** `GitException` if exit `code` is greater than `0` and `err` contains output, or if the command timed out
+    """
+    if status.get('timed_out') is not None:
+        raise GitException(ErrorMessage("{error_message}, timed out after {timed_out} seconds", {},
+                                        error_message = error_message, timed_out = status['timed_out']), status)
+
     if status['code'] > 0 and status['err']:
         raise GitException(error_message, status)
     elif status['err']:
@@ -117,6 +606,348 @@ def git(arg_list, error_message, verbose = False):
     return status
 
 
+async def async_run(cmd, cwd = None, limiter = None):
+    """
+    Asyncio version of `run(cmd)` function
+
+    **Parameters**
+
+    - `cmd` should be a list, eg. `await async_run(['git', 'status'])`
+    - `cwd` String, optional directory to run `cmd` within, defaults to current working directory
+    - `limiter` optional `asyncio.Semaphore`, bounds how many commands may run at the same time
+
+    **Returns** dictionary similar to `run(cmd)` function output
+    """
+    # Loaded on first use, so scripts that never run an event loop start faster
+    import asyncio
+    if limiter is None:
+        limiter = asyncio.Semaphore(1)
+
+    timeout = phase_timeout(cmd)
+    async with limiter:
+        started = time.time()
+        notify_start_observers(cmd, started)
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, cwd=cwd,
+            start_new_session = timeout is not None)
+        killed = []
+        watchdog = None
+        if timeout is not None:
+            watchdog = asyncio.get_running_loop().call_later(
+                timeout, lambda: killed.append(kill_process_group(process.pid)))
+
+        try:
+            if capture_policy is not None and capture_policy.captures(cmd):
+                status = await capture_policy.async_communicate(process, cmd)
+            else:
+                out, err = await process.communicate()
+                status = {
+                    'code': process.returncode,
+                    'out': out,
+                    'err': err
+                }
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+
+    if any(killed) and status['code'] == -signal.SIGKILL:
+        status.update({'code': timeout_code, 'timed_out': timeout})
+
+    notify_run_observers(cmd, status, started)
+    return status
+
+
+async def async_git(arg_list, error_message, verbose = False, cwd = None, limiter = None):
+    """
+    Asyncio version of `git` function
+
+    **Parameters** same as `git` function, plus...
+
+    - `limiter` optional `asyncio.Semaphore`, passed to `async_run(cmd)` function
+
+    **Example**
+
+        await async_git(['fetch', 'source'], "cannot fetch source", cwd = '~/git/hub/repo', limiter = asyncio.Semaphore(64))
+
+    **Returns** dictionary from `async_run(cmd)` function
+
+    **Throws/Raises** `GitException` same as `git` function
+    """
+    if verbose:
+        print("arg_list -> {}".format(arg_list))
+
+    status = await async_run(['git'] + arg_list, cwd = cwd, limiter = limiter)
+    return check_git_status(status, error_message, verbose)
+
+
+def git_step(arg_list, error_message, verbose = False, cwd = None):
+    """
+    Packs arguments for `git` or `async_git` functions, so _steps_ generators may `yield` them
+
+    **Example**
+
+        status = yield git_step(['status'], "cannot read git status", True)
+
+    **Returns** dictionary of keyword arguments
+    """
+    return {
+        'arg_list': arg_list,
+        'error_message': error_message,
+        'verbose': verbose,
+        'cwd': cwd,
+    }
+
+
+def retry_delay(git_kwargs, e, attempt):
+    """
+    Asks `retry_policy`, if any, whether the step `git_kwargs` that raised `e` on its `attempt` should run again, printing a note if so
+
+    **Returns** seconds to wait before the next attempt, or `None` to give up
+    """
+    if retry_policy is None:
+        return None
+
+    delay = retry_policy.delay(['git'] + git_kwargs['arg_list'], e.status, attempt, current_retries.get())
+    if delay is not None:
+        print("{error_message}, retrying in {delay:.1f} seconds".format(error_message = e.message, delay = delay))
+
+    return delay
+
+
+def run_git_steps(steps):
+    """
+    Drives `steps` generator, similar to `fix_log_steps`, by calling `git` for each yielded dictionary
+
+    A step that fails with an error `retry_policy` classifies as transient, eg. a dropped connection or an `index.lock` left by another process, is run again after a backoff, see `retry_delay`
+
+    The generator is closed on errors too, so its `finally` blocks may release resources
+
+    **Returns** value returned by `steps` generator
+
+    **Throws/Raises** `GitException` from `git` function
+    """
+    status = None
+    try:
+        while True:
+            try:
+                git_kwargs = steps.send(status)
+            except StopIteration as stop:
+                return stop.value
+
+            attempt = 0
+            while True:
+                try:
+                    status = git(**git_kwargs)
+                    break
+                except GitException as e:
+                    delay = retry_delay(git_kwargs, e, attempt)
+                    if delay is None:
+                        raise
+
+                    attempt += 1
+                    time.sleep(delay)
+    finally:
+        steps.close()
+
+
+async def async_run_git_steps(steps, limiter = None):
+    """
+    Asyncio version of `run_git_steps`, each yielded dictionary is awaited via `async_git`
+
+    **Parameters**
+
+    - `steps` generator, similar to `fix_log_steps`
+    - `limiter` optional `asyncio.Semaphore`, passed to `async_git` function
+    """
+    import asyncio
+    status = None
+    try:
+        while True:
+            try:
+                git_kwargs = steps.send(status)
+            except StopIteration as stop:
+                return stop.value
+
+            attempt = 0
+            while True:
+                try:
+                    status = await async_git(limiter = limiter, **git_kwargs)
+                    break
+                except GitException as e:
+                    delay = retry_delay(git_kwargs, e, attempt)
+                    if delay is None:
+                        raise
+
+                    attempt += 1
+                    # Waits outside of `limiter`, so other repositories keep its slot busy
+                    await asyncio.sleep(delay)
+    finally:
+        steps.close()
+
+
+def bounded_map(function, iterable, jobs):
+    """
+    Similar to `ThreadPoolExecutor.map`, though `iterable` is only read as workers free up
+
+    At most `jobs * 2` items are in flight; a new item is started as soon as any finishes, so one slow item never idles the other workers, and finished results wait until all before them are yielded, in order of `iterable`
+
+    **Example**
+
+        for repo_configs, fixed in bounded_map(lambda repo: fix_repo(defaults, repo), repos, jobs = 8):
+            print(repo_configs['name'], fixed)
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+    with ThreadPoolExecutor(max_workers = jobs) as executor:
+        items = enumerate(iterable)
+        running = {}
+        finished = {}
+        next_index = 0
+        exhausted = False
+        while True:
+            while not exhausted and len(running) < jobs * 2:
+                try:
+                    index, item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+
+                running[executor.submit(function, item)] = index
+
+            while next_index in finished:
+                yield finished.pop(next_index).result()
+                next_index += 1
+
+            if not running:
+                return
+
+            done, _pending = wait(running, return_when = FIRST_COMPLETED)
+            for future in done:
+                finished[running.pop(future)] = future
+
+
+async def async_bounded_map(function, iterable, jobs):
+    """
+    Asyncio version of `bounded_map`, `function` must return an awaitable
+
+    **Example**
+
+        async for result in async_bounded_map(lambda repo: async_fix_repo(defaults, repo, limiter), repos, jobs = 64):
+            print(result)
+    """
+    import asyncio
+    items = enumerate(iterable)
+    running = {}
+    finished = {}
+    next_index = 0
+    exhausted = False
+    while True:
+        while not exhausted and len(running) < jobs * 2:
+            try:
+                index, item = next(items)
+            except StopIteration:
+                exhausted = True
+                break
+
+            running[asyncio.ensure_future(function(item))] = index
+
+        while next_index in finished:
+            yield finished.pop(next_index).result()
+            next_index += 1
+
+        if not running:
+            return
+
+        done, _pending = await asyncio.wait(running, return_when = asyncio.FIRST_COMPLETED)
+        for future in done:
+            finished[running.pop(future)] = future
+
+
+def decode_status(status):
+    """
+    **Returns** copy of `status` dictionary with `out` and `err` bytes decoded, so they may be written as JSON
+    """
+    decoded = dict(status)
+    for key in ('out', 'err'):
+        if isinstance(decoded.get(key), bytes):
+            decoded[key] = decoded[key].decode('utf-8', 'replace')
+
+    return decoded
+
+
+def first_defined(*values):
+    """
+    **Returns** first of `values` that is not `None`, so that `0` or `False` options are kept
+    """
+    for value in values:
+        if value is not None:
+            return value
+
+    return None
+
+
+def parse_timeouts(timeout_strings):
+    """
+    **Returns** dictionary of command phase to seconds from strings similar to `fetch=600`, where `none` means no limit
+
+    **Throws/Raises** `ValueError` if a string is not similar to `PHASE=SECONDS`
+
+    **Example**
+
+        parse_timeouts(['fetch=600', 'default=120', 'mergetool=none'])
+        #> {'fetch': 600.0, 'default': 120.0, 'mergetool': None}
+    """
+    timeouts = {}
+    for timeout_string in timeout_strings or []:
+        phase, _, seconds = timeout_string.partition('=')
+        if not phase or not seconds:
+            raise ValueError("timeout {timeout_string} is not similar to PHASE=SECONDS".format(timeout_string = timeout_string))
+
+        timeouts[phase] = None if seconds.lower() == 'none' else float(seconds)
+
+    return timeouts
+
+
+def merge_timeouts(*layers):
+    """
+    **Returns** dictionary of command phase to seconds, later `layers` overriding earlier ones, starting from `default_timeouts`
+
+    **Example**
+
+        merge_timeouts(configs.get('timeouts'), repo.get('timeouts'))
+    """
+    timeouts = dict(default_timeouts)
+    for layer in layers:
+        timeouts.update(layer or {})
+
+    return timeouts
+
+
+class UntilDeadline(object):
+    """
+    Iterable of `repos` that stops yielding once `deadline`, a `time.time()` value, has passed, so no new repositories start while those in flight finish
+
+    Re-iterable when `repos` is, and `skipped` counts repositories left out by the last iteration
+
+    **Example**
+
+        repos = UntilDeadline(configs['repos'], time.time() + 3600)
+    """
+
+    def __init__(self, repos, deadline):
+        self.repos = repos
+        self.deadline = deadline
+        self.skipped = 0
+
+    def __iter__(self):
+        self.skipped = 0
+        for repo in self.repos:
+            if time.time() >= self.deadline:
+                self.skipped += 1
+                continue
+
+            yield repo
+
+
 def parent_directory_name(path):
     """
     **Notes**
@@ -174,7 +1005,7 @@ def consolidate_repo_configs(defaults, repo):
         }
 
 
-    **Returns**, dictionary, similar to...
+    **Returns**, `RepoConfig` with keys similar to...
 
         {
             "dir": "_local-git-directory_",
@@ -204,28 +1035,58 @@ def consolidate_repo_configs(defaults, repo):
     - `fix_commit` Git commit message for successful merges
     - `keep_fix_branch` If `True`, skips attempting to push to `origin_remote` after merge
     - `no_push` If `True`, skips deleting `fix_branch` after merge
-    """
-    repo_configs = {
-        "dir": repo['dir'],
-        "source": repo['source'],
-        "origin_branch": repo.get('origin_branch', defaults['origin_branch']),
-        "origin_remote": repo.get('origin_remote', defaults['origin_remote']),
-        "source_branch": repo.get('source_branch', defaults['source_branch']),
-        "source_remote": repo.get('source_remote', defaults['source_remote']),
-        "fix_branch": repo.get('fix_branch', defaults['fix_branch']),
-        "fix_commit": repo.get('fix_commit', defaults['fix_commit']),
-        "no_push": repo.get('no_push', defaults.get('no_push')),
-        "keep_fix_branch": repo.get('keep_fix_branch', defaults.get('keep_fix_branch')),
-        "verbose": defaults.get('verbose', False),
-    }
-    repo_configs['name'] = repo.get('origin_branch', parent_directory_name(repo_configs['dir'])),
 
-    return repo_configs
+    - `precheck` If `True`, marks `repo` as already fixed when `source_branch` tip is reachable from `origin_branch`, or unchanged since last fix, before changing remotes, fetching, merging, or pushing
 
+    - `merge_mode` One of `checkout` (default), `worktree` to merge within a temporary `git worktree`, or `merge_tree` to merge without any working tree unless there are conflicts
+    - `merge_strategy` Optional Git merge strategy option, eg. `theirs`, passed as `-X` to `git merge`
+    - `push_stage` If `True`, pushing is left to a `lib.push.PushScheduler` and the merge hash saved to `repo['pending_push']`
+    - `preflight` If `True`, classifies the merge via `git merge-tree` first; `clean` merges are committed without any working tree, and `conflicting` ones, or `trivial` ones without `merge_strategy`, fail with their conflicting paths, see `lib.preflight`
 
-def fix_log(repo):
+    - `fetch_single_branch` If `True`, only `source_branch` is fetched from `source_remote`, instead of every branch
+    - `fetch_no_tags` If `True`, tags of `source_remote` are not fetched
+    - `fetch_filter` Optional partial fetch filter, eg. `blob:none`, so blobs are only downloaded when the merge needs them
+    - `fetch_depth` Optional number of `source_branch` commits to fetch; the fetch is deepened, doubling each time, until `source_branch` and `origin_branch` share a merge base
+
+    - `timeouts` Optional dictionary of command phase to seconds, eg. `{"fetch": 600, "default": 120}`, merged over `defaults['timeouts']` and `default_timeouts`
+
+    New `repo['source_cache']` is the path of a bare repository already holding `source` branches, when `defaults['source_caches']` were prefetched
+
+    Optional `repo['polled_origin_hash']`, set by `lib.watch`, is the `origin_branch` tip the fix must be built upon
+    """
+    return RepoConfig(
+        dir = repo['dir'],
+        source = repo['source'],
+        origin_branch = repo.get('origin_branch', defaults['origin_branch']),
+        origin_remote = repo.get('origin_remote', defaults['origin_remote']),
+        source_branch = repo.get('source_branch', defaults['source_branch']),
+        source_remote = repo.get('source_remote', defaults['source_remote']),
+        fix_branch = repo.get('fix_branch', defaults['fix_branch']),
+        fix_commit = repo.get('fix_commit', defaults['fix_commit']),
+        no_push = repo.get('no_push', defaults.get('no_push')),
+        keep_fix_branch = repo.get('keep_fix_branch', defaults.get('keep_fix_branch')),
+        verbose = defaults.get('verbose', False),
+        source_cache = defaults.get('source_caches', {}).get(repo['source']),
+        precheck = repo.get('precheck', defaults.get('precheck')),
+        merge_mode = repo.get('merge_mode', defaults.get('merge_mode') or 'checkout'),
+        merge_strategy = repo.get('merge_strategy', defaults.get('merge_strategy')),
+        preflight = repo.get('preflight', defaults.get('preflight')),
+        push_stage = repo.get('push_stage', defaults.get('push_stage')),
+        fetch_depth = repo.get('fetch_depth', defaults.get('fetch_depth')),
+        fetch_filter = repo.get('fetch_filter', defaults.get('fetch_filter')),
+        fetch_no_tags = repo.get('fetch_no_tags', defaults.get('fetch_no_tags')),
+        fetch_single_branch = repo.get('fetch_single_branch', defaults.get('fetch_single_branch')),
+        timeouts = merge_timeouts(defaults.get('timeouts'), repo.get('timeouts')),
+        polled_origin_hash = repo.get('polled_origin_hash'),
+        name = repo.get('name', parent_directory_name(repo['dir'])),
+    )
+
+
+def fix_log_steps(repo):
     """
-    Attempts to fix git log for `repo`
+    Generator of `git_step` arguments that attempt to fix git log for `repo`
+
+    Status of each step is sent back in, see `fix_log` and `async_fix_log` for drivers
 
     **Returns** dictionary similar to `run(cmd)` function output
 
@@ -249,92 +1110,607 @@ def fix_log(repo):
 
     **Raises**
 
-    - `ValueError` with message similar to...
+    - `GitException` with message similar to...
 
-        Cannot obtain `latest_hash` or `source_hash`
+        repo-name cannot retrieve hash for `source_remote` or `source_branch`
+    """
+    repo_dir = repo_path(repo['dir'])
+    revs = CatFileBatch(repo_dir)
+    try:
+        merged = False
+        if repo.get('precheck'):
+            # Before any remote is changed or anything fetched, see `precheck_steps`
+            origin_hash, source_hash, merged = yield from precheck_steps(repo, repo_dir, revs)
+            if merged:
+                return already_fixed_status(repo, origin_hash, source_hash)
+
+            last_fixed = repo.get('last_fixed')
+            if last_fixed and origin_hash == last_fixed['origin_hash'] and source_hash == last_fixed['source_hash']:
+                return {
+                    'code': 0,
+                    'err': '',
+                    'out': "{name} unchanged since last fix".format(**repo),
+                    'origin_hash': origin_hash,
+                    'source_hash': source_hash,
+                }
+
+        remotes = (yield git_step(arg_list = ['remote'],
+                                  error_message = ErrorMessage("{name} cannot list remotes", repo),
+                                  verbose = repo['verbose'],
+                                  cwd = repo_dir))['out'].decode("utf-8").split()
+
+        if repo['source_remote'] in remotes:
+            yield git_step(arg_list = ['remote', 'set-url', repo['source_remote'], repo['source']],
+                           error_message = ErrorMessage("{name} cannot set-url of `source_remote` to `source`", repo),
+                           verbose = repo['verbose'],
+                           cwd = repo_dir)
+        else:
+            yield git_step(arg_list = ['remote', 'add', repo['source_remote'], repo['source']],
+                           error_message = ErrorMessage("{name} cannot add `source_remote` or `source`", repo),
+                           verbose = repo['verbose'],
+                           cwd = repo_dir)
+
+        # Merging onto, or skipping because of, a stale `origin_remote/origin_branch` would lose upstream commits
+        yield git_step(arg_list = fetch_origin_args(repo),
+                       error_message = ErrorMessage("{name} cannot fetch `origin_remote` or `origin_branch`", repo),
+                       verbose = repo['verbose'],
+                       cwd = repo_dir)
+
+        if merged is None:
+            # `origin_branch` moved upstream, it may have merged `source_branch` itself
+            if (yield from merged_steps(repo, repo_dir, revs, origin_hash, source_hash)):
+                return already_fixed_status(repo, origin_hash, source_hash)
+
+        if repo.get('source_cache'):
+            # Local fetch from prefetched cache, see `lib.prefetch`
+            yield git_step(arg_list = ['fetch', '--quiet', repo['source_cache'],
+                                       "+refs/heads/*:refs/remotes/{source_remote}/*".format(**repo)],
+                           error_message = ErrorMessage("{name} cannot fetch `source_cache`", repo),
+                           verbose = repo['verbose'],
+                           cwd = repo_dir)
+        else:
+            yield git_step(arg_list = fetch_source_args(repo, ["--depth={fetch_depth}".format(**repo)] if repo.get('fetch_depth') else []),
+                           error_message = ErrorMessage("{name} cannot fetch `source_remote` or `source_branch`", repo),
+                           verbose = repo['verbose'],
+                           cwd = repo_dir)
+
+        if repo.get('last_fixed'):
+            origin_hash, source_hash = tips(repo, revs)
+            if origin_hash == repo['last_fixed']['origin_hash'] and source_hash == repo['last_fixed']['source_hash']:
+                return {
+                    'code': 0,
+                    'err': '',
+                    'out': "{name} unchanged since last fix".format(**repo),
+                    'origin_hash': origin_hash,
+                    'source_hash': source_hash,
+                }
+
+        latest_hash, source_hash = tips(repo, revs)
+        if not latest_hash:
+            raise GitException("{name} cannot retrieve hash for `origin_remote` or `origin_branch`".format(**repo),
+                               missing_status("{origin_remote}/{origin_branch}".format(**repo)))
+
+        if not source_hash:
+            raise GitException("{name} cannot retrieve hash for `source_remote` or `source_branch`".format(**repo),
+                               missing_status("{source_remote}/{source_branch}".format(**repo)))
+
+        if repo.get('polled_origin_hash') and latest_hash != repo['polled_origin_hash']:
+            # Moved again since polled, the next poll picks the new tip up
+            message = "{name} `origin_branch` moved to {latest_hash} since polled at {polled_origin_hash}".format(
+                latest_hash = latest_hash, **repo)
+            raise GitException(message, {'code': 1, 'out': b'', 'err': message.encode('utf-8')})
+
+        if repo.get('fetch_depth') and not repo.get('source_cache'):
+            yield from deepen_steps(repo, repo_dir, source_hash, latest_hash)
+
+        cache_key = None
+        cached = None
+        if merge_cache is not None:
+            from lib.cache import merge_key
+            cache_key = merge_key(latest_hash, source_hash, repo.get('merge_strategy'))
+            cached = merge_cache.get(cache_key)
+
+        preflight = None
+        if cached and cached.get('conflicts'):
+            preflight = dict(cached['conflicts'], source_hash = source_hash, latest_hash = latest_hash, cached = True)
+        elif repo.get('preflight') or (cache_key and not cached and not repo.get('merge_strategy')):
+            # `git merge-tree` finds conflicts without a working tree, so they may be cached as well
+            from lib.preflight import preflight_steps
+            preflight = yield from preflight_steps(repo, repo_dir, source_hash, latest_hash)
+
+        if preflight and (preflight['class'] == 'conflicting' or (preflight['class'] == 'trivial' and not repo.get('merge_strategy'))):
+            from lib.preflight import preflight_status
+            if cache_key and not cached:
+                merge_cache.put(cache_key, merge_entry(repo, source_hash, latest_hash, conflicts = preflight))
+
+            raise GitException("{name} preflight found {count} {kind} paths merging `latest_hash` {latest_hash}".format(
+                count = preflight['count'], kind = preflight['class'], latest_hash = latest_hash, **repo),
+                preflight_status(preflight))
+
+        merge_hash = None
+        if cached and cached.get('tree'):
+            merge_hash = yield from cached_merge_steps(repo, repo_dir, revs, cached, source_hash, latest_hash)
+
+        # Cached outcome stands in for merging, whichever `merge_mode` produced it
+        merge_cached = merge_hash is not None
+        if not merge_cached:
+            if preflight and preflight['class'] == 'clean':
+                merge_hash = yield from commit_tree_steps(repo, repo_dir, preflight['tree'], source_hash, latest_hash)
+            elif repo.get('merge_mode') == 'merge_tree' and not repo.get('merge_strategy'):
+                merge_hash = yield from merge_tree_steps(repo, repo_dir, source_hash, latest_hash)
+
+            if merge_hash is None:
+                merge_hash = yield from checkout_merge_steps(repo, repo_dir, source_hash, latest_hash)
+
+        if cache_key and merge_hash != (cached or {}).get('commit'):
+            merge_cache.put(cache_key, merge_entry(repo, source_hash, latest_hash, commit = merge_hash, tree = revs.resolve(
+                "{merge_hash}^{{tree}}".format(merge_hash = merge_hash))))
+
+        pending_push = None
+        out_message = "{name} skipped pushing to `origin_remote` `origin_branch`".format(**repo)
+        if repo['no_push']:
+            pass
+        elif repo.get('push_stage'):
+            remote_url = (yield git_step(arg_list = ['remote', 'get-url', repo['origin_remote']],
+                                         error_message = ErrorMessage("{name} cannot get-url of `origin_remote`", repo),
+                                         verbose = repo['verbose'],
+                                         cwd = repo_dir))['out'].decode("utf-8").strip()
+            pending_push = {
+                'remote_url': remote_url,
+                'refspec': "{merge_hash}:refs/heads/{origin_branch}".format(merge_hash = merge_hash, **repo),
+                'lease': push_lease(repo, latest_hash),
+            }
+            out_message = "{name} queued push to `origin_remote` `origin_branch`".format(**repo)
+        else:
+            yield git_step(arg_list = ['push', push_lease(repo, latest_hash), repo['origin_remote'], "{merge_hash}:refs/heads/{origin_branch}".format(
+                               merge_hash = merge_hash, **repo)],
+                           error_message = ErrorMessage("{name} cannot push `origin_remote` or `origin_branch`", repo),
+                           verbose = repo['verbose'],
+                           cwd = repo_dir)
+
+            out_message = "Finished fixing {dir}".format(dir = repo['dir'])
+
+        origin_hash, source_hash = tips(repo, revs)
+        status = {
+            'code': 0,
+            'err': '',
+            'out': out_message,
+            'merge_hash': merge_hash,
+            'origin_hash': origin_hash,
+            'source_hash': source_hash,
+        }
+        if preflight:
+            status['preflight_result'] = preflight
+
+        if merge_cached:
+            status['merge_cached'] = True
+
+        if pending_push:
+            status['pending_push'] = pending_push
+
+        return status
+    finally:
+        revs.close()
+
+
+def already_fixed_status(repo, origin_hash, source_hash):
+    """
+    **Returns** dictionary similar to `run(cmd)` function output, for a `repo` whose `source_branch` is already merged into `origin_branch`
+    """
+    return {
+        'code': 0,
+        'err': '',
+        'out': "{name} already fixed, `source_branch` is merged into `origin_branch`".format(**repo),
+        'origin_hash': origin_hash,
+        'source_hash': source_hash,
+    }
+
+
+def push_lease(repo, latest_hash):
+    """
+    **Returns** `git push` option that only replaces `origin_branch` while it still points at `latest_hash`, the tip the merge was built upon, so commits pushed upstream meanwhile are never dropped
+
+    **Example**
+
+        push_lease({'origin_branch': 'master'}, 'a8aaab3...')
+        #> '--force-with-lease=refs/heads/master:a8aaab3...'
+    """
+    return "--force-with-lease=refs/heads/{origin_branch}:{latest_hash}".format(latest_hash = latest_hash, **repo)
+
+
+def fetch_origin_args(repo, extra_args = None):
+    """
+    **Returns** Git arguments that fetch only `origin_branch` of `origin_remote`
+
+    **Example**
+
+        fetch_origin_args({'origin_remote': 'origin', 'origin_branch': 'master'}, ['--deepen=50'])
+        #> ['fetch', '--deepen=50', 'origin', '+refs/heads/master:refs/remotes/origin/master']
+    """
+    return ['fetch'] + (extra_args or []) + [
+        repo['origin_remote'], "+refs/heads/{origin_branch}:refs/remotes/{origin_remote}/{origin_branch}".format(**repo)]
+
+
+def fetch_source_args(repo, extra_args = None):
     """
-    os_cd(repo['dir'])
+    **Returns** Git arguments that fetch `source_remote`, limited by `fetch_no_tags`, `fetch_filter`, and `fetch_single_branch` of `repo`
 
-    git(arg_list = ['remote', 'add', repo['source_remote'], repo['source']],
-        error_message = "{name} cannot add `source_remote` or `source`".format(**repo),
-        verbose = repo['verbose'])
+    **Example**
+
+        fetch_source_args({'source_remote': 'source', 'source_branch': 'master', 'fetch_single_branch': True, 'fetch_no_tags': True}, ['--depth=50'])
+        #> ['fetch', '--no-tags', '--depth=50', 'source', '+refs/heads/master:refs/remotes/source/master']
+    """
+    arg_list = ['fetch']
+    if repo.get('fetch_no_tags'):
+        arg_list.append('--no-tags')
+
+    if repo.get('fetch_filter'):
+        arg_list.append("--filter={fetch_filter}".format(**repo))
+
+    arg_list.extend(extra_args or [])
+    arg_list.append(repo['source_remote'])
+    if repo.get('fetch_single_branch'):
+        arg_list.append("+refs/heads/{source_branch}:refs/remotes/{source_remote}/{source_branch}".format(**repo))
+
+    return arg_list
+
+
+def read_shallow(path):
+    """
+    **Returns** set of shallow boundary commits listed within `shallow` file at `path`, empty if there is no such file
+    """
+    if not os.path.isfile(path):
+        return set()
+
+    with open(path, 'r') as shallow_fd:
+        return set(shallow_fd.read().split())
+
+
+def unrelated_status(repo, latest_hash):
+    """
+    **Returns** dictionary similar to `run(cmd)` function output, for `GitException` when `source_branch` and `latest_hash` share no history
+    """
+    return {
+        'code': 1,
+        'out': b'',
+        'err': "fatal: refusing to merge unrelated histories, {source_remote}/{source_branch} and {latest_hash}".format(
+            latest_hash = latest_hash, **repo).encode('utf-8'),
+    }
+
+
+def deepen_steps(repo, repo_dir, source_hash, latest_hash):
+    """
+    Generator of `git_step` arguments that deepen a `fetch_depth` limited fetch of `source_remote`, and a shallow `origin_remote`, doubling the depth each time, until `source_hash` and `latest_hash` share a merge base or history is complete
 
-    # git(arg_list = ['fetch', repo['source_remote'], "{source_branch}:{source_remote}/{source_branch}".format(**repo)],
-    git(arg_list = ['fetch', repo['source_remote']],
-        error_message = "{name} cannot fetch `source_remote` or `source_branch`".format(**repo),
-        verbose = repo['verbose'])
+    After `max_deepen` rounds the rest of history is fetched via `--unshallow`; a round that does not move the shallow boundary means history is already complete
 
-    # Notice, the following two variables are probably considered _porcelain_ for Git CLI
-    latest_hash = git(
-        arg_list = ['log', '-1', '--format="%h"', "{origin_remote}/{origin_branch}".format(
-            origin_remote = repo['origin_remote'],
-            origin_branch = repo['origin_branch'])],
-        error_message = "{name} cannot retrieve hash for `origin_remote` or `origin_branch`".format(**repo),
-        verbose = repo['verbose']
-    )['out'].decode("utf-8")
+    **Returns** number of times the fetch was deepened
 
-    source_hash = git(
-        arg_list = ['log', '-1', '--format="%h"', "{source_remote}/{source_branch}".format(**repo)],
-        error_message = "{name} cannot retrieve hash for `source_remote` or `source_branch`".format(**repo),
-        verbose = repo['verbose']
-    )['out'].decode("utf-8")
+    **Throws/Raises** `GitException` if histories turn out to be unrelated
+    """
+    depth = repo['fetch_depth']
+    deepened = 0
+    boundary = None
+    shallow_path = None
+    unshallowed = False
+    while True:
+        merge_base = (yield git_step(arg_list = ['merge-base', latest_hash, source_hash],
+                                     error_message = ErrorMessage("{name} cannot find merge base of `latest_hash` {latest_hash}", repo, latest_hash = latest_hash),
+                                     verbose = repo['verbose'],
+                                     cwd = repo_dir))['out'].decode("utf-8").strip()
+        if merge_base:
+            return deepened
+
+        shallow = (yield git_step(arg_list = ['rev-parse', '--is-shallow-repository'],
+                                  error_message = ErrorMessage("{name} cannot check for shallow history", repo),
+                                  verbose = repo['verbose'],
+                                  cwd = repo_dir))['out'].decode("utf-8").strip()
+        if shallow != 'true' and not deepened:
+            # Histories are unrelated, `git merge` reports that better than we could
+            return deepened
+
+        if shallow_path is None:
+            shallow_path = os.path.join(repo_dir, (yield git_step(arg_list = ['rev-parse', '--git-path', 'shallow'],
+                                                                  error_message = ErrorMessage("{name} cannot find shallow file", repo),
+                                                                  verbose = repo['verbose'],
+                                                                  cwd = repo_dir))['out'].decode("utf-8").strip())
+
+        # Shallowness of `origin` alone keeps the repository shallow, so progress is judged by the boundary instead
+        last_boundary, boundary = boundary, read_shallow(shallow_path)
+        if shallow != 'true' or unshallowed or boundary == last_boundary:
+            raise GitException("{name} `source_branch` shares no history with `latest_hash` {latest_hash}".format(
+                latest_hash = latest_hash, **repo), unrelated_status(repo, latest_hash))
+
+        # A shallow clone of `origin` hides merge bases as well, so both sides are deepened
+        if deepened >= max_deepen:
+            for arg_list in (fetch_source_args(repo, ['--unshallow']), fetch_origin_args(repo, ['--unshallow'])):
+                shallow = (yield git_step(arg_list = ['rev-parse', '--is-shallow-repository'],
+                                          error_message = ErrorMessage("{name} cannot check for shallow history", repo),
+                                          verbose = repo['verbose'],
+                                          cwd = repo_dir))['out'].decode("utf-8").strip()
+                if shallow == 'true':
+                    yield git_step(arg_list = arg_list,
+                                   error_message = ErrorMessage("{name} cannot unshallow fetch", repo),
+                                   verbose = repo['verbose'],
+                                   cwd = repo_dir)
+            unshallowed = True
+        else:
+            yield git_step(arg_list = fetch_source_args(repo, ["--deepen={depth}".format(depth = depth)]),
+                           error_message = ErrorMessage("{name} cannot deepen fetch of `source_remote` or `source_branch`", repo),
+                           verbose = repo['verbose'],
+                           cwd = repo_dir)
+            yield git_step(arg_list = fetch_origin_args(repo, ["--deepen={depth}".format(depth = depth)]),
+                           error_message = ErrorMessage("{name} cannot deepen fetch of `origin_remote` or `origin_branch`", repo),
+                           verbose = repo['verbose'],
+                           cwd = repo_dir)
+            depth *= 2
 
-    if not latest_hash or not source_hash:
-        ValueError("cannot obtain `latest_hash` or `source_hash`")
+        deepened += 1
 
-    git(arg_list = ['checkout', source_hash],
-        error_message = "{name} cannot checkout last hash for `source_remote` or `source_remote`".format(**repo),
-        verbose = repo['verbose'])
 
-    git(arg_list = ['checkout', '-b', "{fix_branch}".format(fix_branch = repo['fix_branch'])],
-        error_message = "{name} cannot checkout `fix_branch` or `fix_branch`".format(**repo),
-        verbose = repo['verbose'])
+def remove_stale_worktrees_steps(repo, repo_dir):
+    """
+    Generator of `git_step` arguments that remove temporary worktrees earlier `worktree` mode runs left for `repo`, eg. with conflicts nobody resolved, then prune those whose directories are already gone
+
+    A left worktree would otherwise leak, and keep `fix_branch` checked out so the next run cannot `checkout -B` it
+    """
+    prefix = os.path.join(os.path.realpath(tempfile.gettempdir()), "fix_logs-{name}-".format(**repo))
+    out = (yield git_step(arg_list = ['worktree', 'list', '--porcelain'],
+                          error_message = ErrorMessage("{name} cannot list worktrees", repo),
+                          verbose = repo['verbose'],
+                          cwd = repo_dir))['out'].decode("utf-8")
+
+    for line in out.splitlines():
+        work_dir = line[len('worktree '):] if line.startswith('worktree ') else ''
+        if work_dir and os.path.realpath(work_dir).startswith(prefix):
+            yield git_step(arg_list = ['worktree', 'remove', '--force', work_dir],
+                           error_message = ErrorMessage("{name} cannot remove stale `worktree` {work_dir}", repo, work_dir = work_dir),
+                           verbose = repo['verbose'],
+                           cwd = repo_dir)
+
+    yield git_step(arg_list = ['worktree', 'prune'],
+                   error_message = ErrorMessage("{name} cannot prune worktrees", repo),
+                   verbose = repo['verbose'],
+                   cwd = repo_dir)
+
+
+def checkout_merge_steps(repo, repo_dir, source_hash, latest_hash):
+    """
+    Generator of `git_step` arguments that merge `latest_hash` into `source_hash` on `fix_branch`, then merge `fix_branch` onto `origin_remote/origin_branch`
+
+    Runs within `repo_dir` working tree, or within a temporary `git worktree` when `repo['merge_mode']` is `worktree`; a worktree left with conflicts is kept and its path saved to `repo['worktree']` for `merge_failed.py`, until the next run of `repo` removes it, see `remove_stale_worktrees_steps`
+
+    **Returns** full hash of merged `HEAD`
+    """
+    work_dir = repo_dir
+    if repo.get('merge_mode') == 'worktree':
+        yield from remove_stale_worktrees_steps(repo, repo_dir)
+        work_dir = tempfile.mkdtemp(prefix = "fix_logs-{name}-".format(**repo))
+        yield git_step(arg_list = ['worktree', 'add', '--detach', work_dir, source_hash],
+                       error_message = ErrorMessage("{name} cannot add `worktree`", repo),
+                       verbose = repo['verbose'],
+                       cwd = repo_dir)
+        repo['worktree'] = work_dir
+
+    yield git_step(arg_list = ['checkout', source_hash],
+                   error_message = ErrorMessage("{name} cannot checkout last hash for `source_remote` or `source_remote`", repo),
+                   verbose = repo['verbose'],
+                   cwd = work_dir)
+
+    yield git_step(arg_list = ['checkout', '-B', "{fix_branch}".format(fix_branch = repo['fix_branch'])],
+                   error_message = ErrorMessage("{name} cannot checkout `fix_branch` or `fix_branch`", repo),
+                   verbose = repo['verbose'],
+                   cwd = work_dir)
 
     if repo.get('merge_strategy'):
-        git(arg_list = ['merge', "-X{merge_strategy}".format_map(**repo), latest_hash],
-            error_message = "{name} cannot merge `latest_hash` {latest_hash}".format(
-                latest_hash = latest_hash, **repo),
-            verbose = repo['verbose'])
+        yield git_step(arg_list = ['merge', "-X{merge_strategy}".format(**repo), latest_hash],
+                       error_message = ErrorMessage("{name} cannot merge `latest_hash` {latest_hash}", repo, latest_hash = latest_hash),
+                       verbose = repo['verbose'],
+                       cwd = work_dir)
     else:
-        git(arg_list = ['merge', latest_hash],
-            error_message = "{name} cannot merge `latest_hash` {latest_hash}".format(
-                latest_hash = latest_hash, **repo),
-            verbose = repo['verbose'])
+        yield git_step(arg_list = ['merge', latest_hash],
+                       error_message = ErrorMessage("{name} cannot merge `latest_hash` {latest_hash}", repo, latest_hash = latest_hash),
+                       verbose = repo['verbose'],
+                       cwd = work_dir)
+
+    yield git_step(arg_list = ['commit', '-m', "{fix_commit}".format(fix_commit = repo['fix_commit'])],
+                   error_message = ErrorMessage("{name} cannot commit to `fix_branch`", repo),
+                   verbose = repo['verbose'],
+                   cwd = work_dir)
+
+    yield git_step(arg_list = ['checkout', "{origin_remote}/{origin_branch}".format(**repo)],
+                   error_message = ErrorMessage("{name} cannot checkout `origin_remote` or `origin_branch`", repo),
+                   verbose = repo['verbose'],
+                   cwd = work_dir)
+
+    yield git_step(arg_list = ['merge', repo['fix_branch']],
+                   error_message = ErrorMessage("{name} cannot auto-merge `fix_branch`", repo),
+                   verbose = repo['verbose'],
+                   cwd = work_dir)
 
-    git(arg_list = ['commit', '-m', "{fix_commit}".format(fix_commit = repo['fix_commit'])],
-        error_message = "{name} cannot commit to `fix_branch`".format(**repo),
-        verbose = repo['verbose'])
+    if not repo['keep_fix_branch']:
+        yield git_step(arg_list = ['branch', '--delete', repo['fix_branch']],
+                       error_message = ErrorMessage("{name} cannot delete `fix_branch`", repo),
+                       verbose = repo['verbose'],
+                       cwd = work_dir)
 
-    git(arg_list = ['checkout', "{origin_remote}/{origin_branch}".format(**repo)],
-        error_message = "{name} cannot checkout `origin_remote` or `origin_branch`".format(**repo),
-        verbose = repo['verbose'])
+    merge_hash = (yield git_step(arg_list = ['rev-parse', 'HEAD'],
+                                 error_message = ErrorMessage("{name} cannot resolve merged `HEAD`", repo),
+                                 verbose = repo['verbose'],
+                                 cwd = work_dir))['out'].decode("utf-8").strip()
 
-    git(arg_list = ['merge', repo['fix_branch']],
-        error_message = "{name} cannot auto-merge `fix_branch`".format(**repo),
-        verbose = repo['verbose'])
+    if repo.get('worktree'):
+        yield git_step(arg_list = ['worktree', 'remove', '--force', work_dir],
+                       error_message = ErrorMessage("{name} cannot remove `worktree` {worktree}", repo),
+                       verbose = repo['verbose'],
+                       cwd = repo_dir)
+        del repo['worktree']
 
-    if not repo['keep_fix_branch']:
-        git(arg_list = ['branch', '--delete', repo['fix_branch']],
-            error_message = "{name} cannot delete `fix_branch`".format(**repo),
-            verbose = repo['verbose'])
+    return merge_hash
 
-    out_message = "Finished fixing {dir}".format(dir = repo['dir'])
-    if not repo['no_push']:
-        git(arg_list = ['push', '--force', repo['origin_remote'], repo['origin_branch']],
-            error_message = "{name} cannot push `origin_remote` or `origin_branch`".format(**repo),
-            verbose = repo['verbose'])
 
-        out_message = "{name} skipped pushing to `source_remote` `source_branch`".format(**repo)
+def merge_tree_steps(repo, repo_dir, source_hash, latest_hash):
+    """
+    Generator of `git_step` arguments that merge without any working tree, via `git merge-tree --write-tree` and `git commit-tree`
+
+    The merge commit has `source_hash` and `latest_hash` as parents, same as `checkout_merge_steps` results; `fix_branch` is only written if `keep_fix_branch` is set
+
+    **Returns** full hash of merge commit, or `None` if there are conflicts that need a working tree
+    """
+    status = yield git_step(arg_list = ['merge-tree', '--write-tree', '--no-messages', source_hash, latest_hash],
+                            error_message = ErrorMessage("{name} cannot merge-tree `latest_hash` {latest_hash}", repo, latest_hash = latest_hash),
+                            verbose = repo['verbose'],
+                            cwd = repo_dir)
+    if status['code'] != 0:
+        return None
+
+    tree_hash = status['out'].decode("utf-8").splitlines()[0].strip()
+    return (yield from commit_tree_steps(repo, repo_dir, tree_hash, source_hash, latest_hash))
+
+
+def cached_merge_steps(repo, repo_dir, revs, cached, source_hash, latest_hash):
+    """
+    Generator of `git_step` arguments that reuse a `lib.cache.MergeCache` entry, `cached`, instead of merging again
+
+    The cached merge commit is reused if it still exists within `repo_dir` and has the same `fix_commit` message, otherwise the cached tree is committed anew via `commit_tree_steps`
+
+    **Returns** full hash of merge commit, or `None` if neither object exists, eg. after `git gc` pruned an unpushed commit
+    """
+    if cached.get('commit') and cached.get('fix_commit') == repo['fix_commit'] and revs.resolve(cached['commit']):
+        if repo['keep_fix_branch']:
+            yield git_step(arg_list = ['branch', '--force', repo['fix_branch'], cached['commit']],
+                           error_message = ErrorMessage("{name} cannot point `fix_branch` at merge", repo),
+                           verbose = repo['verbose'],
+                           cwd = repo_dir)
+
+        return cached['commit']
+
+    if not revs.resolve(cached['tree']):
+        return None
 
+    return (yield from commit_tree_steps(repo, repo_dir, cached['tree'], source_hash, latest_hash))
+
+
+def merge_entry(repo, source_hash, latest_hash, commit = None, tree = None, conflicts = None):
+    """
+    **Returns** dictionary to store within `lib.cache.MergeCache` for merging `latest_hash` into `source_hash` of `repo`
+    """
     return {
-        'code': 0,
-        'err': '',
-        'out': out_message
+        'origin_hash': latest_hash,
+        'source_hash': source_hash,
+        'merge_strategy': repo.get('merge_strategy'),
+        'tree': tree,
+        'commit': commit,
+        'fix_commit': repo['fix_commit'],
+        'conflicts': conflicts,
     }
 
 
-def fix_merge(repo):
+def commit_tree_steps(repo, repo_dir, tree_hash, source_hash, latest_hash):
+    """
+    Generator of `git_step` arguments that commit an already merged `tree_hash`, with `source_hash` and `latest_hash` as parents
+
+    **Returns** full hash of merge commit
     """
+    merge_hash = (yield git_step(arg_list = ['commit-tree', tree_hash, '-p', source_hash, '-p', latest_hash,
+                                             '-m', repo['fix_commit']],
+                                 error_message = ErrorMessage("{name} cannot commit-tree for `fix_branch`", repo),
+                                 verbose = repo['verbose'],
+                                 cwd = repo_dir))['out'].decode("utf-8").strip()
+
+    if repo['keep_fix_branch']:
+        yield git_step(arg_list = ['branch', '--force', repo['fix_branch'], merge_hash],
+                       error_message = ErrorMessage("{name} cannot point `fix_branch` at merge", repo),
+                       verbose = repo['verbose'],
+                       cwd = repo_dir)
+
+    return merge_hash
+
+
+def precheck_steps(repo, repo_dir, revs):
+    """
+    Generator of `git_step` arguments that check, without changing remotes, fetching, or checking out anything, if `source_branch` tip is already reachable from the current `origin_branch` tip
+
+    Both tips are read via `git ls-remote` against configured URLs, the `source_branch` tip from `repo['source_cache']` instead when prefetched; `merged` is only decided locally, through `revs`, a `CatFileBatch` instance, so an `origin_branch` that moved upstream is only compared once fetched
+
+    **Returns** tuple of `(origin_hash, source_hash, merged)`, hashes may be empty strings if a branch does not exist, and `merged` is `None` while `origin_hash` has not been fetched, see `merged_steps`
+    """
+    if repo.get('source_cache'):
+        source_hash = (yield git_step(
+            arg_list = ['rev-parse', '--verify', '--quiet', "refs/heads/{source_branch}".format(**repo)],
+            error_message = ErrorMessage("{name} cannot resolve `source_branch` within `source_cache`", repo),
+            verbose = repo['verbose'],
+            cwd = repo['source_cache']
+        ))['out'].decode("utf-8").strip()
+    else:
+        source_hash = (yield git_step(
+            arg_list = ['ls-remote', repo['source'], "refs/heads/{source_branch}".format(**repo)],
+            error_message = ErrorMessage("{name} cannot ls-remote `source` for `source_branch`", repo),
+            verbose = repo['verbose'],
+            cwd = repo_dir
+        ))['out'].decode("utf-8").split('\t')[0].strip()
+
+    origin_hash = (yield git_step(
+        arg_list = ['ls-remote', repo['origin_remote'], "refs/heads/{origin_branch}".format(**repo)],
+        error_message = ErrorMessage("{name} cannot ls-remote `origin_remote` for `origin_branch`", repo),
+        verbose = repo['verbose'],
+        cwd = repo_dir
+    ))['out'].decode("utf-8").split('\t')[0].strip()
+
+    merged = yield from merged_steps(repo, repo_dir, revs, origin_hash, source_hash)
+    return origin_hash, source_hash, merged
+
+
+def merged_steps(repo, repo_dir, revs, origin_hash, source_hash):
+    """
+    Generator of `git_step` arguments that check if `source_hash` is reachable from `origin_hash`, looking both up locally through `revs`, a `CatFileBatch` instance
+
+    **Returns** `True` or `False`, or `None` while `origin_hash` has not been fetched
+    """
+    if not source_hash or not origin_hash:
+        return False
+
+    if not revs.resolve(origin_hash):
+        return None
+
+    # Commits never fetched cannot be ancestors of local ones, and `merge-base` would error on them
+    if not revs.resolve(source_hash):
+        return False
+
+    status = yield git_step(arg_list = ['merge-base', '--is-ancestor', source_hash, origin_hash],
+                            error_message = ErrorMessage("{name} cannot compare `source_branch` with `origin_branch`", repo),
+                            verbose = repo['verbose'],
+                            cwd = repo_dir)
+    return status['code'] == 0
+
+
+def tips(repo, revs):
+    """
+    Resolves full hashes of `origin_remote/origin_branch` and `source_remote/source_branch` via `revs`, a `CatFileBatch` instance
+
+    **Returns** tuple of `(origin_hash, source_hash)`, either may be an empty string if the ref does not exist
+    """
+    return (
+        revs.resolve("refs/remotes/{origin_remote}/{origin_branch}".format(**repo)),
+        revs.resolve("refs/remotes/{source_remote}/{source_branch}".format(**repo)),
+    )
+
+
+def missing_status(rev):
+    """
+    **Returns** dictionary similar to `run(cmd)` function output, for `GitException` when `rev` cannot be resolved
+    """
+    return {
+        'code': 128,
+        'out': b'',
+        'err': "fatal: cannot resolve {rev}".format(rev = rev).encode('utf-8')
+    }
+
+
+def fix_merge_steps(repo):
+    """
+    Generator of `git_step` arguments that run `git mergetool` and push `repo`
+
     **Returns** dictionary similar to `run(cmd)` function output
 
     **Parameters**
@@ -361,14 +1737,22 @@ def fix_merge(repo):
 
         Cannot obtain `latest_hash` or `source_hash`
     """
-    git(['mergetool'], "cannot resolve conflicts", True)
-    out_message = "Finished fixing {dir}".format(dir = repo['dir'])
+    repo_dir = repo_path(repo['dir'])
+    yield git_step(['mergetool'], "cannot resolve conflicts", True, cwd = repo_dir)
+    out_message = "{name} skipped pushing to `origin_remote` `origin_branch`".format(**repo)
     if not repo['no_push']:
-        git(arg_list = ['push', '--force', repo['origin_remote'], repo['origin_branch']],
-            error_message = "{name} cannot push `origin_remote` or `origin_branch`".format(**repo),
-            verbose = repo['verbose'])
+        # The merge was built upon the tip `fix_log_steps` fetched, anything pushed since must not be overwritten
+        latest_hash = (yield git_step(arg_list = ['rev-parse', '--verify', "refs/remotes/{origin_remote}/{origin_branch}".format(**repo)],
+                                      error_message = ErrorMessage("{name} cannot retrieve hash for `origin_remote` or `origin_branch`", repo),
+                                      verbose = repo['verbose'],
+                                      cwd = repo_dir))['out'].decode("utf-8").strip()
 
-        out_message = "{name} skipped pushing to `source_remote` `source_branch`".format(**repo)
+        yield git_step(arg_list = ['push', push_lease(repo, latest_hash), repo['origin_remote'], "HEAD:{origin_branch}".format(**repo)],
+                       error_message = ErrorMessage("{name} cannot push `origin_remote` or `origin_branch`", repo),
+                       verbose = repo['verbose'],
+                       cwd = repo_dir)
+
+        out_message = "Finished fixing {dir}".format(dir = repo['dir'])
 
     return {
         'code': 0,
@@ -377,22 +1761,222 @@ def fix_merge(repo):
     }
 
 
+def fix_log(repo):
+    """
+    Attempts to fix git log for `repo` by running `fix_log_steps` via `git` function
+
+    **Returns** dictionary similar to `run(cmd)` function output
+
+    **Throws/Raises** `GitException`
+    """
+    return run_git_steps(fix_log_steps(repo))
+
+
+async def async_fix_log(repo, limiter = None):
+    """
+    Asyncio version of `fix_log`, `limiter` is passed to `async_git` function
+    """
+    return await async_run_git_steps(fix_log_steps(repo), limiter = limiter)
+
+
+def fix_merge(repo):
+    """
+    Runs `fix_merge_steps` via `git` function
+
+    **Returns** dictionary similar to `run(cmd)` function output
+
+    **Throws/Raises** `GitException`
+    """
+    return run_git_steps(fix_merge_steps(repo))
+
+
+async def async_fix_merge(repo, limiter = None):
+    """
+    Asyncio version of `fix_merge`, `limiter` is passed to `async_git` function
+    """
+    return await async_run_git_steps(fix_merge_steps(repo), limiter = limiter)
+
+
+def load_last_fixed(repo_configs, state, force = False):
+    """
+    Sets `repo_configs['last_fixed']` hashes from `state` journal, unless `force` is set
+    """
+    if state is None or force:
+        return
+
+    record = state.last_fixed(repo_configs)
+    if record:
+        repo_configs['last_fixed'] = {
+            'origin_hash': record['origin_hash'],
+            'source_hash': record['source_hash'],
+        }
+
+
+def record_state(result, state):
+    """
+    Appends `result` tuple, from `repo_failed` or `repo_fixed`, to `state` journal if defined
+
+    Results with a `pending_push` are recorded once `lib.push.PushScheduler` finishes pushing them
+
+    **Returns** `result` unchanged
+    """
+    if state is not None and not result[0].get('pending_push'):
+        state.record(*result)
+
+    return result
+
+
+def repo_failed(repo_configs, e):
+    """
+    Collects `GitException` details of `repo_configs`, classified via `lib.retry.classify_status`
+
+    **Returns** tuple of `(RepoResult, False)`
+    """
+    from lib.retry import classify_status
+    status = decode_status(e.status)
+    result = RepoResult(repo_configs,
+                        message = e.message,
+                        code = status['code'],
+                        err = status['err'],
+                        out = status['out'],
+                        out_log = status.get('out_log'),
+                        err_log = status.get('err_log'),
+                        timed_out = status.get('timed_out'),
+                        error_class = classify_status(e.status),
+                        retries = current_retries.get() or None,
+                        preflight_result = status.get('preflight_result'))
+    if repo_configs['verbose']:
+        print("{error_message}".format(error_message = e.message))
+
+    return result, False
+
+
+def repo_fixed(repo_configs, status):
+    """
+    Collects `status` of a successful fix of `repo_configs`
+
+    **Returns** tuple of `(RepoResult, True)`
+    """
+    result = RepoResult(repo_configs, retries = current_retries.get() or None, **status)
+    if repo_configs['verbose']:
+        print("Fixed: {name}".format(**repo_configs))
+
+    return result, True
+
+
+def fix_repo(defaults, repo, state = None):
+    """
+    Consolidates configurations for, and attempts to fix, a single `repo`
+
+    **Parameters**
+
+    - `defaults` Dictionary, passed to `consolidate_repo_configs`
+    - `repo` Dictionary, single entry from `config['repos']`
+    - `state` optional `lib.state.RunState`, skips `repo` if unchanged since last fix and records outcome
+
+    **Returns** tuple of `(repo_configs, fixed)`
+
+    - `repo_configs` `RepoResult`, consolidated configurations together with status of `fix_log`
+    - `fixed` Boolean, `False` if a `GitException` was raised
+    """
+    repo_configs = consolidate_repo_configs(defaults, repo)
+    current_repo.set(repo_configs['name'])
+    current_timeouts.set(repo_configs['timeouts'])
+    current_retries.set({})
+    load_last_fixed(repo_configs, state, defaults.get('force'))
+    try:
+        status = fix_log(repo_configs)
+    except GitException as e:
+        return record_state(repo_failed(repo_configs, e), state)
+
+    return record_state(repo_fixed(repo_configs, status), state)
+
+
+async def async_fix_repo(defaults, repo, limiter, state = None):
+    """
+    Asyncio version of `fix_repo`, `limiter` is passed to `async_fix_log` function
+    """
+    repo_configs = consolidate_repo_configs(defaults, repo)
+    current_repo.set(repo_configs['name'])
+    current_timeouts.set(repo_configs['timeouts'])
+    current_retries.set({})
+    load_last_fixed(repo_configs, state, defaults.get('force'))
+    try:
+        status = await async_fix_log(repo_configs, limiter = limiter)
+    except GitException as e:
+        return record_state(repo_failed(repo_configs, e), state)
+
+    return record_state(repo_fixed(repo_configs, status), state)
+
+
+async def async_fix_repos(defaults, jobs, state = None, on_result = None):
+    """
+    Runs `async_fix_repo` for all `defaults['repos']` within one event loop
+
+    At most `jobs` Git commands run at the same time, and `on_result(repo_configs, fixed)` is called in order of `defaults['repos']`
+    """
+    import asyncio
+    limiter = asyncio.Semaphore(jobs)
+    async for repo_configs, fixed in async_bounded_map(lambda repo: async_fix_repo(defaults, repo, limiter, state),
+                                                       defaults['repos'], jobs):
+        if on_result:
+            on_result(repo_configs, fixed)
+
+
 def fix_logs_main(args):
     """
     Parses `config.json` file and loops over each repository within `config['repos']`
 
-    Writes fixed log to file defined by `config['fixed']`
+    `config['repos']`, or `args['manifest']`, may instead be the path of a JSONL manifest that is read lazily, so the first repository starts while the rest are still unread, see `lib.manifest`
+
+    With `args['shard']` set, similar to `0/4`, only repositories whose `lib.shard.shard_of` matches are fixed, and logs, journal, and timings get a `.shard-i-of-N` suffix for `merge_results.py` to combine
+
+    With `args['watch']` set, runs until interrupted, polling `source` and `origin` tips via `git ls-remote` and only fixing repositories whose tips moved, see `lib.watch`
+
+    With `args['fetch_single_branch']`, `args['fetch_no_tags']`, `args['fetch_filter']`, or `args['fetch_depth']` set, fetching `source_remote` asks for less, see `consolidate_repo_configs`
+
+    With `args['prefetch']` set, each distinct `source` is first fetched once into `args['source_cache']`, see `lib.prefetch`
+
+    With `args['object_pools']` set, prefetched caches also serve as shared object pools, and each repository borrows objects from the pool of its `source` via `objects/info/alternates`, see `lib.pools`
 
-    Writes failures log to file defined by `config['failed']`
+    Outcomes are appended to a `lib.state.RunState` journal as each repository finishes, repositories whose `origin` and `source` tips are unchanged since their last fix are skipped unless `args['force']` is set
+
+    With `args['progress']` set, repositories done, failed, and in flight, repos per minute, ETA, and the phase of each in flight repository are reported every `args['progress_interval']` seconds, and with `args['progress_listen']` set the same counters are served over HTTP or a Unix socket, see `lib.progress`
+
+    With `args['capture_limit']` set, Git commands that only report progress, eg. `fetch`, `merge`, and `push`, keep just the last `capture_limit` bytes of their output in memory while running, never fewer than `output_limit`, and with `args['logs_dir']` set spill full output there, see `lib.capture`
+
+    Each Git command is killed, with its whole process group, once it runs longer than the timeout of its phase, see `default_timeouts`; `args['timeout']` strings similar to `fetch=600` and `config['timeouts']` override them, and timed out repositories are logged to `failed` with `timed_out` seconds
+
+    Git commands failing with transient errors, eg. network drops or `index.lock` contention, are run again up to `args['retries']` times with jittered exponential backoff from `args['retry_backoff']` seconds, all within a run wide `args['retry_budget']`; failed results record their `error_class`, and all results the `retries` of each phase, see `lib.retry`
+
+    With `args['merge_cache']` set, outcomes of merging the same `origin_hash` and `source_hash`, with the same `merge_strategy`, are stored there and reused by later runs instead of merging again; conflicts are then found via `git merge-tree`, as with `args['preflight']`, and the cache is pruned to `args['merge_cache_limit']` bytes, least recently used first, after each run, see `lib.cache`
+
+    With `args['deadline']` set, no repository starts after that many seconds, those in flight still finish and are logged
+
+    With `args['timings']` set, wall time, exit code, and output sizes of every Git command are written there as JSON or CSV, see `lib.instrument`
+
+    Repositories are fixed by a pool of `args['jobs']` threads, or when `args['use_async']` is set by one event loop running at most `args['jobs']` Git commands at a time
+
+    Streams one JSON line per fixed repository to file defined by `config['fixed']`, as soon as it and those before it within `config['repos']` finish
+
+    With `args['push_stage']` set, pushes are queued to a `lib.push.PushScheduler` that drains them in the background, grouped by remote host, while merging continues; pushed results are written as they finish, so not in `config['repos']` order
+
+    With `args['preflight']` set, each merge is classified via `git merge-tree` before touching any working tree, see `lib.preflight`
+
+    Streams one JSON line per failed repository to file defined by `config['failed']`, with `out` and `err` truncated to `output_limit` characters and optionally spilled in full to `logs_dir`
 
     **Parameters**
 
-    - `config_path` String, path to `config.json` configuration file
+    - `args` Dictionary, parsed command-line arguments, eg. `config` path and `jobs` count
     """
-    git_dir = "{}".format(os.path.sep).join(__file__.split(os.path.sep)[0:-2])
+    import asyncio
     with open(args.get('config', './config.json'), 'r') as configs_fd:
         configs = json.load(configs_fd)
 
+    from lib.manifest import load_repos
+    from lib.shard import parse_shard, shard_path, ShardedRepos
+    shard = parse_shard(args.get('shard'))
+
     defaults = {
         'origin_branch': args.get('origin_branch', configs.get('origin_branch')),
         'origin_remote': args.get('origin_remote', configs.get('origin_remote')),
@@ -403,45 +1987,207 @@ def fix_logs_main(args):
         'keep_fix_branch': args.get('keep_fix_branch', configs.get('keep_fix_branch')),
         'no_push': args.get('no_push', configs.get('no_push')),
         'verbose': args.get('verbose', configs.get('verbose')),
-        'repos': configs['repos'],
+        'force': args.get('force', configs.get('force')),
+        'precheck': args.get('precheck') or configs.get('precheck'),
+        'merge_mode': args.get('merge_mode') or configs.get('merge_mode'),
+        'merge_strategy': args.get('merge_strategy') or configs.get('merge_strategy'),
+        'preflight': args.get('preflight') or configs.get('preflight'),
+        'push_stage': args.get('push_stage') or configs.get('push_stage'),
+        'fetch_depth': args.get('fetch_depth') or configs.get('fetch_depth'),
+        'fetch_filter': args.get('fetch_filter') or configs.get('fetch_filter'),
+        'fetch_no_tags': args.get('fetch_no_tags') or configs.get('fetch_no_tags'),
+        'fetch_single_branch': args.get('fetch_single_branch') or configs.get('fetch_single_branch'),
+        'timeouts': merge_timeouts(configs.get('timeouts'), parse_timeouts(args.get('timeout'))),
+        'repos': load_repos(configs, args.get('manifest')),
     }
 
-    failed_list = []
-    fixed_list = []
-    for repo in defaults['repos']:
-        repo_configs = consolidate_repo_configs(defaults, repo)
-        try:
-            status = fix_log(repo_configs)
-        except GitException as e:
-            repo_configs.update(status)
-            repo_configs.update({
-                'message': e.message,
-                'code': e.status['code'],
-                'err': e.status['err'],
-                'out': e.status['out']
+    jobs = args.get('jobs') or configs.get('jobs') or 1
+
+    from lib.instrument import Timings
+    timings = Timings()
+    if shard:
+        defaults['repos'] = ShardedRepos(defaults['repos'], shard)
+
+    deadline = first_defined(args.get('deadline'), configs.get('deadline'))
+    if deadline is not None:
+        defaults['repos'] = UntilDeadline(defaults['repos'], time.time() + deadline)
+
+    timings_path = shard_path(args.get('timings') or configs.get('timings'), shard)
+    if timings_path:
+        run_observers.append(timings.record)
+
+    global capture_policy, merge_cache, retry_policy
+    from lib.results import cap_output, ResultsWriter
+    fixed_log = ResultsWriter(shard_path(configs.get('fixed'), shard))
+    failed_log = ResultsWriter(shard_path(configs.get('failed'), shard))
+    # `output_limit` caps what results keep once written, `capture_limit` what Git commands keep while running; both spill to `logs_dir`
+    output_limit = args.get('output_limit') or configs.get('output_limit', 4096)
+    logs_dir = args.get('logs_dir') or configs.get('logs_dir')
+    capture_limit = args.get('capture_limit') or configs.get('capture_limit')
+    if capture_limit:
+        from lib.capture import CapturePolicy
+        # Never less than results keep, so `output_limit` alone decides what is logged
+        capture_policy = CapturePolicy(limit = max(capture_limit, output_limit), spill_dir = logs_dir)
+
+    if args.get('merge_cache') or configs.get('merge_cache'):
+        from lib.cache import cache_path, default_limit, MergeCache
+        merge_cache = MergeCache(cache_path(args.get('merge_cache') or configs.get('merge_cache'), configs.get('fixed')),
+                                 limit = args.get('merge_cache_limit') or configs.get('merge_cache_limit') or default_limit)
+
+    from lib.retry import transient_classes
+    # Shared by Git command retries and the push stage, so both agree on what is transient
+    retry_classes = tuple(configs.get('retry_classes') or transient_classes)
+    retries = first_defined(args.get('retries'), configs.get('retries'), 2)
+    if retries:
+        from lib.retry import RetryPolicy
+        retry_policy = RetryPolicy(retries = retries,
+                                   backoff = first_defined(args.get('retry_backoff'), configs.get('retry_backoff'), 1.0),
+                                   max_backoff = first_defined(configs.get('retry_max_backoff'), 30.0),
+                                   budget = first_defined(args.get('retry_budget'), configs.get('retry_budget'), 100),
+                                   classes = retry_classes)
+
+    preflight_counts = collections.Counter()
+    write_lock = threading.Lock()
+
+    progress = None
+    progress_reporter = None
+    progress_server = None
+    progress_listen = args.get('progress_listen') or configs.get('progress_listen')
+    if args.get('progress') or configs.get('progress') or progress_listen:
+        from lib.progress import close_server, Progress, ProgressReporter, repo_count, serve_progress
+        progress = Progress(total = repo_count(defaults['repos']))
+        start_observers.append(progress.start)
+        run_observers.append(progress.finish)
+        if args.get('progress') or configs.get('progress'):
+            progress_reporter = ProgressReporter(progress, interval = first_defined(
+                args.get('progress_interval'), configs.get('progress_interval'), 2.0))
+            progress_reporter.start()
+
+        if progress_listen:
+            progress_server = serve_progress(progress, progress_listen)
+
+    def write_result(repo_configs, fixed):
+        if repo_configs.get('pending_push'):
+            push_scheduler.submit(repo_configs)
+            return
+
+        with write_lock:
+            if progress is not None:
+                progress.done(repo_configs, fixed)
+
+            # `preflight` alone is the flag, which results without a classification fall back to
+            preflight_result = repo_configs.get('preflight_result')
+            if isinstance(preflight_result, dict):
+                preflight_counts[preflight_result['class']] += 1
+
+            cap_output(repo_configs, output_limit, logs_dir)
+            if fixed:
+                fixed_log.write(repo_configs)
+            else:
+                failed_log.write(repo_configs)
+
+    from lib.state import RunState, state_path
+    state = RunState(shard_path(state_path(args.get('state') or configs.get('state'), configs.get('fixed')), shard))
+
+    def write_pushed(repo_configs, pushed):
+        write_result(*record_state((repo_configs, pushed), state))
+
+    from lib.push import PushScheduler
+    push_scheduler = PushScheduler(on_done = write_pushed,
+                                   jobs_per_host = args.get('push_jobs') or configs.get('push_jobs') or 2,
+                                   retries = first_defined(args.get('push_retries'), configs.get('push_retries'), 3),
+                                   backoff = first_defined(args.get('push_backoff'), configs.get('push_backoff'), 1.0),
+                                   retry_classes = retry_classes,
+                                   verbose = defaults['verbose'])
+    try:
+        if args.get('watch') or configs.get('watch'):
+            from lib.watch import watch_path, watch_repos
+            # Caches would go stale between polls, so `source` is fetched directly
+            watch_repos(defaults, jobs, state, write_result, {
+                'path': watch_path(args.get('watch_state') or configs.get('watch_state'), configs.get('fixed')),
+                'interval': args.get('watch_interval') or configs.get('watch_interval') or 300.0,
+                'min_interval': args.get('watch_min_interval') or configs.get('watch_min_interval') or 60.0,
+                'max_interval': args.get('watch_max_interval') or configs.get('watch_max_interval') or 3600.0,
+                'cycles': args.get('watch_cycles') or configs.get('watch_cycles'),
+                'deadline': defaults['repos'].deadline if deadline is not None else None,
+                'on_polled': progress.release if progress is not None else None,
             })
-            failed_list.append(repo_configs)
-            if repo_configs['verbose']:
-                print("{error_message}".format(error_message = e.message))
         else:
-            repo_configs.update(status)
-            fixed_list.append(repo_configs)
-            if repo_configs['verbose']:
-                print("Fixed: {name}".format(**repo_configs))
-
-    os_cd(git_dir)
-    if failed_list and configs['failed']:
-        failed_abspath = srblib.abs_path(configs['failed'])
-        print("failed_abspath -> {}".format(failed_abspath))
-        with open(failed_abspath, 'w') as failed_fd:
-            json.dump({'failed': failed_list}, failed_fd)
-            print("Wrote failures to -> {failed}".format(**configs))
-
-    if fixed_list and configs['fixed']:
-        fixed_abspath = srblib.abs_path(configs['fixed'])
-        with open(fixed_abspath, 'w') as fixed_fd:
-            json.dump({"fixed": fixed_list}, fixed_fd)
-            print("Wrote fixes to -> {fixed}".format(configs))
+            object_pools = args.get('object_pools') or configs.get('object_pools')
+            if args.get('prefetch') or configs.get('prefetch') or object_pools:
+                from lib.prefetch import prefetch_sources
+                with timings.stage('prefetch'):
+                    defaults['source_caches'] = asyncio.run(prefetch_sources(
+                        repos = defaults['repos'],
+                        cache_dir = args.get('source_cache') or configs.get('source_cache', './source_cache'),
+                        jobs = args.get('prefetch_jobs') or configs.get('prefetch_jobs') or jobs,
+                        verbose = defaults['verbose'],
+                        timeouts = defaults['timeouts']))
+
+            if object_pools:
+                from lib.pools import link_pools
+                with timings.stage('pools'):
+                    link_pools(defaults['repos'], defaults['source_caches'], jobs, verbose = defaults['verbose'], timeouts = defaults['timeouts'])
+
+            if progress is not None:
+                # Prefetch and pool tasks never reach `write_result`, so their sources and repositories would stay in flight
+                progress.release()
+
+            with timings.stage('fix'):
+                if args.get('use_async') or configs.get('use_async'):
+                    asyncio.run(async_fix_repos(defaults, jobs, state, on_result = write_result))
+                else:
+                    for repo_configs, fixed in bounded_map(lambda repo: fix_repo(defaults, repo, state), defaults['repos'], jobs):
+                        write_result(repo_configs, fixed)
+
+            # Pushes drain in the background while merging, the stage only times what is left after
+            with timings.stage('push'):
+                push_scheduler.close()
+    finally:
+        push_scheduler.close()
+        capture_policy = None
+        used_retries = retry_policy.used if retry_policy is not None else 0
+        retry_policy = None
+        used_cache = merge_cache
+        merge_cache = None
+        if progress is not None:
+            start_observers.remove(progress.start)
+            run_observers.remove(progress.finish)
+            if progress_reporter is not None:
+                progress_reporter.close()
+
+            if progress_server is not None:
+                close_server(progress_server)
+
+        state.close()
+        fixed_log.close()
+        failed_log.close()
+        if timings_path:
+            run_observers.remove(timings.record)
+            print("Wrote timings to -> {}".format(timings.write(timings_path)))
+            timings.print_summary()
+
+    if deadline is not None and defaults['repos'].skipped:
+        print("Deadline of {deadline} seconds passed, {skipped} repositories were not started".format(
+            deadline = deadline, skipped = defaults['repos'].skipped))
+
+    if used_cache is not None:
+        pruned = used_cache.prune()
+        print("Merge cache {hits} hits, {misses} misses, {stores} stored, {removed} pruned".format(
+            removed = pruned['removed'], **used_cache.stats()))
+
+    if used_retries:
+        print("Retried {used} Git commands after transient errors".format(used = used_retries))
+
+    if preflight_counts:
+        print("Preflight classified {counts}".format(counts = ', '.join([
+            "{count} {kind}".format(count = count, kind = kind) for kind, count in sorted(preflight_counts.items())])))
+
+    if failed_log.count:
+        print("Wrote {count} failures to -> {path}".format(count = failed_log.count, path = failed_log.path))
+
+    if fixed_log.count:
+        print("Wrote {count} fixes to -> {path}".format(count = fixed_log.count, path = fixed_log.path))
 
 
 if __name__ == '__main__':
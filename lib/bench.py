@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+
+
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from lib import (
+    abs_path,
+    fix_logs_main,
+    git,
+)
+from lib.results import read_results
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+bench_env = {
+    'GIT_AUTHOR_NAME': 'Fix Logs Bench',
+    'GIT_AUTHOR_EMAIL': 'bench@localhost',
+    'GIT_COMMITTER_NAME': 'Fix Logs Bench',
+    'GIT_COMMITTER_EMAIL': 'bench@localhost',
+    'GIT_MERGE_AUTOEDIT': 'no',
+    'GIT_TERMINAL_PROMPT': '0',
+}
+"""
+Environment set for synthetic runs, so merges and commits never wait on a user
+"""
+
+
+mergetool_env = {
+    'GIT_CONFIG_COUNT': '5',
+    'GIT_CONFIG_KEY_0': 'merge.tool',
+    'GIT_CONFIG_VALUE_0': 'bench',
+    'GIT_CONFIG_KEY_1': 'mergetool.bench.cmd',
+    'GIT_CONFIG_VALUE_1': 'cp "$REMOTE" "$MERGED"',
+    'GIT_CONFIG_KEY_2': 'mergetool.bench.trustExitCode',
+    'GIT_CONFIG_VALUE_2': 'true',
+    'GIT_CONFIG_KEY_3': 'mergetool.prompt',
+    'GIT_CONFIG_VALUE_3': 'false',
+    'GIT_CONFIG_KEY_4': 'mergetool.keepBackup',
+    'GIT_CONFIG_VALUE_4': 'false',
+}
+"""
+Non-interactive `git mergetool` configuration used when benchmarking `merge_failed.py`
+"""
+
+
+def fast_import_stream(commits, branch = 'master'):
+    """
+    **Parameters**
+
+    - `commits` List, of dictionaries similar to `{"files": {"path": "content"}, "message": "...", "time": 1600000000}`
+
+    **Returns** bytes of a `git fast-import` stream, where each commit builds on the previous one
+    """
+    lines = []
+    for mark, commit in enumerate(commits, start = 1):
+        lines.append("commit refs/heads/{branch}".format(branch = branch))
+        lines.append("mark :{mark}".format(mark = mark))
+        lines.append("committer {name} <{email}> {time} +0000".format(
+            name = bench_env['GIT_COMMITTER_NAME'], email = bench_env['GIT_COMMITTER_EMAIL'], time = commit['time']))
+        message = commit['message'].encode('utf-8')
+        lines.append("data {length}".format(length = len(message)))
+        lines.append(commit['message'])
+        if mark > 1:
+            lines.append("from :{mark}".format(mark = mark - 1))
+
+        for path, content in sorted(commit['files'].items()):
+            data = content.encode('utf-8')
+            lines.append("M 644 inline {path}".format(path = path))
+            lines.append("data {length}".format(length = len(data)))
+            lines.append(content)
+
+        lines.append('')
+
+    return "\n".join(lines).encode('utf-8')
+
+
+def synthetic_histories(rng, depth, files, conflict):
+    """
+    Builds commit lists for a `source` and an `origin` that share `depth` base commits, then diverge
+
+    **Parameters**
+
+    - `rng` instance of `random.Random`
+    - `depth` Number, of shared base commits
+    - `files` Number, of files within each tree
+    - `conflict` Boolean, if `True` then `origin` and `source` change the same file differently
+
+    **Returns** tuple of `(source_commits, origin_commits)`
+    """
+    base_time = 1600000000
+    tree = {"file-{index}.txt".format(index = index): "line {index}\n".format(index = index) for index in range(files)}
+    base = [{'files': dict(tree), 'message': "Initial commit", 'time': base_time}]
+    for index in range(1, depth):
+        path = "file-{index}.txt".format(index = rng.randrange(files))
+        tree[path] = "{content}base {index}\n".format(content = tree[path], index = index)
+        base.append({'files': {path: tree[path]}, 'message': "Base commit {index}".format(index = index), 'time': base_time + index})
+
+    source_path = "file-{index}.txt".format(index = rng.randrange(files))
+    source = base + [{
+        'files': {source_path: "{content}source\n".format(content = tree[source_path])},
+        'message': "Source commit",
+        'time': base_time + depth,
+    }]
+
+    if conflict:
+        origin_path = source_path
+    else:
+        origin_path = "origin-only.txt"
+
+    origin = base + [{
+        'files': {origin_path: "{content}origin\n".format(content = tree.get(origin_path, ''))},
+        'message': "Origin commit",
+        'time': base_time + depth + 1,
+    }]
+
+    return source, origin
+
+
+def import_bare(path, commits):
+    """
+    Initializes bare repository at `path` and imports `commits` onto its `master` branch
+    """
+    git(arg_list = ['init', '--quiet', '--bare', path],
+        error_message = "cannot initialize {path}".format(path = path))
+
+    pipes = subprocess.Popen(['git', 'fast-import', '--quiet'], stdin = subprocess.PIPE,
+                             stdout = subprocess.PIPE, stderr = subprocess.PIPE, cwd = path)
+    out, err = pipes.communicate(fast_import_stream(commits))
+    if pipes.returncode != 0:
+        raise RuntimeError("cannot fast-import into {path} -> {err}".format(path = path, err = err.decode('utf-8')))
+
+
+def make_fleet(bench_dir, repos = 10, depth = 50, files = 20, conflict_rate = 0.0, seed = 0):
+    """
+    Generates `repos` pairs of bare `source` and `origin` repositories, plus a working clone of each `origin`, under `bench_dir`
+
+    **Parameters**
+
+    - `bench_dir` String, directory to write the fleet within
+    - `repos` Number, of repositories to generate
+    - `depth` Number, of history commits shared by `source` and `origin`
+    - `files` Number, of files within each tree
+    - `conflict_rate` Float, between `0.0` and `1.0`, chance of each repository having a merge conflict
+    - `seed` Number, for `random.Random` so fleets are reproducible
+
+    **Returns** path to a `config.json` that uses `file://` remotes
+    """
+    bench_dir = abs_path(bench_dir)
+    for sub_dir in ('remotes', 'work'):
+        os.makedirs(os.path.join(bench_dir, sub_dir), exist_ok = True)
+
+    rng = random.Random(seed)
+    config_repos = []
+    for index in range(repos):
+        source_commits, origin_commits = synthetic_histories(rng, depth, files, rng.random() < conflict_rate)
+        source_path = os.path.join(bench_dir, 'remotes', "source-{index}.git".format(index = index))
+        origin_path = os.path.join(bench_dir, 'remotes', "origin-{index}.git".format(index = index))
+        work_path = os.path.join(bench_dir, 'work', "repo-{index}".format(index = index))
+        import_bare(source_path, source_commits)
+        import_bare(origin_path, origin_commits)
+        git(arg_list = ['clone', '--quiet', origin_path, work_path],
+            error_message = "cannot clone {origin_path}".format(origin_path = origin_path))
+
+        config_repos.append({
+            'dir': work_path,
+            'source': "file://{source_path}".format(source_path = source_path),
+        })
+
+    config_path = os.path.join(bench_dir, 'config.json')
+    with open(config_path, 'w') as config_fd:
+        json.dump({
+            'fixed': os.path.join(bench_dir, 'fixed.json'),
+            'failed': os.path.join(bench_dir, 'failed.json'),
+            'state': os.path.join(bench_dir, 'state.jsonl'),
+            'repos': config_repos,
+        }, config_fd, indent = 2)
+
+    return config_path
+
+
+def bench_args(config_path, bench_dir, options):
+    """
+    **Returns** dictionary of arguments for `fix_logs_main`, similar to those parsed by `fix_logs.py`
+    """
+    args = {
+        'config': config_path,
+        'origin_branch': 'master',
+        'origin_remote': 'origin',
+        'source_branch': 'master',
+        'source_remote': 'source',
+        'fix_branch': 'fix',
+        'fix_commit': 'Fixes logs',
+        'keep_fix_branch': False,
+        'no_push': False,
+        'verbose': False,
+        'timings': os.path.join(bench_dir, 'timings.json'),
+    }
+    args.update({key: value for key, value in options.items() if value is not None})
+    return args
+
+
+def run_merge_failed(bench_dir, jobs = 1):
+    """
+    Runs `merge_failed.py` against `failed.json` of `bench_dir`, with a non-interactive `git mergetool`
+
+    **Returns** dictionary similar to `run(cmd)` function output, plus `seconds`
+    """
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'merge_failed.py')
+    env = dict(os.environ, **mergetool_env)
+    started = time.time()
+    pipes = subprocess.Popen([sys.executable, script, '--failed', os.path.join(bench_dir, 'failed.json'), '--jobs', str(jobs)],
+                             stdout = subprocess.PIPE, stderr = subprocess.PIPE, cwd = bench_dir, env = env)
+    out, err = pipes.communicate()
+    return {
+        'code': pipes.returncode,
+        'out': out.decode('utf-8'),
+        'err': err.decode('utf-8'),
+        'seconds': time.time() - started,
+    }
+
+
+def bench_main(args):
+    """
+    Generates a synthetic fleet, runs `fix_logs_main` against it, and optionally `merge_failed.py` against its failures
+
+    **Parameters**
+
+    - `args` Dictionary, parsed `bench.py` command-line arguments
+
+    **Returns** report dictionary similar to...
+
+        {
+            "repos": 100,
+            "fixed": 90,
+            "failed": 10,
+            "seconds": 42.0,
+            "repos_per_minute": 142.8,
+            "stages": {"fix": 41.9},
+            "phases": {"fetch": {"count": 100, "total": 10.1, "p50": 0.09, "p95": 0.2, "max": 0.4}},
+            "merge_failed": {"code": 0, "seconds": 1.2}
+        }
+    """
+    for key, value in bench_env.items():
+        os.environ.setdefault(key, value)
+
+    bench_dir = args.get('dir') or tempfile.mkdtemp(prefix = 'fix_logs-bench-')
+    config_path = make_fleet(bench_dir,
+                             repos = args.get('repos', 10),
+                             depth = args.get('depth', 50),
+                             files = args.get('files', 20),
+                             conflict_rate = args.get('conflict_rate', 0.0),
+                             seed = args.get('seed', 0))
+
+    fix_args = bench_args(config_path, bench_dir, {
+        key: args.get(key)
+        for key in ('jobs', 'use_async', 'prefetch', 'prefetch_jobs', 'precheck', 'preflight', 'push_stage', 'merge_mode', 'merge_strategy', 'verbose')
+    })
+
+    started = time.time()
+    fix_logs_main(fix_args)
+    seconds = time.time() - started
+
+    with open(fix_args['timings'], 'r') as timings_fd:
+        summary = json.load(timings_fd)['summary']
+
+    failed = 0
+    if os.path.isfile(os.path.join(bench_dir, 'failed.json')):
+        failed = sum(1 for _ in read_results(os.path.join(bench_dir, 'failed.json'), 'failed'))
+
+    report = {
+        'dir': bench_dir,
+        'repos': args.get('repos', 10),
+        'fixed': args.get('repos', 10) - failed,
+        'failed': failed,
+        'seconds': seconds,
+        'repos_per_minute': args.get('repos', 10) / (seconds / 60.0) if seconds else None,
+        'stages': summary['stages'],
+        'phases': summary['phases'],
+    }
+
+    if args.get('merge_failed') and failed:
+        status = run_merge_failed(bench_dir, jobs = args.get('jobs') or 1)
+        report['merge_failed'] = {'code': status['code'], 'seconds': status['seconds']}
+
+    if args.get('report'):
+        with open(abs_path(args['report']), 'w') as report_fd:
+            json.dump(report, report_fd, indent = 2)
+
+    return report
+
+
+def print_report(report):
+    """
+    Prints throughput and per-phase latency of `report` from `bench_main`
+    """
+    print("repos {repos} fixed {fixed} failed {failed} in {seconds:.3f}s -> {repos_per_minute:.1f} repos/min".format(**report))
+    for phase, stats in sorted(report['phases'].items(), key = lambda item: item[1]['total'], reverse = True):
+        print("phase {phase:<14} count {count:5d} p50 {p50:7.3f}s p95 {p95:7.3f}s max {max:7.3f}s".format(phase = phase, **stats))
+
+    if report.get('merge_failed'):
+        print("merge_failed.py exited {code} after {seconds:.3f}s".format(**report['merge_failed']))
+
+    print("Fleet left under -> {dir}".format(**report))
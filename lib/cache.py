@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from lib import abs_path
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+default_limit = 16 * 1024 * 1024
+"""
+Bytes of entries a `MergeCache` keeps when pruned, if not configured
+"""
+
+
+def merge_key(origin_hash, source_hash, merge_strategy = None):
+    """
+    **Returns** hex digest naming the outcome of merging `origin_hash` into `source_hash` with optional `merge_strategy`
+
+    **Example**
+
+        merge_key('a8aaab3...', '9fe655c...', 'theirs')
+        #> '5d41402abc4b2a76b9719d911017c592...'
+    """
+    return hashlib.sha256("merge\0{origin_hash}\0{source_hash}\0{merge_strategy}".format(
+        origin_hash = origin_hash, source_hash = source_hash, merge_strategy = merge_strategy or '').encode('utf-8')).hexdigest()
+
+
+class MergeCache(object):
+    """
+    Content-addressed store of merge outcomes, set as `lib.merge_cache` to be used by `fix_log_steps`
+
+    Each entry is a small JSON file at `path/<key[0:2]>/<key[2:]>.json`, see `merge_key`, similar to...
+
+        {
+            "origin_hash": "_full-hash_",
+            "source_hash": "_full-hash_",
+            "merge_strategy": null,
+            "tree": "_tree-hash_",
+            "commit": "_full-hash_",
+            "fix_commit": "Fixes logs",
+            "conflicts": null
+        }
+
+    ... where `conflicts` is a `lib.preflight.classify_merge_tree` dictionary instead of `tree` and `commit` when the merge needs a human
+
+    Hits touch an entry's modification time, so `prune` evicts least recently used entries first; files are written via `os.replace`, so concurrent runs and shards may share one `path`
+
+    **Parameters**
+
+    - `path` String, cache directory, created if missing
+    - `limit` Number, of bytes `prune` keeps
+
+    **Example**
+
+        lib.merge_cache = MergeCache('./merge_cache')
+        key = merge_key(latest_hash, source_hash)
+        merge_cache.get(key)
+        merge_cache.put(key, {'tree': tree_hash, 'commit': merge_hash})
+    """
+
+    def __init__(self, path, limit = default_limit):
+        self.path = abs_path(path)
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key[0:2], "{rest}.json".format(rest = key[2:]))
+
+    def get(self, key):
+        """
+        **Returns** entry dictionary for `key`, or `None` on a miss
+        """
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, 'r') as entry_fd:
+                entry = json.load(entry_fd)
+            os.utime(entry_path)
+        except (OSError, ValueError):
+            entry = None
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return entry
+
+    def put(self, key, entry):
+        """
+        Writes `entry` for `key`, replacing any earlier one
+        """
+        entry_path = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok = True)
+        temporary_path = "{path}.{pid}-{thread}.tmp".format(path = entry_path, pid = os.getpid(), thread = threading.get_ident())
+        with open(temporary_path, 'w') as entry_fd:
+            json.dump(entry, entry_fd)
+
+        os.replace(temporary_path, entry_path)
+        with self.lock:
+            self.stores += 1
+
+    def entries(self):
+        """
+        **Returns** list of `(modification_time, size, path)` tuples, one per entry file, oldest first
+        """
+        found = []
+        if not os.path.isdir(self.path):
+            return found
+
+        for directory, _directories, file_names in os.walk(self.path):
+            for file_name in file_names:
+                if not file_name.endswith('.json'):
+                    continue
+
+                entry_path = os.path.join(directory, file_name)
+                try:
+                    entry_stat = os.stat(entry_path)
+                except OSError:
+                    # Pruned by another run meanwhile
+                    continue
+
+                found.append((entry_stat.st_mtime, entry_stat.st_size, entry_path))
+
+        return sorted(found)
+
+    def stats(self):
+        """
+        **Returns** dictionary similar to...
+
+            {
+                "path": "/home/user-name/fix_logs/merge_cache",
+                "entries": 1200,
+                "bytes": 412300,
+                "limit": 16777216,
+                "oldest": 1602806400.0,
+                "newest": 1602892800.0,
+                "hits": 290,
+                "misses": 10,
+                "stores": 10
+            }
+
+        ... where `hits`, `misses`, and `stores` only count calls made through this instance
+        """
+        entries = self.entries()
+        with self.lock:
+            return {
+                'path': self.path,
+                'entries': len(entries),
+                'bytes': sum([size for _mtime, size, _path in entries]),
+                'limit': self.limit,
+                'oldest': entries[0][0] if entries else None,
+                'newest': entries[-1][0] if entries else None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+            }
+
+    def prune(self, limit = None, max_age = None):
+        """
+        Removes least recently used entries until at most `limit` bytes, defaults to `self.limit`, are left, and any entry unused for more than `max_age` seconds
+
+        **Returns** dictionary similar to `{"removed": 12, "freed": 4096, "bytes": 16773120}`
+        """
+        limit = self.limit if limit is None else limit
+        entries = self.entries()
+        total = sum([size for _mtime, size, _path in entries])
+        oldest_allowed = time.time() - max_age if max_age is not None else None
+        removed = 0
+        freed = 0
+        for mtime, size, entry_path in entries:
+            if total <= limit and (oldest_allowed is None or mtime >= oldest_allowed):
+                break
+
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+
+            total -= size
+            removed += 1
+            freed += size
+
+        return {'removed': removed, 'freed': freed, 'bytes': total}
+
+
+def cache_path(merge_cache = None, fixed = None):
+    """
+    **Returns** absolute path of merge cache directory, `merge_cache` if defined otherwise `merge_cache` next to `fixed` log
+    """
+    if merge_cache:
+        return abs_path(merge_cache)
+
+    fixed_abspath = abs_path(fixed or './fixed.json')
+    return os.path.join(os.path.dirname(fixed_abspath), 'merge_cache')
+
+
+def cache_main(args):
+    """
+    Reports on, or prunes, the merge cache of `config.json` without touching any repository
+
+    **Parameters**
+
+    - `args` Dictionary, parsed command-line arguments, eg. `action` of `stats` or `prune`, `config` path, and optional `merge_cache`, `merge_cache_limit`, and `max_age`
+
+    **Returns** dictionary from `MergeCache.stats`, with a `pruned` dictionary from `MergeCache.prune` added for `prune`
+    """
+    configs = {}
+    if os.path.isfile(args.get('config') or './config.json'):
+        with open(args.get('config') or './config.json', 'r') as configs_fd:
+            configs = json.load(configs_fd)
+
+    merge_cache = MergeCache(cache_path(args.get('merge_cache') or configs.get('merge_cache'), configs.get('fixed')),
+                             limit = args.get('merge_cache_limit') or configs.get('merge_cache_limit') or default_limit)
+
+    pruned = None
+    if args.get('action') == 'prune':
+        pruned = merge_cache.prune(max_age = args.get('max_age'))
+
+    report = merge_cache.stats()
+    if pruned is not None:
+        report['pruned'] = pruned
+
+    return report
+
+
+def print_cache_report(report):
+    """
+    Prints `cache_main` report as a few lines of text
+    """
+    if report.get('pruned'):
+        print("Pruned {removed} entries, freeing {freed} bytes".format(**report['pruned']))
+
+    print("Merge cache {path} has {entries} entries, {bytes} of {limit} bytes".format(**report))
+    for key in ('oldest', 'newest'):
+        if report[key]:
+            print("{key:<10} used {when}".format(key = key, when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(report[key]))))
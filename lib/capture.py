@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+
+import asyncio
+import itertools
+import os
+import threading
+
+from lib import (
+    abs_path,
+    command_phase,
+    current_repo,
+)
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+# Phases whose output is only reported, never parsed, so keeping just its tail is safe
+capture_phases = (
+    'branch',
+    'checkout',
+    'clone',
+    'commit',
+    'fetch',
+    'gc',
+    'merge',
+    'mergetool',
+    'pull',
+    'push',
+    'repack',
+    'worktree-add',
+    'worktree-remove',
+)
+
+
+chunk_size = 65536
+
+
+class TailBuffer(object):
+    """
+    Keeps the last `limit` bytes written to it; once more than `limit` bytes were written, and `spill_path` is defined, everything is also streamed to that file
+
+    **Parameters**
+
+    - `limit` Number, of bytes to keep in memory
+    - `spill_path` String, optional file to write full output to, only created when output exceeds `limit`
+    """
+
+    def __init__(self, limit, spill_path = None):
+        self.limit = limit
+        self.spill_path = spill_path
+        self.spill_fd = None
+        self.tail = bytearray()
+        self.size = 0
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.spill_fd is not None:
+            self.spill_fd.write(chunk)
+
+        self.tail += chunk
+        if len(self.tail) <= self.limit:
+            return
+
+        if self.spill_fd is None and self.spill_path:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok = True)
+            self.spill_fd = open(self.spill_path, 'wb')
+            self.spill_fd.write(self.tail)
+
+        del self.tail[0:len(self.tail) - self.limit]
+
+    def close(self):
+        """
+        **Returns** tuple of `(tail, spill_path)`, where `spill_path` is `None` if nothing was spilled
+        """
+        if self.spill_fd is None:
+            return bytes(self.tail), None
+
+        self.spill_fd.close()
+        self.spill_fd = None
+        return bytes(self.tail), self.spill_path
+
+
+class CapturePolicy(object):
+    """
+    Bounds memory used by Standard Out and Standard Error of Git commands, set as `lib.capture_policy` to be used by `run(cmd)` and `async_run(cmd)`
+
+    Only commands of `phases`, see `lib.command_phase`, are capped; output of other commands, eg. `git log` or `git merge-tree`, is parsed and always kept in full
+
+    Capped output keeps its last `limit` bytes, and with `spill_dir` defined full output is written to `spill_dir/<repo-name>/<number>-<phase>.<stream>.log`, its path returned as `out_log` or `err_log` within status
+
+    **Parameters**
+
+    - `limit` Number, of bytes to keep per stream and command
+    - `spill_dir` String, optional run directory to write full output to
+    - `phases` Tuple, of command phases to cap
+
+    **Example**
+
+        lib.capture_policy = CapturePolicy(limit = 65536, spill_dir = './logs/run-1')
+    """
+
+    def __init__(self, limit = 65536, spill_dir = None, phases = capture_phases):
+        self.limit = limit
+        self.spill_dir = abs_path(spill_dir) if spill_dir else None
+        self.phases = phases
+        self.sequence = itertools.count(1)
+
+    def captures(self, cmd):
+        """
+        **Returns** `True` if output of `cmd` is capped
+        """
+        return command_phase(cmd) in self.phases
+
+    def buffers(self, cmd):
+        """
+        **Returns** dictionary of `out` and `err` `TailBuffer`s for one run of `cmd`
+        """
+        spill_paths = {'out': None, 'err': None}
+        if self.spill_dir:
+            name = str(current_repo.get() or 'unknown')
+            prefix = "{number:06d}-{phase}".format(number = next(self.sequence), phase = command_phase(cmd))
+            for stream in spill_paths:
+                spill_paths[stream] = os.path.join(self.spill_dir, name, "{prefix}.{stream}.log".format(
+                    prefix = prefix, stream = stream))
+
+        return {stream: TailBuffer(self.limit, spill_path) for stream, spill_path in spill_paths.items()}
+
+    def communicate(self, pipes, cmd):
+        """
+        Drains `pipes`, a `subprocess.Popen` with piped `stdout` and `stderr`, without keeping more than `limit` bytes of either
+
+        **Returns** dictionary similar to `run(cmd)` function output, with `out_log` and `err_log` added for spilled streams
+        """
+        buffers = self.buffers(cmd)
+
+        def drain(stream, buffer):
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                buffer.write(chunk)
+            stream.close()
+
+        # Standard Error is read from another thread, so neither pipe fills up while the other is read
+        err_thread = threading.Thread(target = drain, args = (pipes.stderr, buffers['err']))
+        err_thread.start()
+        drain(pipes.stdout, buffers['out'])
+        err_thread.join()
+        pipes.wait()
+        return self.status(pipes.returncode, buffers)
+
+    async def async_communicate(self, process, cmd):
+        """
+        Asyncio version of `communicate`, for a process from `asyncio.create_subprocess_exec`
+        """
+        buffers = self.buffers(cmd)
+
+        async def drain(stream, buffer):
+            while True:
+                chunk = await stream.read(chunk_size)
+                if not chunk:
+                    return
+                buffer.write(chunk)
+
+        await asyncio.gather(drain(process.stdout, buffers['out']), drain(process.stderr, buffers['err']))
+        await process.wait()
+        return self.status(process.returncode, buffers)
+
+    def status(self, code, buffers):
+        status = {'code': code}
+        for stream, buffer in buffers.items():
+            status[stream], spill_path = buffer.close()
+            if spill_path:
+                status["{stream}_log".format(stream = stream)] = spill_path
+
+        return status
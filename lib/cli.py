@@ -0,0 +1,679 @@
+#!/usr/bin/env python3
+
+
+import argparse
+import sys
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def add_common_arguments(parser):
+    """
+    Adds `--about` and `--license` options, which every command accepts
+    """
+    parser.add_argument('--about',
+                        action = 'store_true',
+                        help = 'Prints info about this script and exits')
+
+    parser.add_argument('--license',
+                        action = 'store_true',
+                        help = 'Prints script license and exits')
+
+
+def add_fix_arguments(parser):
+    """
+    Adds options of `fix` command, parsed into arguments for `lib.fix_logs_main`
+    """
+    parser.add_argument('--capture_limit',
+                        type = int,
+                        default = None,
+                        help = 'Bytes of Standard Out and Standard Error to keep in memory per Git command while it runs, tails are kept and never fewer than `--output_limit`; only applies to commands whose output is not parsed, eg. fetch, merge, and push, and longer output is spilled to `--logs_dir`')
+
+    parser.add_argument('--config',
+                        default = './config.json',
+                        help = 'Path to config.json file')
+
+    parser.add_argument('--deadline',
+                        type = float,
+                        default = None,
+                        help = 'Seconds after which no new repository is started, those in flight finish and are logged')
+
+    parser.add_argument('--fetch_depth',
+                        type = int,
+                        default = None,
+                        help = 'Number of `source_branch` commits to fetch, deepened automatically until a merge base with `origin_branch` is found')
+
+    parser.add_argument('--fetch_filter',
+                        default = None,
+                        help = 'Partial fetch filter for `source_remote`, eg. `blob:none`, so only blobs the merge needs are downloaded')
+
+    parser.add_argument('--fetch_no_tags',
+                        action = 'store_true',
+                        help = 'Skips fetching tags of `source_remote`')
+
+    parser.add_argument('--fetch_single_branch',
+                        action = 'store_true',
+                        help = 'Only fetches `source_branch` of `source_remote`, instead of every branch')
+
+    parser.add_argument('--jobs',
+                        type = int,
+                        default = None,
+                        help = 'Number of repositories, or Git commands with `--use_async`, to run at the same time, defaults to `jobs` within configuration file or 1')
+
+    parser.add_argument('--logs_dir',
+                        default = None,
+                        help = 'Directory to spill full `out` and `err` of results longer than `--output_limit`, and of Git commands longer than `--capture_limit`, to')
+
+    parser.add_argument('--manifest',
+                        default = None,
+                        help = 'Path to JSONL manifest, one repository per line, read lazily instead of `repos` within configuration file')
+
+    parser.add_argument('--merge_cache',
+                        default = None,
+                        help = 'Directory to cache merge outcomes within, keyed by `origin` and `source` hashes and `--merge_strategy`, so repeated runs reuse them instead of merging again')
+
+    parser.add_argument('--merge_cache_limit',
+                        type = int,
+                        default = None,
+                        help = 'Bytes of `--merge_cache` entries kept after each run, least recently used are pruned first, defaults to 16 MiB')
+
+    parser.add_argument('--merge_mode',
+                        choices = ['checkout', 'worktree', 'merge_tree'],
+                        default = None,
+                        help = 'Merges within repository checkout (default), a temporary `git worktree`, or via `git merge-tree` without a working tree')
+
+    parser.add_argument('--merge_strategy',
+                        default = None,
+                        help = 'Git merge strategy to use, check `git help merge | less -p "-X <option>"`')
+
+    parser.add_argument('--object_pools',
+                        action = 'store_true',
+                        help = 'Implies `--prefetch`, and links each repository to the cache of its `source` via `objects/info/alternates`')
+
+    parser.add_argument('--origin_branch',
+                        default = 'master',
+                        help = 'Git branch name to merge source `source_branch` with')
+
+    parser.add_argument('--origin_remote',
+                        default = 'origin',
+                        help = 'Git remote name to push changes to')
+
+    parser.add_argument('--output_limit',
+                        type = int,
+                        default = None,
+                        help = 'Number of trailing characters of `out` and `err` to keep within results once written, defaults to 4096; see `--capture_limit` to also bound them while Git commands run')
+
+    parser.add_argument('--precheck',
+                        action = 'store_true',
+                        help = 'Skips repositories whose `source_branch` tip, via `git ls-remote`, is already merged into `origin_branch`')
+
+    parser.add_argument('--prefetch',
+                        action = 'store_true',
+                        help = 'Fetches each distinct `source` once into `--source_cache` before fixing any repository')
+
+    parser.add_argument('--prefetch_jobs',
+                        type = int,
+                        default = None,
+                        help = 'Number of `--prefetch` fetches to run at the same time, defaults to `--jobs`')
+
+    parser.add_argument('--preflight',
+                        action = 'store_true',
+                        help = 'Classifies each merge via `git merge-tree` first, clean merges skip the checkout and conflicting ones go straight to `failed.json`')
+
+    parser.add_argument('--progress',
+                        action = 'store_true',
+                        help = 'Reports repositories done, failed, and in flight, repos per minute, and ETA; in place on a TTY, otherwise as JSON lines on Standard Error')
+
+    parser.add_argument('--progress_interval',
+                        type = float,
+                        default = None,
+                        help = 'Seconds between `--progress` reports, defaults to 2.0')
+
+    parser.add_argument('--progress_listen',
+                        default = None,
+                        help = 'Serves progress counters as JSON, over HTTP for `PORT` or `HOST:PORT`, or over a Unix socket for a path containing `/`')
+
+    parser.add_argument('--push_backoff',
+                        type = float,
+                        default = None,
+                        help = 'Seconds to pause a host after a failed push, doubling on each retry, defaults to 1.0')
+
+    parser.add_argument('--push_jobs',
+                        type = int,
+                        default = None,
+                        help = 'Number of pushes to run against one remote host at the same time, defaults to 2')
+
+    parser.add_argument('--push_retries',
+                        type = int,
+                        default = None,
+                        help = 'Number of times to retry a push failing with a transient error, defaults to 3')
+
+    parser.add_argument('--push_stage',
+                        action = 'store_true',
+                        help = 'Queues pushes to a background stage, grouped by remote host, so merging continues at full speed')
+
+    parser.add_argument('--retries',
+                        type = int,
+                        default = None,
+                        help = 'Number of times to retry a Git command failing with a transient network or lock error, `0` disables retries, defaults to 2')
+
+    parser.add_argument('--retry_backoff',
+                        type = float,
+                        default = None,
+                        help = 'Seconds the first retry waits at most, doubling per retry with random jitter, defaults to 1.0')
+
+    parser.add_argument('--retry_budget',
+                        type = int,
+                        default = None,
+                        help = 'Number of retries allowed across the whole run, so a dead remote cannot stall it, defaults to 100')
+
+    parser.add_argument('--shard',
+                        default = None,
+                        help = 'Only fixes repositories within shard i of N, similar to `0/4`, by a stable hash of `dir` and `source`; outputs get a `.shard-i-of-N` suffix')
+
+    parser.add_argument('--source_cache',
+                        default = None,
+                        help = 'Directory of bare repositories used by `--prefetch`, defaults to `./source_cache`')
+
+    parser.add_argument('--source_branch',
+                        default = 'master',
+                        help = 'Git branch to _inject_ into `origin_branch`')
+
+    parser.add_argument('--source_remote',
+                        default = 'source',
+                        help = 'Git remote name to fetch log corrections from')
+
+    parser.add_argument('--force',
+                        action = 'store_true',
+                        help = 'Re-fixes repositories even if unchanged since their last fix in `--state` journal')
+
+    parser.add_argument('--fix_branch',
+                        default = "fix",
+                        help = 'Git branch name for triaging possible merge conflicts')
+
+    parser.add_argument('--fix_commit',
+                        default = "Fixes logs",
+                        help = 'Git commit message for successful automatic merges')
+
+    parser.add_argument('--no_push',
+                        action = 'store_true',
+                        help = 'Skips attempting to push to `origin_remote` after merge')
+
+    parser.add_argument('--keep_fix_branch',
+                        action = 'store_true',
+                        help = 'Skips deleting `fix_branch` after merge')
+
+    parser.add_argument('--state',
+                        default = None,
+                        help = 'Path to JSONL run state journal, defaults to `state.jsonl` next to `fixed` log')
+
+    parser.add_argument('--timeout',
+                        action = 'append',
+                        default = None,
+                        help = 'Seconds a Git command phase may run before its process group is killed, similar to `fetch=600` or `default=120`, may be repeated; `none` removes a limit')
+
+    parser.add_argument('--timings',
+                        default = None,
+                        help = 'Path to write per Git command timings to, as CSV if it ends with `.csv` otherwise JSON')
+
+    parser.add_argument('--use_async',
+                        action = 'store_true',
+                        help = 'Runs Git commands from one asyncio event loop, `--jobs` limits how many run at the same time')
+
+    parser.add_argument('--verbose',
+                        action = 'store_true',
+                        help = 'Prints command standard out if set')
+
+    parser.add_argument('--watch',
+                        action = 'store_true',
+                        help = 'Keeps running, polling `source` and `origin` tips via `git ls-remote` and re-fixing only repositories whose tips moved')
+
+    parser.add_argument('--watch_cycles',
+                        type = int,
+                        default = None,
+                        help = 'Number of `--watch` polling cycles to run before exiting, defaults to running forever')
+
+    parser.add_argument('--watch_interval',
+                        type = float,
+                        default = None,
+                        help = 'Seconds between first polls of each repository, defaults to 300')
+
+    parser.add_argument('--watch_max_interval',
+                        type = float,
+                        default = None,
+                        help = 'Longest seconds between polls of a quiet repository, defaults to 3600')
+
+    parser.add_argument('--watch_min_interval',
+                        type = float,
+                        default = None,
+                        help = 'Shortest seconds between polls of a busy repository, defaults to 60')
+
+    parser.add_argument('--watch_state',
+                        default = None,
+                        help = 'Path to save last seen tips and polling intervals to, defaults to `watch.json` next to `fixed` log')
+
+
+def add_merge_failed_arguments(parser):
+    """
+    Adds options of `merge-failed` command, parsed into arguments for `lib.merge.merge_failed_main`
+    """
+    parser.add_argument('--batch_jobs',
+                        type = int,
+                        default = None,
+                        help = 'Number of repositories to resolve by rules at the same time, defaults to CPU count')
+
+    parser.add_argument('--batch_only',
+                        action = 'store_true',
+                        help = 'Writes repositories that rules cannot fully resolve to conflicts.json instead of running `git mergetool`')
+
+    parser.add_argument('--conflicts',
+                        default = './conflicts.json',
+                        help = 'Path to write repositories `git mergetool`, or rules, could not resolve')
+
+    parser.add_argument('--failed',
+                        default = './failed.json',
+                        help = 'Path to failed.json file')
+
+    parser.add_argument('--jobs',
+                        type = int,
+                        default = 1,
+                        help = 'Number of repositories, or Git commands with `--use_async`, to run at the same time')
+
+    parser.add_argument('--logs_dir',
+                        default = None,
+                        help = 'Directory to spill full `out` and `err` of results longer than `--output_limit` to')
+
+    parser.add_argument('--merged',
+                        default = './merged.json',
+                        help = 'Path to write resolved repositories')
+
+    parser.add_argument('--output_limit',
+                        type = int,
+                        default = 4096,
+                        help = 'Number of trailing characters of `out` and `err` to keep within results')
+
+    parser.add_argument('--queue',
+                        default = './queue.json',
+                        help = 'Path to write repositories left for interactive `git mergetool` after rules are applied')
+
+    parser.add_argument('--rule',
+                        action = 'append',
+                        default = None,
+                        help = 'Resolution rule similar to `README*=theirs`, may be repeated; strategy is one of ours, theirs, or union')
+
+    parser.add_argument('--rules',
+                        default = None,
+                        help = 'Path to JSON file of resolution rules, eg. `{"rules": [{"glob": "LICENSE", "resolve": "ours"}]}`')
+
+    parser.add_argument('--shard',
+                        default = None,
+                        help = 'Only merges repositories within shard i of N, similar to `0/4`, see `fix_logs.py --shard`')
+
+    parser.add_argument('--timeout',
+                        action = 'append',
+                        default = None,
+                        help = 'Seconds a Git command phase may run before its process group is killed, similar to `fetch=600`, may be repeated; `git mergetool` has no limit unless `mergetool=SECONDS` is given')
+
+    parser.add_argument('--use_async',
+                        action = 'store_true',
+                        help = 'Runs Git commands from one asyncio event loop, `--jobs` limits how many run at the same time')
+
+    parser.add_argument('--verbose',
+                        action = 'store_true',
+                        help = 'Prints command standard out if set')
+
+
+def add_status_arguments(parser):
+    """
+    Adds options of `status` command, parsed into arguments for `lib.status.status_main`
+    """
+    parser.add_argument('--config',
+                        default = './config.json',
+                        help = 'Path to config.json file')
+
+    parser.add_argument('--conflicts',
+                        default = None,
+                        help = 'Path of `merge-failed --conflicts` log, defaults to `./conflicts.json`')
+
+    parser.add_argument('--json',
+                        action = 'store_true',
+                        help = 'Prints status as one JSON object')
+
+    parser.add_argument('--merged',
+                        default = None,
+                        help = 'Path of `merge-failed --merged` log, defaults to `./merged.json`')
+
+    parser.add_argument('--progress_listen',
+                        default = None,
+                        help = 'Address a running job serves progress on, see `fix --progress_listen`')
+
+    parser.add_argument('--queue',
+                        default = None,
+                        help = 'Path of `merge-failed --queue` log, defaults to `./queue.json`')
+
+    parser.add_argument('--shard',
+                        default = None,
+                        help = 'Reports on shard i of N only, similar to `0/4`')
+
+    parser.add_argument('--state',
+                        default = None,
+                        help = 'Path to run state journal, defaults to `state.jsonl` next to `fixed` log')
+
+
+def add_merge_results_arguments(parser):
+    """
+    Adds options of `merge-results` command, parsed into arguments for `lib.shard.merge_results_main`
+    """
+    parser.add_argument('--config',
+                        default = './config.json',
+                        help = 'Path to configuration file, for `fixed`, `failed`, and `state` paths')
+
+    parser.add_argument('--conflicts',
+                        default = './conflicts.json',
+                        help = 'Path to combined conflicts log, see `merge-failed --conflicts`')
+
+    parser.add_argument('--failed',
+                        default = None,
+                        help = 'Path to combined failed log, defaults to `failed` within configuration file')
+
+    parser.add_argument('--fixed',
+                        default = None,
+                        help = 'Path to combined fixed log, defaults to `fixed` within configuration file')
+
+    parser.add_argument('--json',
+                        action = 'store_true',
+                        help = 'Prints report as one JSON object')
+
+    parser.add_argument('--merged',
+                        default = './merged.json',
+                        help = 'Path to combined merged log, see `merge-failed --merged`')
+
+    parser.add_argument('--state',
+                        default = None,
+                        help = 'Path to combined state journal, defaults to `state.jsonl` next to fixed log')
+
+
+def add_pools_arguments(parser):
+    """
+    Adds options of `pools` command, parsed into arguments for `lib.pools.pools_main`
+    """
+    parser.add_argument('--config',
+                        default = './config.json',
+                        help = 'Path to configuration file')
+
+    parser.add_argument('--jobs',
+                        type = int,
+                        default = None,
+                        help = 'Number of repositories, or pool fetches, to process at the same time')
+
+    parser.add_argument('--manifest',
+                        default = None,
+                        help = 'Path to JSONL manifest, one repository per line, read lazily instead of `repos` within configuration file')
+
+    parser.add_argument('--repack',
+                        action = 'store_true',
+                        help = 'Drops objects that pools already have from each repository, via `git repack -a -d -l`')
+
+    parser.add_argument('--source_cache',
+                        default = None,
+                        help = 'Directory of pool repositories, shared with `fix --prefetch`, defaults to `./source_cache`')
+
+    parser.add_argument('--stats',
+                        action = 'store_true',
+                        help = 'Prints disk usage of repositories and pools')
+
+    parser.add_argument('--timeout',
+                        action = 'append',
+                        default = None,
+                        help = 'Seconds a Git command phase may run before its process group is killed, similar to `fetch=600`, may be repeated; `none` removes a limit')
+
+    parser.add_argument('--unlink',
+                        action = 'store_true',
+                        help = 'Copies borrowed objects back into each repository and removes pools from their alternates')
+
+    parser.add_argument('--verbose',
+                        action = 'store_true',
+                        help = 'Prints command standard out if set')
+
+
+def add_bench_arguments(parser):
+    """
+    Adds options of `bench` command, parsed into arguments for `lib.bench.bench_main`
+    """
+    parser.add_argument('--conflict_rate',
+                        type = float,
+                        default = 0.0,
+                        help = 'Chance, between 0.0 and 1.0, of each repository having a merge conflict')
+
+    parser.add_argument('--depth',
+                        type = int,
+                        default = 50,
+                        help = 'Number of history commits shared by `origin` and `source`')
+
+    parser.add_argument('--dir',
+                        default = None,
+                        help = 'Directory to generate the fleet within, defaults to a new temporary directory')
+
+    parser.add_argument('--files',
+                        type = int,
+                        default = 20,
+                        help = 'Number of files within each repository')
+
+    parser.add_argument('--jobs',
+                        type = int,
+                        default = 1,
+                        help = 'Passed to `fix_logs.py` and `merge_failed.py`')
+
+    parser.add_argument('--merge_failed',
+                        action = 'store_true',
+                        help = 'Also runs `merge_failed.py`, with a non-interactive `git mergetool`, against failures')
+
+    parser.add_argument('--merge_mode',
+                        choices = ['checkout', 'worktree', 'merge_tree'],
+                        default = None,
+                        help = 'Passed to `fix_logs.py`')
+
+    parser.add_argument('--precheck',
+                        action = 'store_true',
+                        help = 'Passed to `fix_logs.py`')
+
+    parser.add_argument('--prefetch',
+                        action = 'store_true',
+                        help = 'Passed to `fix_logs.py`')
+
+    parser.add_argument('--preflight',
+                        action = 'store_true',
+                        help = 'Passed to `fix_logs.py`')
+
+    parser.add_argument('--push_stage',
+                        action = 'store_true',
+                        help = 'Passed to `fix_logs.py`')
+
+    parser.add_argument('--repos',
+                        type = int,
+                        default = 10,
+                        help = 'Number of repositories to generate')
+
+    parser.add_argument('--report',
+                        default = None,
+                        help = 'Path to write JSON report to')
+
+    parser.add_argument('--seed',
+                        type = int,
+                        default = 0,
+                        help = 'Random seed, so fleets are reproducible')
+
+    parser.add_argument('--use_async',
+                        action = 'store_true',
+                        help = 'Passed to `fix_logs.py`')
+
+    parser.add_argument('--verbose',
+                        action = 'store_true',
+                        help = 'Passed to `fix_logs.py`')
+
+
+def add_cache_arguments(parser):
+    """
+    Adds options of `cache` command, parsed into arguments for `lib.cache.cache_main`
+    """
+    parser.add_argument('action',
+                        choices = ['stats', 'prune'],
+                        help = 'Reports size of the merge cache, or prunes it to `--merge_cache_limit` bytes, least recently used first')
+
+    parser.add_argument('--config',
+                        default = './config.json',
+                        help = 'Path to config.json file')
+
+    parser.add_argument('--json',
+                        action = 'store_true',
+                        help = 'Prints report as one JSON object')
+
+    parser.add_argument('--max_age',
+                        type = float,
+                        default = None,
+                        help = 'With `prune`, also removes entries unused for more than this many seconds')
+
+    parser.add_argument('--merge_cache',
+                        default = None,
+                        help = 'Merge cache directory, defaults to `merge_cache` within configuration file, or next to `fixed` log')
+
+    parser.add_argument('--merge_cache_limit',
+                        type = int,
+                        default = None,
+                        help = 'Bytes of entries `prune` keeps, defaults to 16 MiB')
+
+
+def fix_command(args):
+    from lib import fix_logs_main
+    fix_logs_main(args)
+
+
+def merge_failed_command(args):
+    from lib.merge import merge_failed_main
+    merge_failed_main(args)
+
+
+def status_command(args):
+    import json
+    from lib.status import print_status, status_main
+    report = status_main(args)
+    if args.get('json'):
+        print(json.dumps(report))
+    else:
+        print_status(report)
+
+
+def cache_command(args):
+    import json
+    from lib.cache import cache_main, print_cache_report
+    report = cache_main(args)
+    if args.get('json'):
+        print(json.dumps(report))
+    else:
+        print_cache_report(report)
+
+
+def merge_results_command(args):
+    import json
+    from lib.shard import merge_results_main, print_merge_report
+    report = merge_results_main(args)
+    if args.get('json'):
+        print(json.dumps(report))
+    else:
+        print_merge_report(report)
+
+
+def pools_command(args):
+    from lib.pools import pools_main, print_report
+    print_report(pools_main(args))
+
+
+def bench_command(args):
+    from lib.bench import bench_main, print_report
+    print_report(bench_main(args))
+
+
+commands = {
+    'fix': (add_fix_arguments, fix_command,
+            'Attempts to fix git logs/history of each repository within config.json'),
+    'merge-failed': (add_merge_failed_arguments, merge_failed_command,
+                     'Runs `git mergetool`, after optional resolution rules, for each repository within failed.json'),
+    'merge-results': (add_merge_results_arguments, merge_results_command,
+                      'Combines per-shard logs and state journals of `fix --shard` and `merge-failed --shard` runs'),
+    'pools': (add_pools_arguments, pools_command,
+              'Builds, or updates, one bare object pool per distinct `source` and links each repository to it via `objects/info/alternates`'),
+    'status': (add_status_arguments, status_command,
+               'Summarizes state journal and logs of a finished, or running, job'),
+    'bench': (add_bench_arguments, bench_command,
+              'Generates a fleet of local repositories, then reports repos/min and per-phase latency of fixing them'),
+    'cache': (add_cache_arguments, cache_command,
+              'Reports on, or prunes, the merge outcome cache of `fix --merge_cache`'),
+}
+"""
+Command name to tuple of `(add_arguments, handler, description)`; handlers import what they need when called, so parsing stays cheap
+"""
+
+
+def build_parser(description):
+    """
+    **Returns** `argparse.ArgumentParser` with one sub-parser per entry of `commands`
+    """
+    parser = argparse.ArgumentParser(description = description)
+    subparsers = parser.add_subparsers(dest = 'command', metavar = 'COMMAND')
+    for name, (add_arguments, _handler, command_description) in commands.items():
+        subparser = subparsers.add_parser(name, help = command_description, description = command_description)
+        add_common_arguments(subparser)
+        add_arguments(subparser)
+
+    return parser
+
+
+def cli_main(argv, about, license, description, default_command = None):
+    """
+    Parses `argv` and runs the named command, similar to `python -m fix_logs status --config ./config.json`
+
+    **Parameters**
+
+    - `argv` List, command-line arguments without the script name, eg. `sys.argv[1:]`
+    - `about` String, printed for `--about`
+    - `license` String, printed for `--license`
+    - `description` String, shown by `--help`
+    - `default_command` String, optional command to run when `argv` does not start with one, so `python fix_logs.py --config ./config.json` still runs `fix`
+
+    **Returns** whatever the command handler returns
+    """
+    argv = list(argv)
+    if default_command and not (argv and (argv[0] in commands or argv[0] in ('-h', '--help'))):
+        argv.insert(0, default_command)
+
+    parser = build_parser(description)
+    args = vars(parser.parse_args(argv))
+    if not args.get('command'):
+        parser.print_help()
+        sys.exit(2)
+
+    if args['about']:
+        print(about)
+        sys.exit()
+
+    if args['license']:
+        print(license)
+        sys.exit()
+
+    return commands[args['command']][1](args)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+
+import csv
+import json
+import math
+import threading
+import time
+
+from lib import abs_path
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+csv_fields = (
+    'repo',
+    'phase',
+    'code',
+    'started',
+    'seconds',
+    'out_bytes',
+    'err_bytes',
+    'cmd',
+)
+
+
+def percentile(sorted_values, fraction):
+    """
+    **Returns** nearest-rank percentile of already sorted list, eg. `percentile(seconds, 0.95)`
+    """
+    if not sorted_values:
+        return None
+
+    rank = int(math.ceil(fraction * len(sorted_values)))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+class Timings(object):
+    """
+    Collects records from `lib.run_observers` and pipeline stage durations
+
+    **Example**
+
+        timings = Timings()
+        lib.run_observers.append(timings.record)
+        with timings.stage('fix'):
+            ...
+        timings.write('./timings.json')
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = []
+        self.stages = {}
+
+    def record(self, record):
+        """
+        Appends `record` dictionary, see `lib.notify_run_observers` for keys
+        """
+        with self.lock:
+            self.records.append(record)
+
+    def stage(self, name):
+        """
+        **Returns** context manager that adds wall time of `with` block to `self.stages[name]`
+        """
+        return StageTimer(self, name)
+
+    def summary(self, top = 10):
+        """
+        **Returns** dictionary similar to...
+
+            {
+                "stages": {"prefetch": 12.5, "fix": 300.1},
+                "phases": {
+                    "fetch": {"count": 300, "total": 250.3, "p50": 0.7, "p95": 2.1, "max": 9.8}
+                },
+                "slowest_phases": ["fetch", "push", ...],
+                "slowest_repos": [{"repo": "_repo-name_", "seconds": 12.3, "calls": 11}]
+            }
+        """
+        with self.lock:
+            records = list(self.records)
+
+        phase_seconds = {}
+        repo_totals = {}
+        for record in records:
+            phase_seconds.setdefault(record['phase'], []).append(record['seconds'])
+            repo_total = repo_totals.setdefault(record['repo'], {'repo': record['repo'], 'seconds': 0.0, 'calls': 0})
+            repo_total['seconds'] += record['seconds']
+            repo_total['calls'] += 1
+
+        phases = {}
+        for phase, seconds in phase_seconds.items():
+            seconds.sort()
+            phases[phase] = {
+                'count': len(seconds),
+                'total': sum(seconds),
+                'p50': percentile(seconds, 0.50),
+                'p95': percentile(seconds, 0.95),
+                'max': seconds[-1],
+            }
+
+        return {
+            'stages': dict(self.stages),
+            'phases': phases,
+            'slowest_phases': sorted(phases, key = lambda phase: phases[phase]['total'], reverse = True),
+            'slowest_repos': sorted(repo_totals.values(), key = lambda total: total['seconds'], reverse = True)[0:top],
+        }
+
+    def write(self, path):
+        """
+        Writes records to `path`, as CSV if it ends with `.csv`, otherwise as JSON together with `summary()`
+        """
+        abspath = abs_path(path)
+        with self.lock:
+            records = list(self.records)
+
+        if abspath.endswith('.csv'):
+            with open(abspath, 'w', newline = '') as timings_fd:
+                writer = csv.DictWriter(timings_fd, fieldnames = csv_fields)
+                writer.writeheader()
+                for record in records:
+                    writer.writerow(dict(record, cmd = ' '.join(record['cmd'])))
+        else:
+            with open(abspath, 'w') as timings_fd:
+                json.dump({'summary': self.summary(), 'records': records}, timings_fd)
+
+        return abspath
+
+    def print_summary(self, top = 5):
+        """
+        Prints stage wall times, slowest repositories, and p50/p95 per phase
+        """
+        summary = self.summary(top)
+        for name, seconds in summary['stages'].items():
+            print("stage {name:<12} {seconds:9.3f}s".format(name = name, seconds = seconds))
+
+        for total in summary['slowest_repos']:
+            print("repo  {repo:<40} {seconds:9.3f}s {calls:4d} calls".format(**dict(total, repo = str(total['repo']))))
+
+        for phase in summary['slowest_phases']:
+            print("phase {phase:<12} count {count:5d} total {total:9.3f}s p50 {p50:7.3f}s p95 {p95:7.3f}s max {max:7.3f}s".format(
+                phase = phase, **summary['phases'][phase]))
+
+
+class StageTimer(object):
+    """
+    Context manager returned by `Timings.stage(name)`
+    """
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.time() - self.started
+        with self.timings.lock:
+            self.timings.stages[self.name] = self.timings.stages.get(self.name, 0.0) + seconds
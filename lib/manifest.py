@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+
+import json
+
+from lib import abs_path
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+class Manifest(object):
+    """
+    Line-delimited JSON manifest of repositories, one `config['repos']` entry per line
+
+    Lines are parsed lazily each time the manifest is iterated, so stages may stream it more than once without holding every repository in memory; blank lines and lines starting with `#` are skipped
+
+    **Example** `repos.jsonl`
+
+        {"dir": "~/git/hub/llSourcell/Bitcoin_Trading_Bot", "source": "https://github.com/jaungiers/Multidimensional-LSTM-BitCoin-Time-Series.git"}
+        {"dir": "~/git/hub/llSourcell/How_to_simulate_a_self_driving_car", "source": "git@github.com:naokishibuya/car-behavioral-cloning.git"}
+
+    **Throws/Raises** `ValueError` naming path and line number of lines that are not JSON objects
+    """
+
+    def __init__(self, path):
+        self.path = abs_path(path)
+
+    def __iter__(self):
+        with open(self.path, 'r') as manifest_fd:
+            for line_number, line in enumerate(manifest_fd, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+
+                try:
+                    repo = json.loads(line)
+                except ValueError:
+                    repo = None
+
+                if not isinstance(repo, dict):
+                    raise ValueError("{path}:{line_number} is not a JSON object".format(
+                        path = self.path, line_number = line_number))
+
+                yield repo
+
+
+def load_repos(configs, manifest = None):
+    """
+    **Returns** `Manifest` for `manifest` path, or for `configs['repos']` if that is a path string, otherwise `configs['repos']` list as is
+
+    **Example** `config.json` pointing at a manifest
+
+        {
+          "fixed": "./fixed.json",
+          "failed": "./failed.json",
+          "defaults": {...},
+          "repos": "./repos.jsonl"
+        }
+    """
+    repos = manifest or configs.get('repos', [])
+    if isinstance(repos, str):
+        return Manifest(repos)
+
+    return repos
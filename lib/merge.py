@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+
+import asyncio
+import os
+
+from lib import (
+    async_bounded_map,
+    async_run_git_steps,
+    bounded_map,
+    current_timeouts,
+    decode_status,
+    git_step,
+    GitException,
+    merge_timeouts,
+    parent_directory_name,
+    parse_timeouts,
+    repo_path,
+    run_git_steps,
+)
+from lib.resolve import load_rules, remove_worktree_steps, resolve_steps, start_merge_steps
+from lib.results import cap_output, read_results, ResultsWriter
+from lib.shard import parse_shard, shard_path, ShardedRepos
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def conflicted(repo, e, verbose):
+    """
+    Updates `repo` with `GitException` details
+
+    **Returns** tuple of `(repo, False)`
+    """
+    status = decode_status(e.status)
+    repo.update({
+        'message': e.message,
+        'code': status['code'],
+        'err': status['err'],
+        'out': status['out']
+    })
+    if status.get('timed_out') is not None:
+        repo['timed_out'] = status['timed_out']
+
+    if verbose:
+        print("{error_message}".format(error_message = e.message))
+
+    return repo, False
+
+
+def merged(repo, status, verbose):
+    """
+    Updates `repo` with `status` of `git mergetool`
+
+    **Returns** tuple of `(repo, True)`
+    """
+    repo.update(decode_status(status))
+    if verbose:
+        print("Fixed: {}".format(parent_directory_name(repo['dir'])))
+
+    return repo, True
+
+
+def merge_repo_steps(repo, verbose):
+    """
+    Generator of `git_step` arguments that run `git mergetool` within `repo['worktree']`, if `fix_logs.py --merge_mode worktree` left one, otherwise `repo['dir']`
+
+    Repositories routed to `failed.json` by `fix_logs.py --preflight` never attempted a merge, so it is first started on `fix_branch`; `git mergetool` is limited to `unresolved` paths left by `--rule` resolution, or conflicting `preflight_result` paths
+
+    Within a temporary worktree the resolved merge is committed with `repo['fix_commit']` message before the worktree is removed, see `lib.resolve.remove_worktree_steps`
+
+    **Returns** dictionary from `run(cmd)` function for `git mergetool`
+    """
+    cwd = repo_path(repo.get('worktree') or repo['dir'])
+    yield from start_merge_steps(repo, cwd, verbose)
+
+    preflight = repo.get('preflight_result')
+    paths = repo.get('unresolved') or (preflight.get('paths') if isinstance(preflight, dict) else None)
+    if paths:
+        paths = ['--'] + paths
+
+    status = yield git_step(['mergetool'] + (paths or []), "cannot resolve conflicts", True, cwd = cwd)
+    if repo.get('worktree'):
+        yield git_step(arg_list = ['commit', '--no-verify', '-m', repo['fix_commit']],
+                       error_message = "cannot commit resolved merge",
+                       verbose = verbose,
+                       cwd = cwd)
+        yield from remove_worktree_steps(repo, verbose)
+
+    return status
+
+
+def merge_repo(repo, verbose):
+    """
+    Runs `merge_repo_steps` for `repo`
+
+    **Returns** tuple of `(repo, merged)`
+    """
+    current_timeouts.set(repo.get('timeouts'))
+    try:
+        status = run_git_steps(merge_repo_steps(repo, verbose))
+    except GitException as e:
+        return conflicted(repo, e, verbose)
+
+    return merged(repo, status, verbose)
+
+
+async def async_merge_repo(repo, verbose, limiter):
+    """
+    Asyncio version of `merge_repo`, `limiter` is passed to `async_git` function
+    """
+    current_timeouts.set(repo.get('timeouts'))
+    try:
+        status = await async_run_git_steps(merge_repo_steps(repo, verbose), limiter = limiter)
+    except GitException as e:
+        return conflicted(repo, e, verbose)
+
+    return merged(repo, status, verbose)
+
+
+def resolved(repo, status, verbose):
+    """
+    Updates `repo` with `status` of `resolve_steps`
+
+    **Returns** tuple of `(repo, True)` if every conflicted path was settled by rules, otherwise `(repo, False)`
+    """
+    repo.update(decode_status(status))
+    if status['unresolved']:
+        return repo, False
+
+    if verbose:
+        print("Resolved: {}".format(parent_directory_name(repo['dir'])))
+
+    return repo, True
+
+
+def resolve_repo(repo, rules, verbose):
+    """
+    Runs `resolve_steps` for `repo`
+
+    **Returns** tuple of `(repo, resolved)`
+    """
+    current_timeouts.set(repo.get('timeouts'))
+    try:
+        status = run_git_steps(resolve_steps(repo, rules, verbose))
+    except GitException as e:
+        return conflicted(repo, e, verbose)
+
+    return resolved(repo, status, verbose)
+
+
+async def async_resolve_repo(repo, rules, verbose, limiter):
+    """
+    Asyncio version of `resolve_repo`, `limiter` is passed to `async_git` function
+    """
+    current_timeouts.set(repo.get('timeouts'))
+    try:
+        status = await async_run_git_steps(resolve_steps(repo, rules, verbose), limiter = limiter)
+    except GitException as e:
+        return conflicted(repo, e, verbose)
+
+    return resolved(repo, status, verbose)
+
+
+async def async_resolve_repos(repos, rules, verbose, jobs, on_result):
+    """
+    Runs `async_resolve_repo` for all `repos` within one event loop, calling `on_result(repo, resolved)` in order of `repos`
+    """
+    limiter = asyncio.Semaphore(jobs)
+    async for repo, resolved in async_bounded_map(lambda repo: async_resolve_repo(repo, rules, verbose, limiter), repos, jobs):
+        on_result(repo, resolved)
+
+
+async def async_merge_repos(repos, verbose, jobs, on_result):
+    """
+    Runs `async_merge_repo` for all `repos` within one event loop, calling `on_result(repo, merged)` in order of `repos`
+    """
+    limiter = asyncio.Semaphore(jobs)
+    async for repo, merged in async_bounded_map(lambda repo: async_merge_repo(repo, verbose, limiter), repos, jobs):
+        on_result(repo, merged)
+
+
+def merge_failed_main(args):
+    """
+    **Parameters**
+
+    - `args` Dictionary, parsed command-line arguments, eg. `failed` path and `jobs` count
+
+    **Example**
+
+        merge_failed_main({'failed': "./failed.json", 'jobs': 1})
+
+    **Note** `jobs` defaults to `1` because `git mergetool` is usually interactive
+
+    With `args['rules']` or `args['rule']` set, conflicted paths are first settled without interaction by `batch_jobs` workers, see `lib.resolve`; repositories that rules cannot fully settle are queued to `args['queue']` and only those get `git mergetool`, unless `args['batch_only']` is set
+
+    With `args['shard']` set, similar to `0/4`, only failed repositories within that shard are merged, and outputs get a `.shard-i-of-N` suffix
+
+    Git commands are killed once they run longer than `timeouts` logged with each repository, overridden by `args['timeout']` strings similar to `fetch=600`; `git mergetool` has no limit unless `mergetool=SECONDS` is given
+
+    The `failed` log is read line by line, and results streamed to `conflicts.json` and `merged.json` as JSON lines
+    """
+    failed_path = args.get('failed', './failed.json')
+    verbose = args.get('verbose')
+    jobs = args.get('jobs') or 1
+    rules = load_rules(args.get('rules'), args.get('rule'))
+
+    shard = parse_shard(args.get('shard'))
+
+    timeouts = parse_timeouts(args.get('timeout'))
+
+    def with_timeouts(repos):
+        for repo in repos:
+            repo['timeouts'] = merge_timeouts(repo.get('timeouts'), timeouts)
+            yield repo
+
+    def failed_repos(path):
+        repos = with_timeouts(read_results(path, 'failed'))
+        return ShardedRepos(repos, shard) if shard else repos
+
+    conflicts_log = ResultsWriter(shard_path(args.get('conflicts') or './conflicts.json', shard))
+    merged_log = ResultsWriter(shard_path(args.get('merged') or './merged.json', shard))
+    queue_log = ResultsWriter(shard_path(args.get('queue') or './queue.json', shard))
+
+    def write_result(repo, merged):
+        cap_output(repo, args.get('output_limit') or 4096, args.get('logs_dir'))
+        if merged:
+            merged_log.write(repo)
+        else:
+            conflicts_log.write(repo)
+
+    def write_resolved(repo, resolved):
+        if resolved:
+            write_result(repo, True)
+        elif args.get('batch_only'):
+            write_result(repo, False)
+        else:
+            queue_log.write(repo)
+
+    try:
+        if rules:
+            batch_jobs = args.get('batch_jobs') or os.cpu_count() or 1
+            if args.get('use_async'):
+                asyncio.run(async_resolve_repos(failed_repos(failed_path), rules, verbose, batch_jobs, write_resolved))
+            else:
+                for repo, resolved in bounded_map(lambda repo: resolve_repo(repo, rules, verbose), failed_repos(failed_path), batch_jobs):
+                    write_resolved(repo, resolved)
+
+            queue_log.close()
+            print("Resolved {count} by rules".format(count = merged_log.count))
+            failed_path = queue_log.path if queue_log.count else None
+
+        if failed_path:
+            if args.get('use_async'):
+                asyncio.run(async_merge_repos(failed_repos(failed_path), verbose, jobs, write_result))
+            else:
+                for repo, merged in bounded_map(lambda repo: merge_repo(repo, verbose), failed_repos(failed_path), jobs):
+                    write_result(repo, merged)
+    finally:
+        conflicts_log.close()
+        merged_log.close()
+        queue_log.close()
+
+    if conflicts_log.count:
+        print("Wrote conflicts to -> {path}".format(path = conflicts_log.path))
+
+    if merged_log.count:
+        print("Wrote merged to -> {path}".format(path = merged_log.path))
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+
+import asyncio
+import json
+import os
+
+from lib import (
+    bounded_map,
+    current_repo,
+    current_timeouts,
+    git_step,
+    GitException,
+    merge_timeouts,
+    parse_timeouts,
+    repo_path,
+    run_git_steps,
+)
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def alternates_file_steps(repo_dir, verbose = False):
+    """
+    Generator of `git_step` arguments that locate `objects/info/alternates` of repository at `repo_dir`
+
+    **Returns** absolute path, the file may not exist yet
+    """
+    path = (yield git_step(arg_list = ['rev-parse', '--git-path', 'objects/info/alternates'],
+                           error_message = "cannot locate alternates of {repo_dir}".format(repo_dir = repo_dir),
+                           verbose = verbose,
+                           cwd = repo_dir))['out'].decode('utf-8').strip()
+
+    return os.path.join(repo_dir, path)
+
+
+def read_alternates(path):
+    """
+    **Returns** list of object directories listed within alternates file at `path`
+    """
+    if not os.path.isfile(path):
+        return []
+
+    with open(path, 'r') as alternates_fd:
+        return [line.strip() for line in alternates_fd if line.strip() and not line.startswith('#')]
+
+
+def write_alternates(path, object_dirs):
+    """
+    Writes `object_dirs` to alternates file at `path`, removing the file if there are none
+    """
+    if not object_dirs:
+        if os.path.isfile(path):
+            os.remove(path)
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, 'w') as alternates_fd:
+        alternates_fd.write(''.join(["{object_dir}\n".format(object_dir = object_dir) for object_dir in object_dirs]))
+
+
+def configure_pool_steps(pool_path, verbose = False):
+    """
+    Generator of `git_step` arguments that stop `git gc` within pool at `pool_path` from pruning objects, which forks borrowing from it may still need
+    """
+    yield git_step(arg_list = ['config', 'gc.pruneExpire', 'never'],
+                   error_message = "cannot configure pool {pool_path}".format(pool_path = pool_path),
+                   verbose = verbose,
+                   cwd = pool_path)
+
+
+def link_pool_steps(repo_dir, pool_path, repack = False, verbose = False):
+    """
+    Generator of `git_step` arguments that add objects of pool at `pool_path` to alternates of repository at `repo_dir`
+
+    With `repack` set, objects of `repo_dir` that the pool already has are dropped via `git repack -a -d -l`
+
+    **Returns** `True` if alternates were changed
+    """
+    yield from configure_pool_steps(pool_path, verbose)
+
+    alternates = yield from alternates_file_steps(repo_dir, verbose)
+    object_dirs = read_alternates(alternates)
+    pool_objects = os.path.join(pool_path, 'objects')
+    changed = pool_objects not in object_dirs
+    if changed:
+        write_alternates(alternates, object_dirs + [pool_objects])
+
+    if repack:
+        yield git_step(arg_list = ['repack', '-a', '-d', '-l', '-q'],
+                       error_message = "cannot repack {repo_dir} against pool".format(repo_dir = repo_dir),
+                       verbose = verbose,
+                       cwd = repo_dir)
+
+    return changed
+
+
+def unlink_pool_steps(repo_dir, pool_path, verbose = False):
+    """
+    Generator of `git_step` arguments that copy borrowed objects back into repository at `repo_dir`, via `git repack -a -d`, then remove pool at `pool_path` from its alternates
+
+    **Returns** `True` if alternates were changed
+    """
+    alternates = yield from alternates_file_steps(repo_dir, verbose)
+    object_dirs = read_alternates(alternates)
+    pool_objects = os.path.join(pool_path, 'objects')
+    if pool_objects not in object_dirs:
+        return False
+
+    yield git_step(arg_list = ['repack', '-a', '-d', '-q'],
+                   error_message = "cannot repack {repo_dir} before unlinking pool".format(repo_dir = repo_dir),
+                   verbose = verbose,
+                   cwd = repo_dir)
+
+    write_alternates(alternates, [object_dir for object_dir in object_dirs if object_dir != pool_objects])
+    return True
+
+
+def disk_usage_steps(repo_dir, verbose = False):
+    """
+    Generator of `git_step` arguments that read object store size of repository at `repo_dir`
+
+    **Returns** number of KiB used by loose objects and packs, excluding borrowed objects
+    """
+    out = (yield git_step(arg_list = ['count-objects', '-v'],
+                          error_message = "cannot count objects of {repo_dir}".format(repo_dir = repo_dir),
+                          verbose = verbose,
+                          cwd = repo_dir))['out'].decode('utf-8')
+
+    sizes = dict([line.split(': ', 1) for line in out.splitlines() if ': ' in line])
+    return int(sizes.get('size', 0)) + int(sizes.get('size-pack', 0))
+
+
+def link_repo(repo, source_caches, unlink = False, repack = False, verbose = False, timeouts = None):
+    """
+    Links, or unlinks, single entry from `config['repos']` to pool of its `source`, `repo['timeouts']` are merged over `timeouts`
+
+    **Returns** tuple of `(repo_dir, changed)`, where `changed` is `None` if `source` has no pool or Git failed
+    """
+    repo_dir = repo_path(repo['dir'])
+    pool_path = source_caches.get(repo['source'])
+    current_repo.set(repo.get('name', os.path.basename(repo_dir)))
+    current_timeouts.set(merge_timeouts(timeouts, repo.get('timeouts')))
+    if not pool_path:
+        return repo_dir, None
+
+    try:
+        if unlink:
+            return repo_dir, run_git_steps(unlink_pool_steps(repo_dir, pool_path, verbose))
+
+        return repo_dir, run_git_steps(link_pool_steps(repo_dir, pool_path, repack, verbose))
+    except GitException as e:
+        print("{error_message}".format(error_message = e.message))
+        return repo_dir, None
+
+
+def link_pools(repos, source_caches, jobs, unlink = False, repack = False, verbose = False, timeouts = None):
+    """
+    Links each of `repos` to pool of its `source`, at most `jobs` at the same time
+
+    **Parameters**
+
+    - `repos` List, of dictionaries similar to `config['repos']`
+    - `source_caches` Dictionary, of `source` URL to bare pool repository, eg. from `lib.prefetch.prefetch_sources`
+    - `timeouts` Optional dictionary of command phase to seconds, eg. `defaults['timeouts']`
+
+    **Returns** dictionary similar to `{"changed": 3, "unchanged": 10, "skipped": 1}`
+    """
+    counts = {'changed': 0, 'unchanged': 0, 'skipped': 0}
+    for _repo_dir, changed in bounded_map(lambda repo: link_repo(repo, source_caches, unlink, repack, verbose, timeouts), repos, jobs):
+        if changed is None:
+            counts['skipped'] += 1
+        elif changed:
+            counts['changed'] += 1
+        else:
+            counts['unchanged'] += 1
+
+    return counts
+
+
+def disk_usage(repo_dirs, jobs, verbose = False):
+    """
+    **Returns** total KiB of object stores of `repo_dirs`, directories that are not repositories are left out
+    """
+    def usage(repo_dir):
+        try:
+            return run_git_steps(disk_usage_steps(repo_dir, verbose))
+        except GitException:
+            return 0
+
+    return sum(bounded_map(usage, repo_dirs, jobs))
+
+
+def pools_main(args):
+    """
+    Builds, or updates, one bare object pool per distinct `source` of `config['repos']`, and links each repository to it via `objects/info/alternates`
+
+    Pools are the same bare repositories `fix_logs.py --prefetch` fetches into, so `--source_cache` is shared
+
+    **Parameters**
+
+    - `args` Dictionary, parsed command-line arguments, eg. `config` path, `jobs` count, `timeout` strings, `repack`, `unlink`, and `stats` flags
+
+    **Returns** dictionary of counts from `link_pools`, with `repos_kib` and `pools_kib` added when `args['stats']` is set
+    """
+    from lib.manifest import load_repos
+    from lib.prefetch import prefetch_sources, source_cache_path
+
+    with open(args.get('config', './config.json'), 'r') as configs_fd:
+        configs = json.load(configs_fd)
+
+    repos = load_repos(configs, args.get('manifest'))
+    jobs = args.get('jobs') or configs.get('jobs') or 1
+    verbose = args.get('verbose') or configs.get('verbose')
+    cache_dir = args.get('source_cache') or configs.get('source_cache', './source_cache')
+    timeouts = merge_timeouts(configs.get('timeouts'), parse_timeouts(args.get('timeout')))
+
+    if args.get('unlink'):
+        source_caches = {
+            repo['source']: source_cache_path(cache_dir, repo['source'])
+            for repo in repos
+        }
+    else:
+        source_caches = asyncio.run(prefetch_sources(repos = repos, cache_dir = cache_dir, jobs = jobs, verbose = verbose, timeouts = timeouts))
+
+    report = link_pools(repos, source_caches, jobs,
+                        unlink = args.get('unlink'),
+                        repack = args.get('repack'),
+                        verbose = verbose,
+                        timeouts = timeouts)
+
+    if args.get('stats'):
+        report['repos_kib'] = disk_usage((repo_path(repo['dir']) for repo in repos), jobs, verbose)
+        report['pools_kib'] = disk_usage(sorted(set(source_caches.values())), jobs, verbose)
+
+    return report
+
+
+def print_report(report):
+    """
+    Prints counts, and disk usage if available, returned by `pools_main`
+    """
+    print("Alternates changed for {changed}, unchanged for {unchanged}, skipped {skipped} repositories".format(**report))
+    if 'repos_kib' in report:
+        print("Repositories use {repos_kib} KiB, pools use {pools_kib} KiB".format(**report))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+
+import asyncio
+import hashlib
+import os
+
+from lib import (
+    abs_path,
+    async_git,
+    current_repo,
+    current_timeouts,
+    GitException,
+    merge_timeouts,
+)
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def group_by_source(repos):
+    """
+    Groups `repos` that share the same upstream `source` URL
+
+    **Parameters**
+
+    - `repos` List, of dictionaries similar to `config['repos']`
+
+    **Returns** dictionary of `source` URL to list of `repos`, in order of first appearance
+    """
+    groups = {}
+    for repo in repos:
+        groups.setdefault(repo['source'], []).append(repo)
+
+    return groups
+
+
+def source_cache_path(cache_dir, source):
+    """
+    **Returns** path of the bare cache repository for `source` URL within `cache_dir`
+
+    **Example**
+
+        source_cache_path('./source_cache', 'git@github.com:deepfakes/faceswap.git')
+        #> /home/user-name/git/hub/git-utilities/fix_logs/source_cache/faceswap-6b0a5d7bd0c6.git
+    """
+    name = os.path.basename(source.rstrip('/'))
+    if name.endswith('.git'):
+        name = name[:-len('.git')]
+
+    digest = hashlib.sha1(source.encode('utf-8')).hexdigest()[0:12]
+    return os.path.join(abs_path(cache_dir), "{name}-{digest}.git".format(name = name, digest = digest))
+
+
+async def prefetch_source(source, cache_path, limiter, verbose = False, timeouts = None):
+    """
+    Initializes, if necessary, bare repository at `cache_path` and fetches all branches of `source` into it
+
+    **Parameters**
+
+    - `timeouts` Optional dictionary of command phase to seconds, see `lib.merge_timeouts`, defaults to `lib.default_timeouts`
+
+    **Returns** `cache_path` or `None` if fetching failed
+    """
+    current_repo.set(source)
+    current_timeouts.set(timeouts or merge_timeouts())
+    try:
+        if not os.path.isdir(cache_path):
+            await async_git(arg_list = ['init', '--quiet', '--bare', cache_path],
+                            error_message = "cannot initialize source cache {cache_path}".format(cache_path = cache_path),
+                            verbose = verbose,
+                            limiter = limiter)
+
+        await async_git(arg_list = ['fetch', '--quiet', '--prune', source, '+refs/heads/*:refs/heads/*'],
+                        error_message = "cannot prefetch {source}".format(source = source),
+                        verbose = verbose,
+                        cwd = cache_path,
+                        limiter = limiter)
+    except GitException as e:
+        print("{error_message}".format(error_message = e.message))
+        return None
+
+    return cache_path
+
+
+async def prefetch_sources(repos, cache_dir, jobs, verbose = False, timeouts = None):
+    """
+    Fetches each distinct `source` of `repos` once, with at most `jobs` fetches running at the same time
+
+    **Parameters**
+
+    - `repos` Iterable, of dictionaries similar to `config['repos']`
+    - `cache_dir` String, directory that bare cache repositories are kept within
+    - `jobs` Number, limit of concurrent Git commands
+    - `timeouts` Optional dictionary of command phase to seconds, eg. `defaults['timeouts']`, that `timeouts` of the first repository of each `source` are merged over
+
+    **Returns** dictionary of `source` URL to cache repository path, failed `source` URLs are left out so `fix_log` fetches them directly
+    """
+    limiter = asyncio.Semaphore(jobs)
+    # Only distinct URLs are kept, so `repos` may be a lazily read `lib.manifest.Manifest`
+    first_repos = {}
+    for repo in repos:
+        first_repos.setdefault(repo['source'], {'timeouts': repo.get('timeouts')})
+
+    sources = list(first_repos)
+    cache_paths = await asyncio.gather(*[
+        prefetch_source(source, source_cache_path(cache_dir, source), limiter, verbose,
+                        timeouts = merge_timeouts(timeouts, first_repos[source]['timeouts']))
+        for source in sources
+    ])
+
+    return {
+        source: cache_path
+        for source, cache_path in zip(sources, cache_paths)
+        if cache_path
+    }
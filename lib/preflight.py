@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+
+from lib import (
+    ErrorMessage,
+    git_step,
+)
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+# Conflicts that `git merge -X ours` or `-X theirs` resolve without help
+trivial_conflict_types = (
+    'CONFLICT (contents)',
+)
+
+
+def parse_merge_tree(out):
+    """
+    Parses output of `git merge-tree --write-tree --name-only -z`
+
+    **Parameters**
+
+    - `out` Bytes, Standard Out of `git merge-tree`
+
+    **Returns** dictionary similar to...
+
+        {
+            "tree": "_tree-hash_",
+            "paths": ["README.md", "setup.py"],
+            "messages": [
+                {"paths": ["README.md"], "type": "CONFLICT (contents)", "message": "CONFLICT (content): Merge conflict in README.md"}
+            ]
+        }
+    """
+    fields = out.decode('utf-8', 'replace').split('\0')
+    parsed = {'tree': fields[0].strip(), 'paths': [], 'messages': []}
+
+    index = 1
+    while index < len(fields) and fields[index]:
+        parsed['paths'].append(fields[index])
+        index += 1
+
+    # Skip empty field that ends conflicted paths
+    index += 1
+    while index < len(fields) and fields[index].isdigit():
+        path_count = int(fields[index])
+        paths = fields[index + 1:index + 1 + path_count]
+        kind, message = (fields[index + 1 + path_count:index + 3 + path_count] + ['', ''])[0:2]
+        parsed['messages'].append({'paths': paths, 'type': kind, 'message': message.strip()})
+        index += path_count + 3
+
+    return parsed
+
+
+def classify_merge_tree(status):
+    """
+    Classifies `git merge-tree` outcome as one of...
+
+    - `clean` merges without conflicts, `tree` may be committed as is
+    - `trivial` only has content conflicts, which `merge_strategy` of `ours` or `theirs` resolves
+    - `conflicting` has conflicts needing a human, eg. modify/delete or rename conflicts
+    - `unknown` when `git merge-tree` could not run, eg. unrelated histories
+
+    **Parameters**
+
+    - `status` Dictionary, returned from `run(cmd)` for `git merge-tree --write-tree --name-only -z`
+
+    **Returns** dictionary similar to...
+
+        {
+            "class": "conflicting",
+            "tree": "_tree-hash_",
+            "paths": ["setup.py"],
+            "count": 1,
+            "conflicts": [
+                {"paths": ["setup.py"], "type": "CONFLICT (modify/delete)", "message": "..."}
+            ]
+        }
+    """
+    if status['code'] not in (0, 1):
+        return {'class': 'unknown', 'tree': None, 'paths': [], 'count': 0, 'conflicts': []}
+
+    parsed = parse_merge_tree(status['out'])
+    conflicts = [message for message in parsed['messages'] if message['type'].startswith('CONFLICT')]
+
+    if status['code'] == 0:
+        kind = 'clean'
+    elif conflicts and all(conflict['type'] in trivial_conflict_types for conflict in conflicts):
+        kind = 'trivial'
+    else:
+        kind = 'conflicting'
+
+    return {
+        'class': kind,
+        'tree': parsed['tree'],
+        'paths': parsed['paths'],
+        'count': len(parsed['paths']),
+        'conflicts': conflicts,
+    }
+
+
+def preflight_steps(repo, repo_dir, source_hash, latest_hash):
+    """
+    Generator of `git_step` arguments that dry-run merging `latest_hash` into `source_hash`, without touching any working tree
+
+    **Returns** dictionary from `classify_merge_tree`, with `source_hash` and `latest_hash` added
+    """
+    status = yield git_step(arg_list = ['merge-tree', '--write-tree', '--name-only', '-z', source_hash, latest_hash],
+                            error_message = ErrorMessage("{name} cannot preflight merge of `latest_hash` {latest_hash}", repo, latest_hash = latest_hash),
+                            verbose = repo['verbose'],
+                            cwd = repo_dir)
+
+    preflight = classify_merge_tree(status)
+    preflight.update({'source_hash': source_hash, 'latest_hash': latest_hash})
+    return preflight
+
+
+def preflight_status(preflight):
+    """
+    **Returns** dictionary similar to `run(cmd)` function output, for `GitException` when `preflight` routes a repository to `failed` log
+    """
+    return {
+        'code': 1,
+        'out': b'',
+        'err': "\n".join([conflict['message'] for conflict in preflight['conflicts']]).encode('utf-8'),
+        'preflight_result': preflight,
+    }
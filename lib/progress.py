@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+
+
+import http.server
+import json
+import os
+import shutil
+import socketserver
+import sys
+import threading
+import time
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def repo_count(repos):
+    """
+    **Returns** number of `repos`, or `None` when they are read lazily, eg. from a `lib.manifest.Manifest`
+    """
+    try:
+        return len(repos)
+    except TypeError:
+        return None
+
+
+def format_seconds(seconds):
+    """
+    **Returns** string similar to `1h02m`, `8m12s`, or `45s`, or `?` if `seconds` is `None`
+    """
+    if seconds is None:
+        return '?'
+
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return "{0}h{1:02d}m".format(seconds // 3600, seconds % 3600 // 60)
+
+    if seconds >= 60:
+        return "{0}m{1:02d}s".format(seconds // 60, seconds % 60)
+
+    return "{0}s".format(seconds)
+
+
+class Progress(object):
+    """
+    Counts repositories done, failed, and in flight, and tracks the Git phase each in flight repository is running
+
+    `start` and `finish` are registered with `lib.start_observers` and `lib.run_observers`, a repository counts as in flight from its first Git command until `done(repo_configs, fixed)` is called for it, or `release` is called for tasks that are not fixes, eg. prefetches and `--watch` polls
+
+    **Parameters**
+
+    - `total` Number, of repositories expected, or `None` if unknown, in which case there is no ETA
+
+    **Example**
+
+        progress = Progress(total = len(repos))
+        lib.start_observers.append(progress.start)
+        lib.run_observers.append(progress.finish)
+        ...
+        progress.done(repo_configs, fixed)
+        progress.snapshot()
+    """
+
+    def __init__(self, total = None):
+        self.total = total
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.fixed = 0
+        self.failed = 0
+        self.commands = 0
+        self.phases = {}
+
+    def start(self, record):
+        """
+        Marks `record['repo']` in flight, running `record['phase']`
+        """
+        if record['repo'] is None:
+            return
+
+        with self.lock:
+            self.phases[record['repo']] = record['phase']
+
+    def finish(self, record):
+        """
+        Counts a finished Git command, the repository stays in flight
+        """
+        with self.lock:
+            self.commands += 1
+
+    def done(self, repo_configs, fixed):
+        """
+        Counts `repo_configs` as fixed, or failed, and no longer in flight
+        """
+        with self.lock:
+            self.phases.pop(repo_configs.get('name'), None)
+            if fixed:
+                self.fixed += 1
+            else:
+                self.failed += 1
+
+    def release(self, names = None):
+        """
+        Drops `names`, or every repository when `None`, from in flight without counting them done
+        """
+        with self.lock:
+            if names is None:
+                self.phases.clear()
+                return
+
+            for name in names:
+                self.phases.pop(name, None)
+
+    def snapshot(self):
+        """
+        **Returns** dictionary similar to...
+
+            {
+                "total": 300,
+                "done": 42,
+                "fixed": 40,
+                "failed": 2,
+                "in_flight": 4,
+                "commands": 480,
+                "elapsed": 71.9,
+                "repos_per_minute": 35.0,
+                "eta": 442.3,
+                "phases": {"repo-name": "fetch", "other-repo": "merge"}
+            }
+        """
+        with self.lock:
+            elapsed = time.time() - self.started
+            done = self.fixed + self.failed
+            rate = done * 60.0 / elapsed if elapsed > 0 else 0.0
+            eta = None
+            if self.total is not None and rate > 0:
+                eta = max(0, self.total - done) * 60.0 / rate
+
+            return {
+                'total': self.total,
+                'done': done,
+                'fixed': self.fixed,
+                'failed': self.failed,
+                'in_flight': len(self.phases),
+                'commands': self.commands,
+                'elapsed': round(elapsed, 3),
+                'repos_per_minute': round(rate, 3),
+                'eta': None if eta is None else round(eta, 3),
+                'phases': dict(self.phases),
+            }
+
+
+def status_line(snapshot, width = None):
+    """
+    **Returns** one line summary of `Progress.snapshot()`, cut to `width` characters if defined
+
+    **Example**
+
+        status_line(progress.snapshot())
+        #> '42/300 done, 2 failed, 4 in flight, 35.0 repos/min, ETA 7m22s | repo-name fetch, other-repo merge'
+    """
+    line = "{done}/{total} done, {failed} failed, {in_flight} in flight, {repos_per_minute:.1f} repos/min, ETA {eta}".format(
+        **dict(snapshot, total = '?' if snapshot['total'] is None else snapshot['total'], eta = format_seconds(snapshot['eta'])))
+
+    if snapshot['phases']:
+        line += ' | ' + ', '.join([
+            "{repo} {phase}".format(repo = repo, phase = phase) for repo, phase in sorted(snapshot['phases'].items())])
+
+    if width and len(line) > width:
+        return line[0:max(0, width - 3)] + '...'
+
+    return line
+
+
+class ProgressReporter(object):
+    """
+    Writes `progress.snapshot()` to `stream` every `interval` seconds from a background thread
+
+    On a TTY one status line is rewritten in place, otherwise one JSON line similar to `{"progress": {...}}` is written per interval, for logs and other programs to parse
+
+    **Example**
+
+        reporter = ProgressReporter(progress, interval = 2.0)
+        reporter.start()
+        ...
+        reporter.close()
+    """
+
+    def __init__(self, progress, interval = 2.0, stream = None):
+        self.progress = progress
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.tty = self.stream.isatty()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target = self.work, daemon = True)
+        self.thread.start()
+
+    def work(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def report(self):
+        """
+        Writes one status update
+        """
+        snapshot = self.progress.snapshot()
+        if self.tty:
+            width = shutil.get_terminal_size().columns - 1
+            self.stream.write("\r\x1b[K{line}".format(line = status_line(snapshot, width)))
+        else:
+            self.stream.write("{line}\n".format(line = json.dumps({'progress': snapshot})))
+
+        self.stream.flush()
+
+    def close(self):
+        """
+        Stops the background thread and writes a final update, ending the in place line on a TTY
+        """
+        if self.thread is None:
+            return
+
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+        self.report()
+        if self.tty:
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+class SnapshotHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers every `GET` with `server.progress.snapshot()` as JSON
+    """
+
+    def do_GET(self):
+        body = json.dumps(self.server.progress.snapshot()).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        # Scrapes would otherwise be logged to Standard Error between status lines
+        pass
+
+
+class SnapshotStreamHandler(socketserver.StreamRequestHandler):
+    """
+    Writes `server.progress.snapshot()` as one JSON line to each Unix socket connection, then closes it
+    """
+
+    def handle(self):
+        self.wfile.write(json.dumps(self.server.progress.snapshot()).encode('utf-8') + b'\n')
+
+
+class ThreadingUnixStreamServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_progress(progress, listen):
+    """
+    Serves `progress.snapshot()` from a background thread, so monitoring can scrape a running job
+
+    **Parameters**
+
+    - `progress` `Progress` instance
+    - `listen` String, a Unix socket path if it contains a `/`, otherwise `PORT` or `HOST:PORT` for HTTP, the host defaults to `127.0.0.1`
+
+    **Returns** server instance, call its `shutdown()` and `server_close()` methods when done
+
+    **Example**
+
+        server = serve_progress(progress, '8642')
+        #> curl http://127.0.0.1:8642/
+        server = serve_progress(progress, './fix_logs.sock')
+        #> socat - UNIX-CONNECT:./fix_logs.sock
+    """
+    if '/' in listen:
+        if os.path.exists(listen):
+            # Left behind by a run that did not exit cleanly
+            os.remove(listen)
+
+        server = ThreadingUnixStreamServer(listen, SnapshotStreamHandler)
+    else:
+        host, _colon, port = listen.rpartition(':')
+        server = http.server.ThreadingHTTPServer((host or '127.0.0.1', int(port)), SnapshotHandler)
+        server.daemon_threads = True
+
+    server.progress = progress
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    return server
+
+
+def close_server(server):
+    """
+    Stops `server` from `serve_progress`, removing its Unix socket file if any
+    """
+    server.shutdown()
+    server.server_close()
+    if isinstance(server.server_address, str) and os.path.exists(server.server_address):
+        os.remove(server.server_address)
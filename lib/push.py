@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+
+import threading
+import time
+import urllib.parse
+
+from lib import (
+    current_repo,
+    current_timeouts,
+    decode_status,
+    ErrorMessage,
+    git,
+    GitException,
+    repo_path,
+)
+from lib.retry import classify_status, transient_classes
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def push_host(remote_url):
+    """
+    **Returns** host name that `remote_url` pushes to, or `local` for paths and `file://` URLs
+
+    **Example**
+
+        push_host('git@github.com:account-name/repo-name.git')
+        #> 'github.com'
+    """
+    if '://' in remote_url:
+        return urllib.parse.urlsplit(remote_url).hostname or 'local'
+
+    # scp-like syntax, eg. `user@host:path`, unless the colon follows a slash
+    host, colon, _path = remote_url.partition(':')
+    if colon and '/' not in host:
+        return host.rpartition('@')[2]
+
+    return 'local'
+
+
+class PushScheduler(object):
+    """
+    Pushes results with `pending_push`, from `fix_log` with `push_stage` set, in background threads grouped by remote host
+
+    At most `jobs_per_host` pushes run against one host at the same time; a push failing with an error within `retry_classes`, see `lib.retry`, pauses its whole host for `backoff` seconds, doubling on each retry, before it is tried again up to `retries` times
+
+    Each result pushes a single ref, `origin_branch` with a lease on the tip it was merged onto, so results are never coalesced into one `git push --atomic`; two results of one repository would name the same destination ref, which Git rejects
+
+    **Parameters**
+
+    - `on_done` Function, called as `on_done(repo_configs, pushed)` once per submitted result, one call at a time
+    - `jobs_per_host` Number, of concurrent pushes per host
+    - `retries` Number, of extra attempts after a failed push
+    - `backoff` Number, of seconds to pause a host after its first failure
+    - `retry_classes` Tuple, of error classes from `lib.retry.classify_status` to retry, eg. `config['retry_classes']`
+    - `verbose` Boolean, passed to `git` function
+
+    **Example**
+
+        scheduler = PushScheduler(on_done = write_result, jobs_per_host = 4)
+        scheduler.submit(repo_configs)
+        scheduler.close()
+    """
+
+    def __init__(self, on_done, jobs_per_host = 2, retries = 3, backoff = 1.0, retry_classes = transient_classes, verbose = False):
+        self.on_done = on_done
+        self.jobs_per_host = jobs_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_classes = tuple(retry_classes)
+        self.verbose = verbose
+        self.condition = threading.Condition()
+        self.done_lock = threading.Lock()
+        self.pending = {}
+        self.paused_until = {}
+        self.threads = []
+        self.closed = False
+
+    def submit(self, repo_configs):
+        """
+        Queues `repo_configs` for pushing, starting workers for its host if needed
+        """
+        host = push_host(repo_configs['pending_push']['remote_url'])
+        with self.condition:
+            if host not in self.pending:
+                self.pending[host] = []
+                for _ in range(self.jobs_per_host):
+                    thread = threading.Thread(target = self.work, args = (host,), daemon = True)
+                    thread.start()
+                    self.threads.append(thread)
+
+            self.pending[host].append(repo_configs)
+            self.condition.notify_all()
+
+    def close(self):
+        """
+        Waits for all queued pushes to finish
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+        for thread in self.threads:
+            thread.join()
+
+    def work(self, host):
+        while True:
+            with self.condition:
+                while not self.pending[host] and not self.closed:
+                    self.condition.wait()
+
+                if not self.pending[host]:
+                    return
+
+                repo_configs = self.pending[host].pop(0)
+
+            pushed, status, message, attempt = self.push(host, repo_configs)
+            with self.done_lock:
+                self.finish(repo_configs, pushed, status, message, attempt)
+
+    def push(self, host, repo_configs):
+        """
+        Pushes `repo_configs['pending_push']` with retries, pausing `host` after each failure `lib.retry.classify_status` finds within `self.retry_classes`
+
+        **Returns** tuple of `(pushed, status, message, attempt)`
+        """
+        current_repo.set(repo_configs['name'])
+        current_timeouts.set(repo_configs['timeouts'])
+        arg_list = ['push', repo_configs['pending_push']['lease'], repo_configs['origin_remote'], repo_configs['pending_push']['refspec']]
+
+        attempt = 0
+        while True:
+            with self.condition:
+                pause = self.paused_until.get(host, 0) - time.time()
+
+            if pause > 0:
+                time.sleep(pause)
+
+            try:
+                status = git(arg_list = arg_list,
+                             error_message = ErrorMessage("{name} cannot push `origin_remote` or `origin_branch`", repo_configs),
+                             verbose = self.verbose,
+                             cwd = repo_path(repo_configs['dir']))
+                return True, status, None, attempt
+            except GitException as e:
+                if attempt >= self.retries or classify_status(e.status) not in self.retry_classes:
+                    return False, e.status, e.message, attempt
+
+                with self.condition:
+                    self.paused_until[host] = max(self.paused_until.get(host, 0),
+                                                  time.time() + self.backoff * (2 ** attempt))
+                attempt += 1
+
+    def finish(self, repo_configs, pushed, status, message, attempt = 0):
+        """
+        Updates `repo_configs` with outcome of its push, and calls `self.on_done`
+        """
+        pending_push = repo_configs.pop('pending_push')
+        if attempt:
+            repo_configs['retries'] = dict(repo_configs.get('retries') or {}, push = attempt)
+
+        if pushed:
+            repo_configs.update({
+                'out': "Finished fixing {dir}".format(dir = repo_configs['dir']),
+                'origin_hash': pending_push['refspec'].split(':')[0],
+            })
+        else:
+            status = decode_status(status)
+            repo_configs.update({
+                'message': message,
+                'error_class': classify_status(status),
+                'code': status['code'],
+                'err': status['err'],
+                'out': status['out'],
+            })
+
+        self.on_done(repo_configs, pushed)
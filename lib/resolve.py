@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+
+import fnmatch
+import json
+import os
+import tempfile
+
+from lib import (
+    abs_path,
+    git_step,
+    repo_path,
+)
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+strategies = (
+    'ours',
+    'theirs',
+    'union',
+)
+
+
+def parse_rule(rule):
+    """
+    **Returns** dictionary similar to `{"glob": "README*", "resolve": "theirs"}` from `rule` string similar to `README*=theirs`
+
+    **Throws/Raises** `ValueError` if strategy is not one of `strategies`
+    """
+    glob, _, strategy = rule.rpartition('=')
+    if not glob or strategy not in strategies:
+        raise ValueError("rule {rule} is not similar to GLOB=ours|theirs|union".format(rule = rule))
+
+    return {'glob': glob, 'resolve': strategy}
+
+
+def load_rules(path = None, rule_strings = None):
+    """
+    Loads resolution rules from JSON file at `path`, followed by `rule_strings` from command-line
+
+    **Parameters**
+
+    - `path` String, optional path to JSON file similar to...
+
+        {
+          "rules": [
+            {"glob": "README*", "resolve": "theirs"},
+            {"glob": "LICENSE", "resolve": "ours"},
+            {"glob": "docs/*.md", "resolve": "union"}
+          ]
+        }
+
+    - `rule_strings` List, of strings similar to `README*=theirs`
+
+    **Returns** list of rule dictionaries, first matching glob wins
+    """
+    rules = []
+    if path:
+        with open(abs_path(path), 'r') as rules_fd:
+            loaded = json.load(rules_fd)
+
+        for rule in (loaded.get('rules', []) if isinstance(loaded, dict) else loaded):
+            if rule.get('resolve') not in strategies:
+                raise ValueError("rule {rule} has no `resolve` of ours, theirs, or union".format(rule = rule))
+
+            rules.append({'glob': rule['glob'], 'resolve': rule['resolve']})
+
+    for rule in rule_strings or []:
+        rules.append(parse_rule(rule))
+
+    return rules
+
+
+def rule_for(path, rules):
+    """
+    **Returns** strategy of first rule whose glob matches `path`, or `None`
+
+    Globs without a `/` match the file name within any directory, similar to `.gitignore` patterns
+    """
+    for rule in rules:
+        if '/' in rule['glob']:
+            if fnmatch.fnmatch(path, rule['glob']):
+                return rule['resolve']
+        elif fnmatch.fnmatch(os.path.basename(path), rule['glob']):
+            return rule['resolve']
+
+    return None
+
+
+def unmerged_entries(out):
+    """
+    Parses output of `git ls-files --unmerged -z`
+
+    **Returns** dictionary of path to dictionary of stage number to blob hash, stage `1` is the merge base, `2` ours, and `3` theirs
+    """
+    entries = {}
+    for record in out.decode('utf-8', 'replace').split('\0'):
+        if not record:
+            continue
+
+        info, path = record.split('\t', 1)
+        _mode, blob, stage = info.split(' ')
+        entries.setdefault(path, {})[int(stage)] = blob
+
+    return entries
+
+
+def start_merge_steps(repo, cwd, verbose = False):
+    """
+    Generator of `git_step` arguments that start the merge, on `fix_branch`, for repositories routed to `failed.json` by `fix_logs.py --preflight`, which never attempted one
+
+    Does nothing if `repo` has no `preflight_result` or its merge was already started, eg. by `resolve_steps`
+    """
+    preflight = repo.get('preflight_result')
+    if not isinstance(preflight, dict) or not preflight.get('source_hash') or repo.get('merge_started'):
+        return
+
+    yield git_step(arg_list = ['checkout', '-B', repo['fix_branch'], preflight['source_hash']],
+                   error_message = "cannot checkout `fix_branch`",
+                   verbose = verbose,
+                   cwd = cwd)
+
+    # Conflicts are expected, and reported on Standard Out
+    yield git_step(arg_list = ['merge', preflight['latest_hash']],
+                   error_message = "cannot merge `latest_hash` {latest_hash}".format(**preflight),
+                   verbose = verbose,
+                   cwd = cwd)
+    repo['merge_started'] = True
+
+
+def remove_worktree_steps(repo, verbose = False):
+    """
+    Generator of `git_step` arguments that keep the committed merge within `repo['worktree']` on `fix_branch`, then remove that worktree, if `fix_logs.py --merge_mode worktree` left one
+
+    Does nothing otherwise, merges within `repo['dir']` are left where they are
+    """
+    if not repo.get('worktree'):
+        return
+
+    work_dir = repo_path(repo['worktree'])
+    # `HEAD` is detached when `fix_branch` itself conflicted with `origin_branch`
+    yield git_step(arg_list = ['checkout', '-B', repo['fix_branch']],
+                   error_message = "cannot keep resolved merge on `fix_branch`",
+                   verbose = verbose,
+                   cwd = work_dir)
+
+    yield git_step(arg_list = ['worktree', 'remove', '--force', work_dir],
+                   error_message = "cannot remove `worktree` {work_dir}".format(work_dir = work_dir),
+                   verbose = verbose,
+                   cwd = repo_path(repo['dir']))
+    del repo['worktree']
+
+
+def resolve_path_steps(path, stages, strategy, cwd, verbose = False):
+    """
+    Generator of `git_step` arguments that settle one conflicted `path` by `strategy`
+
+    - `ours` keeps `source_branch` version, or removes `path` if it was deleted there
+    - `theirs` keeps `origin_branch` version, or removes `path` if it was deleted there
+    - `union` keeps lines from both versions, only for paths both sides still have
+
+    **Returns** `True` if `path` was resolved and staged
+    """
+    if strategy in ('ours', 'theirs'):
+        stage = 2 if strategy == 'ours' else 3
+        if stage in stages:
+            yield git_step(arg_list = ['checkout', "--{strategy}".format(strategy = strategy), '--', path],
+                           error_message = "cannot checkout {strategy} version of {path}".format(strategy = strategy, path = path),
+                           verbose = verbose,
+                           cwd = cwd)
+            yield git_step(arg_list = ['add', '--', path],
+                           error_message = "cannot add {path}".format(path = path),
+                           verbose = verbose,
+                           cwd = cwd)
+        else:
+            yield git_step(arg_list = ['rm', '--quiet', '--', path],
+                           error_message = "cannot remove {path}".format(path = path),
+                           verbose = verbose,
+                           cwd = cwd)
+        return True
+
+    if 2 not in stages or 3 not in stages:
+        return False
+
+    with tempfile.TemporaryDirectory(prefix = 'fix_logs-union-') as union_dir:
+        versions = []
+        for stage, name in ((2, 'ours'), (1, 'base'), (3, 'theirs')):
+            version_path = os.path.join(union_dir, name)
+            content = b''
+            if stage in stages:
+                content = (yield git_step(arg_list = ['cat-file', 'blob', stages[stage]],
+                                          error_message = "cannot read {name} version of {path}".format(name = name, path = path),
+                                          verbose = verbose,
+                                          cwd = cwd))['out']
+
+            with open(version_path, 'wb') as version_fd:
+                version_fd.write(content)
+
+            versions.append(version_path)
+
+        merged = (yield git_step(arg_list = ['merge-file', '--stdout', '--union'] + versions,
+                                 error_message = "cannot union merge {path}".format(path = path),
+                                 verbose = verbose,
+                                 cwd = cwd))['out']
+
+    with open(os.path.join(cwd, path), 'wb') as merged_fd:
+        merged_fd.write(merged)
+
+    yield git_step(arg_list = ['add', '--', path],
+                   error_message = "cannot add {path}".format(path = path),
+                   verbose = verbose,
+                   cwd = cwd)
+    return True
+
+
+def resolve_steps(repo, rules, verbose = False):
+    """
+    Generator of `git_step` arguments that apply `rules` to every conflicted path of `repo`, without any interaction
+
+    When all paths are settled the merge is committed with `repo['fix_commit']` message, and any `repo['worktree']` removed, see `remove_worktree_steps`; nothing is pushed
+
+    **Returns** dictionary similar to `run(cmd)` function output, with added `resolved` dictionary of path to strategy, and `unresolved` list of paths left for `git mergetool`
+    """
+    cwd = repo_path(repo.get('worktree') or repo['dir'])
+    yield from start_merge_steps(repo, cwd, verbose)
+    repo['merge_started'] = True
+
+    entries = unmerged_entries((yield git_step(arg_list = ['ls-files', '--unmerged', '-z'],
+                                               error_message = "cannot list conflicted paths",
+                                               verbose = verbose,
+                                               cwd = cwd))['out'])
+
+    resolved = {}
+    unresolved = []
+    for path, stages in sorted(entries.items()):
+        strategy = rule_for(path, rules)
+        if strategy and (yield from resolve_path_steps(path, stages, strategy, cwd, verbose)):
+            resolved[path] = strategy
+        else:
+            unresolved.append(path)
+
+    status = {'code': 1, 'out': b'', 'err': b'', 'resolved': resolved, 'unresolved': unresolved}
+    if unresolved:
+        return status
+
+    status.update((yield git_step(arg_list = ['commit', '--no-verify', '-m', repo['fix_commit']],
+                                  error_message = "cannot commit resolved merge",
+                                  verbose = verbose,
+                                  cwd = cwd)))
+    status['merge_hash'] = (yield git_step(arg_list = ['rev-parse', 'HEAD'],
+                                           error_message = "cannot resolve merged `HEAD`",
+                                           verbose = verbose,
+                                           cwd = cwd))['out'].decode('utf-8').strip()
+    yield from remove_worktree_steps(repo, verbose)
+    return status
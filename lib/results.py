@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+
+import hashlib
+import json
+import os
+import threading
+
+from lib import abs_path
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+class ResultsWriter(object):
+    """
+    Appends one JSON line per result, flushing each line and calling `os.fsync` every `fsync_every` lines and on `close()`
+
+    The file at `path` is truncated and opened on first `write`, so runs without results leave no file behind
+
+    **Parameters**
+
+    - `path` String, path to JSONL log, eg. `config['fixed']`; if falsy then `write` does nothing
+
+    Results may be dictionaries, or objects with an `as_dict()` method such as `lib.RepoResult`
+    - `fsync_every` Number, of lines between calls to `os.fsync`
+    """
+
+    def __init__(self, path, fsync_every = 32):
+        self.path = abs_path(path) if path else None
+        self.fsync_every = fsync_every
+        self.lock = threading.Lock()
+        self.results_fd = None
+        self.count = 0
+
+    def write(self, result):
+        if not self.path:
+            return
+
+        with self.lock:
+            if self.results_fd is None:
+                self.results_fd = open(self.path, 'w')
+
+            if hasattr(result, 'as_dict'):
+                result = result.as_dict()
+
+            self.results_fd.write(json.dumps(result) + '\n')
+            self.results_fd.flush()
+            self.count += 1
+            if self.count % self.fsync_every == 0:
+                os.fsync(self.results_fd.fileno())
+
+    def close(self):
+        with self.lock:
+            if self.results_fd is not None:
+                os.fsync(self.results_fd.fileno())
+                self.results_fd.close()
+                self.results_fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_results(path, key):
+    """
+    Lazily yields result dictionaries from JSONL log at `path`
+
+    Logs written before streaming, similar to `{"failed": [...]}`, are also understood; `key` names the list within such logs
+
+    **Example**
+
+        for repo in read_results('./failed.json', 'failed'):
+            print(repo['dir'])
+    """
+    with open(abs_path(path), 'r') as results_fd:
+        for line_number, line in enumerate(results_fd):
+            if not line.strip():
+                continue
+
+            try:
+                result = json.loads(line)
+            except ValueError:
+                if line_number > 0:
+                    raise
+
+                # Pretty printed log from an older version
+                results_fd.seek(0)
+                yield from json.load(results_fd)[key]
+                return
+
+            if isinstance(result.get(key), list):
+                yield from result[key]
+            else:
+                yield result
+
+
+def log_path(logs_dir, repo, stream):
+    """
+    **Returns** path of spilled `stream`, eg. `err`, log for `repo` within `logs_dir`
+    """
+    digest = hashlib.sha1(repo['dir'].encode('utf-8')).hexdigest()[0:8]
+    return os.path.join(abs_path(logs_dir), "{name}-{digest}.{stream}.log".format(
+        name = repo['name'], digest = digest, stream = stream))
+
+
+def cap_output(repo, limit = None, logs_dir = None):
+    """
+    Truncates `repo['out']` and `repo['err']` strings to their last `limit` characters
+
+    When `logs_dir` is defined, full output is first written to a per-repository log file, and its path saved to `repo['out_log']` or `repo['err_log']`, unless `lib.capture.CapturePolicy` already spilled it
+
+    **Returns** `repo` dictionary
+    """
+    for stream in ('out', 'err'):
+        output = repo.get(stream)
+        if not output or not limit or len(output) <= limit:
+            continue
+
+        if logs_dir and not repo.get("{stream}_log".format(stream = stream)):
+            os.makedirs(abs_path(logs_dir), exist_ok = True)
+            spill_path = log_path(logs_dir, repo, stream)
+            with open(spill_path, 'w') as spill_fd:
+                spill_fd.write(output)
+
+            repo["{stream}_log".format(stream = stream)] = spill_path
+
+        repo[stream] = output[-limit:]
+
+    return repo
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+
+import random
+import re
+import threading
+
+from lib import command_phase
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+# Checked in order, first match wins; `auth` comes before `network` because SSH reports both
+error_classes = (
+    ('auth', (
+        r"Authentication failed",
+        r"Permission denied \(publickey",
+        r"could not read (Username|Password)",
+        r"terminal prompts disabled",
+        r"Host key verification failed",
+        r"The requested URL returned error: 40[13]",
+    )),
+    ('lock', (
+        r"Unable to create '[^']*\.lock'",
+        r"index\.lock",
+        r"cannot lock ref",
+        r"could not lock config file",
+        r"Another git process seems to be running",
+    )),
+    ('conflict', (
+        r"CONFLICT \(",
+        r"Automatic merge failed",
+        r"needs merge",
+        r"resolve your current index first",
+        # Checkout merges fail at `git commit`, which lists unmerged paths on Standard Out
+        r"unmerged files",
+        r"(?m)^U\t",
+    )),
+    ('network', (
+        r"Could not resolve host",
+        r"Temporary failure in name resolution",
+        r"Connection (timed out|refused|reset|closed)",
+        r"Operation timed out",
+        r"the remote end hung up unexpectedly",
+        r"early EOF",
+        r"RPC failed",
+        r"unable to access '",
+        r"The requested URL returned error: 5\d\d",
+        r"SSL_(read|connect|write)",
+        r"GnuTLS recv error",
+        r"Could not read from remote repository",
+    )),
+)
+
+
+transient_classes = (
+    'network',
+    'lock',
+)
+
+
+def classify_status(status):
+    """
+    **Returns** error class of a failed `run(cmd)` status, one of `timeout`, `auth`, `lock`, `conflict`, `network`, or `other`
+
+    **Example**
+
+        classify_status({'code': 128, 'out': b'', 'err': b'fatal: unable to access ...: Could not resolve host: github.com'})
+        #> 'network'
+    """
+    if status.get('timed_out') is not None:
+        return 'timeout'
+
+    err = status.get('err') or b''
+    if isinstance(err, bytes):
+        err = err.decode('utf-8', 'replace')
+
+    out = status.get('out') or b''
+    if isinstance(out, bytes):
+        out = out.decode('utf-8', 'replace')
+
+    # `git merge` reports conflicts on Standard Out
+    text = "{err}\n{out}".format(err = err, out = out)
+    for error_class, patterns in error_classes:
+        for pattern in patterns:
+            if re.search(pattern, text):
+                return error_class
+
+    return 'other'
+
+
+class RetryPolicy(object):
+    """
+    Decides whether, and after how long, a failed Git command is run again; set as `lib.retry_policy` to be used by `run_git_steps` and `async_run_git_steps`
+
+    Only failures classified within `classes` are retried, each at most `retries` times, after a random delay between zero and `backoff * 2 ** attempt` seconds (capped at `max_backoff`); all retries of a run share one `budget`
+
+    **Parameters**
+
+    - `retries` Number, of extra attempts per command
+    - `backoff` Number, of seconds the first delay is at most
+    - `max_backoff` Number, of seconds any delay is at most
+    - `budget` Number, of retries allowed across the whole run, or `None` for no limit
+    - `classes` Tuple, of error classes from `classify_status` to retry
+
+    **Example**
+
+        lib.retry_policy = RetryPolicy(retries = 3, backoff = 2.0, budget = 50)
+    """
+
+    def __init__(self, retries = 2, backoff = 1.0, max_backoff = 30.0, budget = 100, classes = transient_classes):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget = budget
+        self.classes = tuple(classes)
+        self.lock = threading.Lock()
+        self.random = random.Random()
+        self.used = 0
+
+    def delay(self, cmd, status, attempt, retries = None):
+        """
+        Spends one retry of the budget if `cmd`, which failed with `status` on its `attempt` (counting from `0`), may run again
+
+        **Parameters**
+
+        - `retries` optional dictionary, of command phase to number of retries, updated for the current repository
+
+        **Returns** seconds to wait before running `cmd` again, or `None` if it should not be retried
+        """
+        if attempt >= self.retries or classify_status(status) not in self.classes:
+            return None
+
+        with self.lock:
+            if self.budget is not None and self.used >= self.budget:
+                return None
+
+            self.used += 1
+            seconds = self.random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+        if retries is not None:
+            phase = command_phase(cmd)
+            retries[phase] = retries.get(phase, 0) + 1
+
+        return seconds
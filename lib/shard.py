@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+
+import glob
+import hashlib
+import json
+import os
+import re
+
+from lib import abs_path
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def parse_shard(shard):
+    """
+    **Returns** tuple of `(index, count)` from `shard` string similar to `0/4`, or `None` if `shard` is falsy
+
+    **Throws/Raises** `ValueError` unless `0 <= index < count`
+    """
+    if not shard:
+        return None
+
+    match = re.match(r'^\s*(\d+)\s*/\s*(\d+)\s*$', shard)
+    if not match or not 0 <= int(match.group(1)) < int(match.group(2)):
+        raise ValueError("shard {shard} is not similar to i/N, with i from 0 to N - 1".format(shard = shard))
+
+    return int(match.group(1)), int(match.group(2))
+
+
+def shard_of(repo, count):
+    """
+    **Returns** shard index, from `0` to `count - 1`, of `repo` dictionary
+
+    Hashes `dir` and `source` as written within configurations, so every host agrees regardless of its home directory or Python hash seed
+    """
+    key = "{dir}\0{source}".format(dir = repo['dir'], source = repo.get('source', ''))
+    return int(hashlib.sha1(key.encode('utf-8')).hexdigest()[0:16], 16) % count
+
+
+class ShardedRepos(object):
+    """
+    Re-iterable view of `repos` that only yields those within `shard`
+
+    **Parameters**
+
+    - `repos` Iterable, of dictionaries similar to `config['repos']`, eg. a list or `lib.manifest.Manifest`
+    - `shard` Tuple, of `(index, count)` from `parse_shard`
+    """
+
+    def __init__(self, repos, shard):
+        self.repos = repos
+        self.index, self.count = shard
+
+    def __iter__(self):
+        for repo in self.repos:
+            if shard_of(repo, self.count) == self.index:
+                yield repo
+
+
+def shard_path(path, shard):
+    """
+    **Returns** `path` with shard inserted before its extension, eg. `fixed.shard-0-of-4.json`, or `path` unchanged without `shard`
+    """
+    if not path or not shard:
+        return path
+
+    root, extension = os.path.splitext(path)
+    return "{root}.shard-{index}-of-{count}{extension}".format(
+        root = root, index = shard[0], count = shard[1], extension = extension)
+
+
+def shard_paths(path):
+    """
+    **Returns** sorted list of existing per-shard files written for `path`, eg. by `fix_logs.py --shard i/N`
+    """
+    root, extension = os.path.splitext(abs_path(path))
+    pattern = "{root}.shard-*-of-*{extension}".format(root = glob.escape(root), extension = extension)
+
+    def index(shard_file):
+        match = re.search(r'\.shard-(\d+)-of-(\d+)' + re.escape(extension) + '$', shard_file)
+        return (int(match.group(2)), int(match.group(1))) if match else (0, 0)
+
+    return sorted(glob.glob(pattern), key = index)
+
+
+def merge_results(path, key):
+    """
+    Combines per-shard logs of `path` into `path`, one JSON line per result, keeping shard order
+
+    **Parameters**
+
+    - `path` String, unsharded log path, eg. `config['fixed']`
+    - `key` String, list name within logs written before streaming, eg. `fixed`
+
+    **Returns** dictionary of shard file path to number of results read from it
+    """
+    from lib.results import read_results, ResultsWriter
+
+    counts = {}
+    with ResultsWriter(path) as writer:
+        for shard_file in shard_paths(path):
+            counts[shard_file] = 0
+            for result in read_results(shard_file, key):
+                writer.write(result)
+                counts[shard_file] += 1
+
+    return counts
+
+
+def merge_state(path):
+    """
+    Rewrites `path` with the latest `lib.state.RunState` record of each `dir` found within it and its per-shard journals, so merging again never duplicates lines
+
+    **Returns** number of journal lines written, `0` if there are no per-shard journals
+    """
+    from lib.state import load_state
+
+    path = abs_path(path)
+    shard_files = shard_paths(path)
+    if not shard_files:
+        return 0
+
+    records = load_state(path)
+    for shard_file in shard_files:
+        for record_dir, record in load_state(shard_file).items():
+            if record_dir not in records or (record.get('time') or 0) >= (records[record_dir].get('time') or 0):
+                records[record_dir] = record
+
+    temporary_path = "{path}.{pid}.tmp".format(path = path, pid = os.getpid())
+    with open(temporary_path, 'w') as state_fd:
+        for record in sorted(records.values(), key = lambda record: record.get('time') or 0):
+            state_fd.write(json.dumps(record) + '\n')
+
+    os.replace(temporary_path, path)
+    return len(records)
+
+
+def merge_results_main(args):
+    """
+    Combines outputs of `fix --shard i/N` and `merge-failed --shard i/N` runs into one set of logs and state journal
+
+    **Parameters**
+
+    - `args` Dictionary, parsed command-line arguments, eg. `config` path, and optional combined `fixed`, `failed`, `conflicts`, `merged`, and `state` paths
+
+    **Returns** dictionary similar to...
+
+        {
+            "logs": {"fixed": {"path": "./fixed.json", "counts": {"./fixed.shard-0-of-2.json": 40, "./fixed.shard-1-of-2.json": 38}}},
+            "state": {"path": "./state.jsonl", "lines": 90}
+        }
+
+    ... where logs without shard files, and `state` when no journal lines were written, are left out
+    """
+    from lib.state import state_path
+
+    with open(args.get('config') or './config.json', 'r') as configs_fd:
+        configs = json.load(configs_fd)
+
+    logs = (
+        ('fixed', args.get('fixed') or configs.get('fixed', './fixed.json')),
+        ('failed', args.get('failed') or configs.get('failed', './failed.json')),
+        ('conflicts', args.get('conflicts') or './conflicts.json'),
+        ('merged', args.get('merged') or './merged.json'),
+    )
+
+    report = {'logs': {}}
+    for key, path in logs:
+        counts = merge_results(path, key)
+        if counts:
+            report['logs'][key] = {'path': path, 'counts': counts}
+
+    state = state_path(args.get('state') or configs.get('state'), configs.get('fixed'))
+    lines = merge_state(state)
+    if lines:
+        report['state'] = {'path': state, 'lines': lines}
+
+    return report
+
+
+def print_merge_report(report):
+    """
+    Prints `merge_results_main` report, one line per shard file and one total per log
+    """
+    for key, log in report['logs'].items():
+        for shard_file, count in log['counts'].items():
+            print("{key:<9} {count:6d} from {shard_file}".format(key = key, count = count, shard_file = shard_file))
+
+        print("{key:<9} {count:6d} total -> {path}".format(key = key, count = sum(log['counts'].values()), path = log['path']))
+
+    if report.get('state'):
+        print("state     {lines:6d} lines -> {path}".format(**report['state']))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+
+import json
+import os
+import threading
+import time
+
+from lib import abs_path
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+state_keys = (
+    'source',
+    'origin_remote',
+    'origin_branch',
+    'source_remote',
+    'source_branch',
+)
+
+
+def state_path(state = None, fixed = None):
+    """
+    **Returns** absolute path of run state journal, `state` if defined otherwise `state.jsonl` next to `fixed` log
+    """
+    if state:
+        return abs_path(state)
+
+    fixed_abspath = abs_path(fixed or './fixed.json')
+    return os.path.join(os.path.dirname(fixed_abspath), 'state.jsonl')
+
+
+def load_state(path):
+    """
+    **Returns** dictionary of `dir` to last journal record within file at `path`, empty if there is no such file
+    """
+    last = {}
+    if not os.path.isfile(path):
+        return last
+
+    with open(path, 'r') as state_fd:
+        for line in state_fd:
+            if not line.strip():
+                continue
+
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Partial line from a crashed run
+                continue
+
+            last[record['dir']] = record
+
+    return last
+
+
+class RunState(object):
+    """
+    Append-only JSONL journal of per-repository outcomes
+
+    Each line is similar to...
+
+        {
+            "dir": "/home/user-name/git/hub/account-name/repo-name",
+            "source": "_remote-git-url_",
+            "origin_remote": "origin",
+            "origin_branch": "master",
+            "source_remote": "source",
+            "source_branch": "master",
+            "origin_hash": "_full-hash_",
+            "source_hash": "_full-hash_",
+            "fixed": true,
+            "pushed": true,
+            "time": 1602806400.0
+        }
+
+    Later lines for the same `dir` replace earlier ones when loading, so an interrupted run may be resumed by running again
+
+    `pushed` is only `true` for fixes that reached `origin_remote`, so `no_push` dry runs never cause later runs to skip a repository
+
+    **Parameters**
+
+    - `path` String, path to journal file, created if missing
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.last = load_state(path)
+        self.state_fd = open(path, 'a')
+
+    def last_fixed(self, repo):
+        """
+        **Returns** last journal record for `repo` if it was fixed, and pushed, with the same `state_keys` configurations, otherwise `None`
+        """
+        record = self.last.get(abs_path(repo['dir']))
+        if not record or not record.get('fixed') or not record.get('pushed'):
+            return None
+
+        for key in state_keys:
+            if record.get(key) != repo.get(key):
+                return None
+
+        return record
+
+    def record(self, repo_configs, fixed):
+        """
+        Appends, and flushes, outcome of `repo_configs` to journal
+        """
+        record = {key: repo_configs.get(key) for key in state_keys}
+        record.update({
+            'dir': abs_path(repo_configs['dir']),
+            'origin_hash': repo_configs.get('origin_hash'),
+            'source_hash': repo_configs.get('source_hash'),
+            'fixed': fixed,
+            'pushed': bool(fixed) and not repo_configs.get('no_push'),
+            'time': time.time(),
+        })
+
+        with self.lock:
+            self.last[record['dir']] = record
+            self.state_fd.write(json.dumps(record) + '\n')
+            self.state_fd.flush()
+
+    def close(self):
+        self.state_fd.close()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+
+import json
+import os
+import socket
+import time
+import urllib.request
+
+from lib import abs_path
+from lib.results import read_results
+from lib.shard import parse_shard, shard_path
+from lib.state import load_state, state_path
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def count_results(path, key):
+    """
+    **Returns** number of results within log at `path`, or `None` if there is no such file
+    """
+    if not path or not os.path.isfile(abs_path(path)):
+        return None
+
+    return sum(1 for _result in read_results(path, key))
+
+
+def fetch_progress(listen, timeout = 2.0):
+    """
+    **Returns** snapshot dictionary served by `lib.progress.serve_progress` at `listen`, or `None` if nothing answers there
+    """
+    try:
+        if '/' in listen:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as progress_socket:
+                progress_socket.settimeout(timeout)
+                progress_socket.connect(listen)
+                return json.loads(progress_socket.makefile('rb').readline())
+
+        host, _colon, port = listen.rpartition(':')
+        url = "http://{host}:{port}/".format(host = host or '127.0.0.1', port = port)
+        with urllib.request.urlopen(url, timeout = timeout) as response:
+            return json.loads(response.read())
+    except (OSError, ValueError):
+        return None
+
+
+def status_main(args):
+    """
+    Summarizes a finished, or running, `fix_logs.py` job from its state journal and logs, without touching any repository
+
+    **Parameters**
+
+    - `args` Dictionary, parsed command-line arguments, eg. `config` path, optional `shard`, and `progress_listen` address of a running job
+
+    **Returns** dictionary similar to...
+
+        {
+            "state": {"path": "/path/to/state.jsonl", "repos": 300, "fixed": 290, "failed": 10, "last": 1602806400.0},
+            "logs": {"fixed": 290, "failed": 10, "conflicts": null, "merged": null, "queue": null},
+            "progress": null
+        }
+    """
+    with open(args.get('config', './config.json'), 'r') as configs_fd:
+        configs = json.load(configs_fd)
+
+    shard = parse_shard(args.get('shard'))
+    journal_path = shard_path(state_path(args.get('state') or configs.get('state'), configs.get('fixed')), shard)
+    records = load_state(journal_path).values()
+    fixed = sum(1 for record in records if record.get('fixed'))
+
+    logs = {}
+    for key, path in (('fixed', configs.get('fixed')),
+                      ('failed', configs.get('failed')),
+                      ('conflicts', args.get('conflicts') or './conflicts.json'),
+                      ('merged', args.get('merged') or './merged.json'),
+                      ('queue', args.get('queue') or './queue.json')):
+        logs[key] = count_results(shard_path(path, shard), key)
+
+    progress_listen = args.get('progress_listen') or configs.get('progress_listen')
+    return {
+        'state': {
+            'path': journal_path,
+            'repos': len(records),
+            'fixed': fixed,
+            'failed': len(records) - fixed,
+            'last': max([record.get('time') or 0 for record in records] or [None]),
+        },
+        'logs': logs,
+        'progress': fetch_progress(progress_listen) if progress_listen else None,
+    }
+
+
+def print_status(report):
+    """
+    Prints `status_main` report as a few lines of text
+    """
+    from lib.progress import status_line
+
+    state = report['state']
+    print("Journal {path} has {repos} repositories, {fixed} fixed, {failed} failed".format(**state))
+    if state['last']:
+        print("Last outcome recorded {when}".format(when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(state['last']))))
+
+    for key, count in report['logs'].items():
+        if count is not None:
+            print("{key:<10} {count} results".format(key = key, count = count))
+
+    if report['progress']:
+        print("Running: {line}".format(line = status_line(report['progress'])))
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+
+import json
+import os
+import time
+
+from lib import (
+    abs_path,
+    bounded_map,
+    consolidate_repo_configs,
+    current_repo,
+    current_timeouts,
+    ErrorMessage,
+    fix_repo,
+    git_step,
+    GitException,
+    parent_directory_name,
+    repo_path,
+    run_git_steps,
+)
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def watch_path(watch_state = None, fixed = None):
+    """
+    **Returns** absolute path of watch state file, `watch_state` if defined otherwise `watch.json` next to `fixed` log
+    """
+    if watch_state:
+        return abs_path(watch_state)
+
+    fixed_abspath = abs_path(fixed or './fixed.json')
+    return os.path.join(os.path.dirname(fixed_abspath), 'watch.json')
+
+
+def load_watch_state(path):
+    """
+    **Returns** dictionary of repository `dir` to watch entry, similar to...
+
+        {
+            "/home/user-name/git/hub/account-name/repo-name": {
+                "origin_hash": "_full-hash_",
+                "source_hash": "_full-hash_",
+                "interval": 300.0,
+                "next_poll": 1602806400.0,
+                "changes": 2
+            }
+        }
+    """
+    if not os.path.isfile(path):
+        return {}
+
+    try:
+        with open(path, 'r') as watch_fd:
+            return json.load(watch_fd)
+    except ValueError:
+        # Partial file from a crash before `os.replace` existed, start over
+        return {}
+
+
+def save_watch_state(path, entries):
+    """
+    Writes `entries` to `path` via a temporary file and `os.replace`, so readers never see a partial file
+    """
+    temporary_path = "{path}.tmp".format(path = path)
+    with open(temporary_path, 'w') as watch_fd:
+        json.dump(entries, watch_fd)
+
+    os.replace(temporary_path, path)
+
+
+def next_interval(interval, changed, min_interval, max_interval):
+    """
+    **Returns** polling interval after a poll, halved when tips `changed` and grown by half otherwise, within `min_interval` and `max_interval`
+    """
+    if changed:
+        return max(min_interval, interval / 2.0)
+
+    return min(max_interval, interval * 1.5)
+
+
+def poll_steps(repo):
+    """
+    Generator of `git_step` arguments that read current `source_branch` and `origin_branch` tips via `git ls-remote`, without fetching anything
+
+    **Returns** tuple of `(origin_hash, source_hash)`, either may be an empty string if the branch does not exist
+    """
+    repo_dir = repo_path(repo['dir'])
+    source_hash = (yield git_step(arg_list = ['ls-remote', repo['source'], "refs/heads/{source_branch}".format(**repo)],
+                                  error_message = ErrorMessage("{name} cannot ls-remote `source` for `source_branch`", repo),
+                                  verbose = repo['verbose'],
+                                  cwd = repo_dir))['out'].decode("utf-8").split('\t')[0].strip()
+
+    origin_hash = (yield git_step(arg_list = ['ls-remote', repo['origin_remote'], "refs/heads/{origin_branch}".format(**repo)],
+                                  error_message = ErrorMessage("{name} cannot ls-remote `origin_remote` for `origin_branch`", repo),
+                                  verbose = repo['verbose'],
+                                  cwd = repo_dir))['out'].decode("utf-8").split('\t')[0].strip()
+
+    return origin_hash, source_hash
+
+
+def poll_repo(defaults, repo, entry, state = None):
+    """
+    Polls tips of a single `repo` and compares them against `entry`, or against last fix within `state` when `entry` has not seen any tips yet
+
+    **Returns** tuple of `(repo, tips, moved)`, where `tips` is `None` if polling failed
+    """
+    repo_configs = consolidate_repo_configs(defaults, repo)
+    current_repo.set(repo_configs['name'])
+    current_timeouts.set(repo_configs['timeouts'])
+    try:
+        origin_hash, source_hash = run_git_steps(poll_steps(repo_configs))
+    except GitException as e:
+        print("{error_message}".format(error_message = e.message))
+        return repo, None, False
+
+    seen = entry if entry.get('source_hash') else (state.last_fixed(repo_configs) if state is not None else None) or {}
+    moved = seen.get('origin_hash') != origin_hash or seen.get('source_hash') != source_hash
+    return repo, {'origin_hash': origin_hash, 'source_hash': source_hash}, moved
+
+
+def watch_repos(defaults, jobs, state, on_result, options):
+    """
+    Polls `defaults['repos']` forever, or for `options['cycles']`, and runs `fix_repo` only for those whose `source` or `origin` tip moved
+
+    Fixes are built upon the polled `origin` tip, see `polled_origin_hash` of `consolidate_repo_configs`, and only the polled tips, or the merge a fix pushed, are remembered
+
+    Each repository has its own polling interval, starting at `options['interval']` seconds; it halves whenever tips move and grows otherwise, within `options['min_interval']` and `options['max_interval']`. Last seen tips and intervals are kept in memory and saved to `options['path']` after every cycle, so restarts do not re-fix unchanged repositories
+
+    `defaults['repos']` is iterated once per cycle, so a `lib.manifest.Manifest` picks up added repositories without restarting
+
+    **Parameters**
+
+    - `defaults` Dictionary, passed to `consolidate_repo_configs`
+    - `jobs` Number, of repositories to poll, or fix, at the same time
+    - `state` `lib.state.RunState` journal
+    - `on_result` Function, called as `on_result(repo_configs, fixed)` for each fix
+    - `options` Dictionary, with `path`, `interval`, `min_interval`, `max_interval`, and optional `cycles`, `deadline`, and `on_polled` keys, where `on_polled` is called with names of repositories polled but not fixed, eg. `lib.progress.Progress.release`
+    """
+    entries = load_watch_state(options['path'])
+    cycle = 0
+    while True:
+        cycle += 1
+        now = time.time()
+        due = []
+        for repo in defaults['repos']:
+            entry = entries.setdefault(repo_path(repo['dir']), {'interval': options['interval'], 'next_poll': 0})
+            if entry['next_poll'] <= now:
+                due.append(repo)
+
+        moved_repos = []
+        unmoved_names = []
+        for repo, tips, moved in bounded_map(lambda repo: poll_repo(defaults, repo, entries[repo_path(repo['dir'])], state),
+                                             due, jobs):
+            entry = entries[repo_path(repo['dir'])]
+            if tips is not None:
+                entry['interval'] = next_interval(entry['interval'], moved and bool(entry.get('source_hash')),
+                                                  options['min_interval'], options['max_interval'])
+                entry.update(tips)
+                if moved:
+                    entry['changes'] = entry.get('changes', 0) + 1
+                    # Fixes must build upon the tip just polled, never an older local one
+                    moved_repos.append(dict(repo, polled_origin_hash = tips['origin_hash']))
+
+            if tips is None or not moved:
+                unmoved_names.append(repo.get('name', parent_directory_name(repo['dir'])))
+
+            entry['next_poll'] = time.time() + entry['interval']
+
+        if options.get('on_polled'):
+            options['on_polled'](unmoved_names)
+
+        for repo_configs, fixed in bounded_map(lambda repo: fix_repo(defaults, repo, state), moved_repos, jobs):
+            entry = entries[repo_path(repo_configs['dir'])]
+            if fixed and repo_configs.get('merge_hash') and not repo_configs['no_push']:
+                # Our own push moves `origin` to the merge, which should not count as a change; otherwise polled tips are kept
+                entry['origin_hash'] = repo_configs['merge_hash']
+
+            on_result(repo_configs, fixed)
+
+        save_watch_state(options['path'], entries)
+        if defaults['verbose'] or moved_repos:
+            print("Watch cycle {cycle} polled {polled}, fixed {fixed}".format(
+                cycle = cycle, polled = len(due), fixed = len(moved_repos)))
+
+        if options.get('cycles') and cycle >= options['cycles']:
+            break
+
+        if options.get('deadline') and time.time() >= options['deadline']:
+            break
+
+        next_poll = min([entry['next_poll'] for entry in entries.values()] or [time.time() + options['interval']])
+        time.sleep(max(0.0, min(next_poll - time.time(), options['max_interval'])))
@@ -1,17 +1,9 @@
 #!/usr/bin/env python3
 
 
-import argparse
-import json
 import sys
 
-from lib import (
-    fix_merge,
-    git,
-    GitException,
-    os_cd,
-    parent_directory_name,
-)
+from lib.cli import cli_main
 
 
 __about__ = '''
@@ -46,86 +38,7 @@ if __name__ != '__main__':
     raise NotImplementedError("Try running as a script, eg. python file-name.py --help")
 
 
-def main(args):
-    """
-    **Parameters**
-
-    - `config_path` String, path to `failed.json` log file
-
-    **Example**
-
-        main("./failed.json")
-    """
-    with open(args.get('failed', './failed.json'), 'r') as failed_fd:
-        failed_json = json.load(failed_fd)
-
-    defaults = {
-        'no_push': args.get('no_push', failed_json.get('no_push')),
-        'verbose': args.get('verbose', failed_json.get('verbose'))
-    }
-
-    conflicts_list = []
-    merged_list = []
-    for repo in failed_json['failed']:
-        os_cd(repo['dir'])
-
-        try:
-            status = git(['mergetool'], "cannot resolve conflicts", True)
-        except GitException as e:
-            repo.update(status)
-            repo.update({
-                'message': e.message,
-                'code': e.status['code'],
-                'err': e.status['err'],
-                'out': e.status['out']
-            })
-            conflicts_list.append(repo)
-            if args_dict['verbose']:
-                print("{error_message}".format(error_message = e.message))
-        else:
-            repo.update(status)
-            merged_list.append(repo)
-            if args_dict['verbose']:
-                print("Fixed: {}".format(parent_directory_name(repo['dir'])))
-
-    if conflicts_list:
-        with open('conflicts.json', 'w') as conflicts_fd:
-            json.dump({'conflicts': conflicts_list}, conflicts_fd)
-            print("Wrote conflicts to -> conflicts.json")
-
-    if merged_list:
-        with open('merged.json', 'w') as merged_fd:
-            json.dump({'merged': merged_list}, merged_fd)
-            print("Wrote merged to -> merged.json")
-
-
-parser = argparse.ArgumentParser(description = __description__)
-
-parser.add_argument('--about',
-                    action = 'store_true',
-                    help = 'Prints info about this script and exits')
-
-parser.add_argument('--failed',
-                    default = './failed.json',
-                    help = 'Path to failed.json file')
-
-parser.add_argument('--license',
-                    action = 'store_true',
-                    help = 'Prints script license and exits')
-
-parser.add_argument('--verbose',
-                    action = 'store_true',
-                    help = 'Prints command standard out if set')
-
-args_dict = vars(parser.parse_args())
-
-if args_dict['about']:
-    print(__about__)
-    sys.exit()
-
-if args_dict['license']:
-    print(__license__)
-    sys.exit()
-
-
-main(args_dict)
+cli_main(['merge-failed'] + sys.argv[1:],
+         about = __about__,
+         license = __license__,
+         description = __description__)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+
+import sys
+
+from lib.cli import cli_main
+
+
+__about__ = '''
+Shares one object store per upstream between forks managed by `fix_logs.py`
+'''
+
+
+__description__ = '''
+Builds, or updates, a bare object pool per distinct `source` within `config.json`, and links each repository to it via `objects/info/alternates`
+'''
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+if __name__ != '__main__':
+    raise NotImplementedError("Try running as a script, eg. python file-name.py --help")
+
+
+cli_main(['pools'] + sys.argv[1:],
+         about = __about__,
+         license = __license__,
+         description = __description__)
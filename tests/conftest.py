@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+
+import json
+import os
+
+import pytest
+
+from lib import fix_logs_main, git
+from lib.bench import bench_args, bench_env, make_fleet, mergetool_env
+from lib.results import read_results
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+@pytest.fixture
+def git_env(tmp_path, monkeypatch):
+    """
+    Sets Git identity and a non-interactive `git mergetool` for the test, which runs from `tmp_path`
+    """
+    for key, value in dict(bench_env, **mergetool_env).items():
+        monkeypatch.setenv(key, value)
+
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def fleet(tmp_path, git_env):
+    """
+    **Returns** function that generates a small `lib.bench.make_fleet` under `tmp_path`, and returns its `config.json` path
+    """
+    def make(repos = 2, depth = 5, files = 3, conflict_rate = 0.0):
+        return make_fleet(str(tmp_path), repos = repos, depth = depth, files = files, conflict_rate = conflict_rate)
+
+    return make
+
+
+def run_fix(config_path, **options):
+    """
+    Runs `fix_logs_main` against `config_path`, with `options` as parsed command-line arguments
+    """
+    fix_logs_main(bench_args(config_path, os.path.dirname(config_path), options))
+
+
+def read_log(config_path, key):
+    """
+    **Returns** list of results within `fixed` or `failed` log, named by `key`, next to `config_path`
+    """
+    path = os.path.join(os.path.dirname(config_path), "{key}.json".format(key = key))
+    if not os.path.isfile(path):
+        return []
+
+    return list(read_results(path, key))
+
+
+def add_repo(config_path, repo):
+    """
+    Appends `repo` to `repos` within `config_path`
+    """
+    with open(config_path, 'r') as config_fd:
+        configs = json.load(config_fd)
+
+    configs['repos'].append(repo)
+    with open(config_path, 'w') as config_fd:
+        json.dump(configs, config_fd, indent = 2)
+
+
+def remote_tip(config_path, index, branch = 'master'):
+    """
+    **Returns** hash of `branch` within `origin-{index}.git` of the fleet next to `config_path`
+    """
+    origin_path = os.path.join(os.path.dirname(config_path), 'remotes', "origin-{index}.git".format(index = index))
+    return git(arg_list = ['rev-parse', branch],
+               error_message = "cannot resolve {branch}".format(branch = branch),
+               cwd = origin_path)['out'].decode('utf-8').strip()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from lib import async_bounded_map, bounded_map
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def test_bounded_map_yields_in_order_of_iterable():
+    delays = [0.05, 0.0, 0.03, 0.0, 0.01, 0.0]
+
+    def slow_square(index):
+        time.sleep(delays[index])
+        return index * index
+
+    assert list(bounded_map(slow_square, range(len(delays)), jobs = 3)) == [index * index for index in range(len(delays))]
+
+
+def test_bounded_map_keeps_workers_busy_past_a_slow_item():
+    release = threading.Event()
+    started = []
+
+    def function(index):
+        started.append(index)
+        if index == 0:
+            # Only released once every other item ran, so a stalled pool would time out here
+            assert release.wait(timeout = 5)
+        elif len(started) == 8:
+            release.set()
+
+        return index
+
+    assert list(bounded_map(function, range(8), jobs = 2)) == list(range(8))
+    assert sorted(started) == list(range(8))
+
+
+def test_bounded_map_reads_iterable_lazily():
+    read = []
+
+    def items():
+        for index in range(100):
+            read.append(index)
+            yield index
+
+    gate = threading.Event()
+
+    def function(index):
+        gate.wait(timeout = 5)
+        return index
+
+    results = bounded_map(function, items(), jobs = 2)
+    first = []
+    consumer = threading.Thread(target = lambda: first.append(next(results)))
+    consumer.start()
+    time.sleep(0.1)
+    assert len(read) == 2 * 2
+    gate.set()
+    consumer.join()
+    assert first == [0]
+    results.close()
+
+
+def test_bounded_map_raises_errors_of_function():
+    def function(index):
+        if index == 2:
+            raise ValueError(index)
+
+        return index
+
+    results = bounded_map(function, range(5), jobs = 2)
+    assert [next(results), next(results)] == [0, 1]
+    with pytest.raises(ValueError):
+        next(results)
+
+
+def test_async_bounded_map_yields_in_order_of_iterable():
+    delays = [0.05, 0.0, 0.03, 0.0, 0.01, 0.0]
+
+    async def slow_square(index):
+        await asyncio.sleep(delays[index])
+        return index * index
+
+    async def collect():
+        return [result async for result in async_bounded_map(slow_square, range(len(delays)), jobs = 3)]
+
+    assert asyncio.run(collect()) == [index * index for index in range(len(delays))]
+
+
+def test_async_bounded_map_raises_errors_of_function():
+    async def function(index):
+        if index == 1:
+            raise ValueError(index)
+
+        return index
+
+    async def collect():
+        return [result async for result in async_bounded_map(function, range(3), jobs = 2)]
+
+    with pytest.raises(ValueError):
+        asyncio.run(collect())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+
+import os
+
+import lib.capture
+from lib.capture import TailBuffer
+
+from conftest import read_log, run_fix
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def test_tail_buffer_keeps_tail_and_spills_everything(tmp_path):
+    spill_path = str(tmp_path / 'repo' / 'out.log')
+    buffer = TailBuffer(4, spill_path)
+    for chunk in (b'ab', b'cdef', b'gh'):
+        buffer.write(chunk)
+
+    assert buffer.close() == (b'efgh', spill_path)
+    with open(spill_path, 'rb') as spill_fd:
+        assert spill_fd.read() == b'abcdefgh'
+
+
+def test_tail_buffer_without_overflow_does_not_spill(tmp_path):
+    buffer = TailBuffer(4, str(tmp_path / 'out.log'))
+    buffer.write(b'abc')
+    assert buffer.close() == (b'abc', None)
+    assert not os.listdir(str(tmp_path))
+
+
+def test_capture_limit_follows_output_limit_and_logs_dir(fleet, monkeypatch):
+    policies = []
+
+    class RecordedPolicy(lib.capture.CapturePolicy):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            policies.append(self)
+
+    monkeypatch.setattr(lib.capture, 'CapturePolicy', RecordedPolicy)
+    config_path = fleet(repos = 2)
+    logs_dir = os.path.join(os.path.dirname(config_path), 'logs')
+
+    run_fix(config_path, capture_limit = 8, output_limit = 64, logs_dir = logs_dir)
+    assert len(read_log(config_path, 'fixed')) == 2
+    policy, = policies
+    assert policy.limit == 64
+    assert policy.spill_dir == os.path.abspath(logs_dir)
+    assert lib.capture_policy is None
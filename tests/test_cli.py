@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+
+import json
+
+import lib
+from lib.cli import build_parser, cli_main
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def test_every_command_parses_its_defaults():
+    parser = build_parser('')
+    for command in lib.cli.commands:
+        argv = [command, 'stats'] if command == 'cache' else [command]
+        assert vars(parser.parse_args(argv))['command'] == command
+
+
+def test_fix_jobs_fall_back_to_configuration(fleet, monkeypatch):
+    config_path = fleet(repos = 2)
+    with open(config_path, 'r') as config_fd:
+        configs = json.load(config_fd)
+
+    configs['jobs'] = 3
+    with open(config_path, 'w') as config_fd:
+        json.dump(configs, config_fd)
+
+    jobs_seen = []
+    bounded_map = lib.bounded_map
+
+    def spy(function, iterable, jobs):
+        jobs_seen.append(jobs)
+        return bounded_map(function, iterable, jobs)
+
+    monkeypatch.setattr(lib, 'bounded_map', spy)
+    cli_main(['--config', config_path], '', '', '', default_command = 'fix')
+    assert jobs_seen == [3]
+
+    jobs_seen.clear()
+    cli_main(['--config', config_path, '--jobs', '2', '--force'], '', '', '', default_command = 'fix')
+    assert jobs_seen == [2]
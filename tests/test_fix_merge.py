@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+
+import os
+
+import pytest
+
+from lib import fix_merge, GitException, run
+
+from conftest import read_log, remote_tip, run_fix
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def conflicted_fix(fleet):
+    """
+    **Returns** tuple of `(config_path, repo)`, where `repo` is the `failed.json` entry of a checkout left with conflicts
+    """
+    config_path = fleet(repos = 1, conflict_rate = 1.0)
+    run_fix(config_path, merge_mode = 'checkout')
+    failed = read_log(config_path, 'failed')
+    assert len(failed) == 1
+    return config_path, failed[0]
+
+
+def test_fix_merge_pushes_onto_fetched_tip(fleet):
+    config_path, repo = conflicted_fix(fleet)
+    fix_merge(repo)
+
+    head = run(['git', 'rev-parse', 'HEAD'], cwd = repo['dir'])['out'].decode('utf-8').strip()
+    assert remote_tip(config_path, 0) == head
+
+
+def test_fix_merge_keeps_commits_pushed_meanwhile(fleet):
+    config_path, repo = conflicted_fix(fleet)
+    origin_path = os.path.join(os.path.dirname(config_path), 'remotes', 'origin-0.git')
+    upstream = run(['git', 'commit-tree', 'master^{tree}', '-p', 'master', '-m', 'Upstream commit'],
+                   cwd = origin_path)['out'].decode('utf-8').strip()
+    run(['git', 'update-ref', 'refs/heads/master', upstream], cwd = origin_path)
+
+    with pytest.raises(GitException):
+        fix_merge(repo)
+
+    assert remote_tip(config_path, 0) == upstream
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+
+import os
+
+from conftest import read_log, remote_tip, run_fix
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def test_merge_cache_reuses_dry_run_merge(fleet):
+    config_path = fleet(repos = 2)
+    cache_dir = os.path.join(os.path.dirname(config_path), 'merge_cache')
+
+    run_fix(config_path, merge_cache = cache_dir, no_push = True)
+    dry_results = {result['name']: result for result in read_log(config_path, 'fixed')}
+    assert len(dry_results) == 2
+    assert not any(result.get('merge_cached') for result in dry_results.values())
+    assert os.listdir(cache_dir)
+
+    run_fix(config_path, merge_cache = cache_dir)
+    results = read_log(config_path, 'fixed')
+    assert len(results) == 2
+    for result in results:
+        assert result.get('merge_cached') is True
+        assert result['merge_hash'] == dry_results[result['name']]['merge_hash']
+
+    merge_hashes = {result['merge_hash'] for result in results}
+    assert {remote_tip(config_path, index) for index in range(2)} == merge_hashes
+
+
+def test_merge_cache_across_merge_modes(fleet):
+    config_path = fleet(repos = 1)
+    cache_dir = os.path.join(os.path.dirname(config_path), 'merge_cache')
+
+    run_fix(config_path, merge_cache = cache_dir, merge_mode = 'merge_tree', no_push = True)
+    run_fix(config_path, merge_cache = cache_dir, merge_mode = 'checkout')
+    result, = read_log(config_path, 'fixed')
+    assert result.get('merge_cached') is True
+    assert remote_tip(config_path, 0) == result['merge_hash']
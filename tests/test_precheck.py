@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+
+import json
+import os
+
+from lib import run
+
+from conftest import read_log, remote_tip, run_fix
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def git_phases(config_path):
+    """
+    **Returns** list of Git command phases the last run timed, see `--timings`
+    """
+    with open(os.path.join(os.path.dirname(config_path), 'timings.json'), 'r') as timings_fd:
+        return [record['phase'] for record in json.load(timings_fd)['records']]
+
+
+def test_precheck_skips_before_touching_remotes(fleet):
+    config_path = fleet(repos = 2)
+    run_fix(config_path)
+
+    run_fix(config_path, precheck = True, force = True)
+    assert all('already fixed' in result['out'] for result in read_log(config_path, 'fixed'))
+    assert set(git_phases(config_path)) == {'ls-remote', 'merge-base'}
+
+
+def test_precheck_compares_origin_moved_upstream_once_fetched(fleet):
+    config_path = fleet(repos = 1)
+    run_fix(config_path)
+
+    origin_path = os.path.join(os.path.dirname(config_path), 'remotes', 'origin-0.git')
+    upstream = run(['git', 'commit-tree', 'master^{tree}', '-p', 'master', '-m', 'Upstream commit'],
+                   cwd = origin_path)['out'].decode('utf-8').strip()
+    run(['git', 'update-ref', 'refs/heads/master', upstream], cwd = origin_path)
+
+    run_fix(config_path, precheck = True)
+    assert 'already fixed' in read_log(config_path, 'fixed')[0]['out']
+    assert 'fetch' in git_phases(config_path)
+    assert 'push' not in git_phases(config_path)
+    assert remote_tip(config_path, 0) == upstream
+
+
+def test_precheck_fixes_when_source_moved(fleet):
+    config_path = fleet(repos = 1)
+    run_fix(config_path)
+    fixed_tip = remote_tip(config_path, 0)
+
+    source_path = os.path.join(os.path.dirname(config_path), 'remotes', 'source-0.git')
+    commit = run(['git', 'commit-tree', 'master^{tree}', '-p', 'master', '-m', 'Source commit'],
+                 cwd = source_path)['out'].decode('utf-8').strip()
+    run(['git', 'update-ref', 'refs/heads/master', commit], cwd = source_path)
+
+    run_fix(config_path, precheck = True)
+    assert read_log(config_path, 'fixed')[0]['out'].startswith('Finished fixing')
+    assert remote_tip(config_path, 0) != fixed_tip
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+
+import os
+
+from lib import git
+from lib.merge import merge_failed_main
+
+from conftest import add_repo, read_log, run_fix
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def add_broken_repo(config_path):
+    """
+    Adds a clone of `origin-0.git` whose `source` does not exist, so its fetch fails
+    """
+    fleet_dir = os.path.dirname(config_path)
+    broken_dir = os.path.join(fleet_dir, 'work', 'broken')
+    git(arg_list = ['clone', '--quiet', os.path.join(fleet_dir, 'remotes', 'origin-0.git'), broken_dir],
+        error_message = "cannot clone broken repository")
+    add_repo(config_path, {'dir': broken_dir, 'source': "file://{fleet_dir}/remotes/missing.git".format(fleet_dir = fleet_dir)})
+
+
+def test_preflight_with_skipped_and_failed_repos(fleet):
+    config_path = fleet(repos = 2)
+    add_broken_repo(config_path)
+
+    run_fix(config_path, preflight = True)
+    assert len(read_log(config_path, 'fixed')) == 2
+    failed = read_log(config_path, 'failed')
+    assert [result['name'] for result in failed] == ['broken']
+    assert 'preflight_result' not in failed[0]
+    assert failed[0]['preflight'] is True
+
+    # Skipped as unchanged since last fix, by the journal
+    run_fix(config_path, preflight = True)
+    assert all('unchanged since last fix' in result['out'] for result in read_log(config_path, 'fixed'))
+
+    # Skipped by `git ls-remote` precheck
+    run_fix(config_path, preflight = True, precheck = True, force = True)
+    assert len(read_log(config_path, 'fixed')) == 2
+
+    # Failures without a classification are retried via `git mergetool`, not a crash
+    merge_failed_main({'failed': os.path.join(os.path.dirname(config_path), 'failed.json'), 'jobs': 1})
+
+
+def test_preflight_conflicts_reach_merge_failed(fleet):
+    config_path = fleet(repos = 2, conflict_rate = 1.0)
+
+    run_fix(config_path, preflight = True)
+    failed = read_log(config_path, 'failed')
+    assert len(failed) == 2
+    assert all(result['preflight_result']['class'] in ('trivial', 'conflicting') for result in failed)
+
+    merge_failed_main({'failed': os.path.join(os.path.dirname(config_path), 'failed.json'), 'jobs': 1})
+    assert len(read_log(config_path, 'merged')) == 2
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+
+import pytest
+
+from lib import run
+from lib.push import push_host, PushScheduler
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+@pytest.mark.parametrize('remote_url, host', [
+    ('git@github.com:account-name/repo-name.git', 'github.com'),
+    ('https://gitlab.com/account-name/repo-name.git', 'gitlab.com'),
+    ('file:///srv/git/repo-name.git', 'local'),
+    ('/srv/git/repo-name.git', 'local'),
+])
+def test_push_host(remote_url, host):
+    assert push_host(remote_url) == host
+
+
+def push_to_missing_remote(tmp_path, **kwargs):
+    """
+    **Returns** result of pushing, via `PushScheduler`, to a remote that does not exist, which `lib.retry` classifies as `other`
+    """
+    repo_dir = str(tmp_path / 'repo')
+    run(['git', 'init', '--quiet', repo_dir])
+    missing = str(tmp_path / 'missing.git')
+    results = []
+    scheduler = PushScheduler(on_done = lambda repo_configs, pushed: results.append((repo_configs, pushed)),
+                              backoff = 0.0, **kwargs)
+    scheduler.submit({
+        'name': 'repo',
+        'dir': repo_dir,
+        'origin_remote': missing,
+        'timeouts': None,
+        'pending_push': {
+            'remote_url': missing,
+            'lease': '--force-with-lease=refs/heads/master:' + '0' * 40,
+            'refspec': 'HEAD:refs/heads/master',
+        },
+    })
+    scheduler.close()
+    assert len(results) == 1
+    return results[0]
+
+
+def test_push_retries_only_configured_classes(tmp_path):
+    repo_configs, pushed = push_to_missing_remote(tmp_path, retries = 2)
+    assert not pushed
+    assert repo_configs['error_class'] == 'other'
+    assert 'retries' not in repo_configs
+
+    repo_configs, pushed = push_to_missing_remote(tmp_path, retries = 2, retry_classes = ('other',))
+    assert not pushed
+    assert repo_configs['retries'] == {'push': 2}
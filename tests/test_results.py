@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+
+import json
+import os
+
+from lib.results import cap_output, read_results, ResultsWriter
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+class Outcome(object):
+    def __init__(self, **result):
+        self.result = result
+
+    def as_dict(self):
+        return dict(self.result)
+
+
+def test_results_round_trip_in_write_order(tmp_path):
+    path = str(tmp_path / 'fixed.json')
+    with ResultsWriter(path, fsync_every = 2) as writer:
+        writer.write({'name': 'repo-0', 'code': 0})
+        writer.write(Outcome(name = 'repo-1', code = 0))
+        writer.write({'name': 'repo-2', 'out': 'line\nwith "quotes"'})
+
+    assert list(read_results(path, 'fixed')) == [
+        {'name': 'repo-0', 'code': 0},
+        {'name': 'repo-1', 'code': 0},
+        {'name': 'repo-2', 'out': 'line\nwith "quotes"'},
+    ]
+
+
+def test_results_writer_without_results_leaves_no_file(tmp_path):
+    ResultsWriter(str(tmp_path / 'failed.json')).close()
+    ResultsWriter(None).write({'name': 'ignored'})
+    assert not os.listdir(str(tmp_path))
+
+
+def test_read_results_understands_legacy_logs(tmp_path):
+    legacy = {'failed': [{'name': 'repo-0'}, {'name': 'repo-1'}]}
+
+    pretty_path = str(tmp_path / 'pretty.json')
+    with open(pretty_path, 'w') as results_fd:
+        json.dump(legacy, results_fd, indent = 4)
+
+    compact_path = str(tmp_path / 'compact.json')
+    with open(compact_path, 'w') as results_fd:
+        json.dump(legacy, results_fd)
+
+    for path in (pretty_path, compact_path):
+        assert [result['name'] for result in read_results(path, 'failed')] == ['repo-0', 'repo-1']
+
+
+def test_cap_output_keeps_tail_and_spills_once(tmp_path):
+    logs_dir = str(tmp_path / 'logs')
+    repo = {'name': 'repo-0', 'dir': '/repos/repo-0', 'out': 'short', 'err': 'x' * 6 + 'tail'}
+    cap_output(repo, 4, logs_dir)
+
+    assert repo['out'] == 'short'[-4:]
+    assert repo['err'] == 'tail'
+    assert 'err_log' in repo
+    with open(repo['err_log'], 'r') as log_fd:
+        assert log_fd.read() == 'x' * 6 + 'tail'
+
+    spilled = {'name': 'repo-1', 'dir': '/repos/repo-1', 'err': 'y' * 8, 'err_log': '/captured.err.log'}
+    cap_output(spilled, 4, logs_dir)
+    assert spilled == {'name': 'repo-1', 'dir': '/repos/repo-1', 'err': 'yyyy', 'err_log': '/captured.err.log'}
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+
+import os
+
+import pytest
+
+from lib import run
+from lib.retry import classify_status, RetryPolicy
+
+from conftest import read_log, run_fix
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def commit_line(repo_dir, line):
+    with open(os.path.join(repo_dir, 'file.txt'), 'w') as file_fd:
+        file_fd.write(line + '\n')
+
+    run(['git', 'add', 'file.txt'], cwd = repo_dir)
+    run(['git', 'commit', '--quiet', '-m', line], cwd = repo_dir)
+
+
+@pytest.fixture
+def conflicted_repo(tmp_path, git_env):
+    """
+    **Returns** path of a repository, on branch `ours`, whose `theirs` branch changes the same line differently
+    """
+    repo_dir = str(tmp_path / 'conflicted')
+    run(['git', 'init', '--quiet', '--initial-branch', 'ours', repo_dir])
+    commit_line(repo_dir, 'base')
+    run(['git', 'checkout', '--quiet', '-b', 'theirs'], cwd = repo_dir)
+    commit_line(repo_dir, 'theirs')
+    run(['git', 'checkout', '--quiet', 'ours'], cwd = repo_dir)
+    commit_line(repo_dir, 'ours')
+    return repo_dir
+
+
+def test_classify_real_merge_conflict(conflicted_repo):
+    status = run(['git', 'merge', 'theirs'], cwd = conflicted_repo)
+    assert status['code'] != 0
+    assert classify_status(status) == 'conflict'
+
+
+def test_classify_real_commit_with_unmerged_files(conflicted_repo):
+    run(['git', 'merge', 'theirs'], cwd = conflicted_repo)
+    status = run(['git', 'commit', '-m', 'Fixes logs'], cwd = conflicted_repo)
+    assert status['code'] != 0
+    assert classify_status(status) == 'conflict'
+
+
+def test_classify_real_merge_tree_conflict(conflicted_repo):
+    status = run(['git', 'merge-tree', '--write-tree', 'ours', 'theirs'], cwd = conflicted_repo)
+    assert status['code'] == 1
+    assert classify_status(status) == 'conflict'
+
+
+@pytest.mark.parametrize('status, error_class', [
+    ({'code': 128, 'out': b'', 'err': b"fatal: unable to access 'https://example.com/': Could not resolve host: example.com"}, 'network'),
+    ({'code': 128, 'out': b'', 'err': b'git@github.com: Permission denied (publickey).\nfatal: Could not read from remote repository.'}, 'auth'),
+    ({'code': 128, 'out': b'', 'err': b"fatal: Unable to create '/repo/.git/index.lock': File exists."}, 'lock'),
+    ({'code': -9, 'out': b'', 'err': b'', 'timed_out': 600}, 'timeout'),
+    ({'code': 1, 'out': b'', 'err': b'fatal: not a git repository'}, 'other'),
+])
+def test_classify_status(status, error_class):
+    assert classify_status(status) == error_class
+
+
+def test_retry_policy_only_retries_classes_within_budget():
+    policy = RetryPolicy(retries = 2, backoff = 0.0, budget = 1)
+    network = {'code': 128, 'out': b'', 'err': b'fatal: the remote end hung up unexpectedly'}
+    conflict = {'code': 1, 'out': b'CONFLICT (content): Merge conflict in file.txt', 'err': b''}
+    assert policy.delay(['git', 'merge'], conflict, 0) is None
+    assert policy.delay(['git', 'fetch'], network, 0) == 0.0
+    assert policy.delay(['git', 'fetch'], network, 1) is None
+
+
+@pytest.mark.parametrize('options', [
+    {'merge_mode': 'checkout'},
+    {'merge_mode': 'worktree'},
+    {'merge_mode': 'merge_tree'},
+    {'preflight': True},
+])
+def test_conflicting_fixes_are_classified(fleet, options):
+    config_path = fleet(repos = 1, conflict_rate = 1.0)
+    run_fix(config_path, **options)
+    assert [result['error_class'] for result in read_log(config_path, 'failed')] == ['conflict']
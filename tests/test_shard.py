@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+
+import os
+
+import pytest
+
+from lib.results import read_results, ResultsWriter
+from lib.shard import merge_results_main, parse_shard, shard_of, shard_path, ShardedRepos
+
+from conftest import run_fix
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def test_parse_shard():
+    assert parse_shard(None) is None
+    assert parse_shard('1/4') == (1, 4)
+    assert parse_shard(' 0 / 2 ') == (0, 2)
+
+
+@pytest.mark.parametrize('shard', ['4/4', '-1/4', '1', 'a/b', '0/0'])
+def test_parse_shard_rejects(shard):
+    with pytest.raises(ValueError):
+        parse_shard(shard)
+
+
+def test_sharded_repos_partition_and_reiterate():
+    repos = [{'dir': "~/git/repo-{index}".format(index = index), 'source': 'url'} for index in range(50)]
+    shards = [ShardedRepos(repos, (index, 3)) for index in range(3)]
+    seen = [repo['dir'] for shard in shards for repo in shard]
+    assert sorted(seen) == sorted(repo['dir'] for repo in repos)
+    assert list(shards[0]) == list(shards[0])
+    assert all(shard_of(repo, 3) == 0 for repo in shards[0])
+
+
+def test_shard_path():
+    assert shard_path('./fixed.json', None) == './fixed.json'
+    assert shard_path('./fixed.json', (1, 4)) == './fixed.shard-1-of-4.json'
+
+
+def test_merge_results_is_idempotent(fleet):
+    config_path = fleet(repos = 4)
+    fleet_dir = os.path.dirname(config_path)
+    for shard in ('0/2', '1/2'):
+        run_fix(config_path, shard = shard)
+
+    for _ in range(2):
+        report = merge_results_main({'config': config_path})
+        assert sum(report['logs']['fixed']['counts'].values()) == 4
+        assert report['state']['lines'] == 4
+        with open(os.path.join(fleet_dir, 'state.jsonl'), 'r') as state_fd:
+            assert len(state_fd.readlines()) == 4
+
+    assert len(list(read_results(os.path.join(fleet_dir, 'fixed.json'), 'fixed'))) == 4
+
+
+def test_merge_results_uses_given_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config_path = str(tmp_path / 'config.json')
+    with open(config_path, 'w') as config_fd:
+        config_fd.write('{}')
+
+    logs_dir = tmp_path / 'logs'
+    logs_dir.mkdir()
+    for index in range(2):
+        with ResultsWriter(shard_path(str(logs_dir / 'merged.json'), (index, 2))) as writer:
+            writer.write({'dir': "repo-{index}".format(index = index)})
+
+    report = merge_results_main({'config': config_path, 'merged': str(logs_dir / 'merged.json')})
+    assert report['logs']['merged']['path'] == str(logs_dir / 'merged.json')
+    assert [result['dir'] for result in read_results(str(logs_dir / 'merged.json'), 'merged')] == ['repo-0', 'repo-1']
+    assert not os.path.exists(str(tmp_path / 'merged.json'))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+
+from lib.state import RunState
+
+from conftest import read_log, remote_tip, run_fix
+
+
+__license__ = '''
+Git Fix Logs
+Copyright (C) 2020  S0AndS0
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+'''
+
+
+def repo_configs(tmp_path, **kwargs):
+    configs = {
+        'dir': str(tmp_path / 'repo'),
+        'source': 'file:///source.git',
+        'origin_remote': 'origin',
+        'origin_branch': 'master',
+        'source_remote': 'source',
+        'source_branch': 'master',
+        'origin_hash': 'a' * 40,
+        'source_hash': 'b' * 40,
+        'no_push': False,
+    }
+    configs.update(kwargs)
+    return configs
+
+
+def test_last_fixed_returns_pushed_fix(tmp_path):
+    state = RunState(str(tmp_path / 'state.jsonl'))
+    state.record(repo_configs(tmp_path), True)
+    state.close()
+
+    record = RunState(str(tmp_path / 'state.jsonl')).last_fixed(repo_configs(tmp_path))
+    assert record['origin_hash'] == 'a' * 40
+    assert record['pushed'] is True
+
+
+def test_last_fixed_ignores_failures_dry_runs_and_changed_configs(tmp_path):
+    state = RunState(str(tmp_path / 'state.jsonl'))
+    state.record(repo_configs(tmp_path), False)
+    assert state.last_fixed(repo_configs(tmp_path)) is None
+
+    state.record(repo_configs(tmp_path, no_push = True), True)
+    assert state.last_fixed(repo_configs(tmp_path)) is None
+
+    state.record(repo_configs(tmp_path), True)
+    assert state.last_fixed(repo_configs(tmp_path, source_branch = 'main')) is None
+    state.close()
+
+
+def test_last_fixed_uses_latest_line(tmp_path):
+    state = RunState(str(tmp_path / 'state.jsonl'))
+    state.record(repo_configs(tmp_path), True)
+    state.record(repo_configs(tmp_path), False)
+    state.close()
+
+    assert RunState(str(tmp_path / 'state.jsonl')).last_fixed(repo_configs(tmp_path)) is None
+
+
+def test_dry_run_does_not_skip_next_push(fleet):
+    config_path = fleet(repos = 2)
+    original_tips = [remote_tip(config_path, index) for index in range(2)]
+
+    run_fix(config_path, no_push = True)
+    assert len(read_log(config_path, 'fixed')) == 2
+    assert [remote_tip(config_path, index) for index in range(2)] == original_tips
+
+    run_fix(config_path)
+    assert not any('unchanged since last fix' in result['out'] for result in read_log(config_path, 'fixed'))
+    for index in range(2):
+        assert remote_tip(config_path, index) != original_tips[index]
+
+    run_fix(config_path)
+    assert all('unchanged since last fix' in result['out'] for result in read_log(config_path, 'fixed'))